@@ -61,11 +61,13 @@ try:
 except ImportError:
     pass
 
-from threading import local as _local
+import logging as _logging
+import time as _time
+from threading import local as _local, get_ident as _get_ident
 
 from ._cperror import (
     HTTPError, HTTPRedirect, InternalRedirect,
-    NotFound, CherryPyException,
+    NotFound, CherryPyException, DeadlineExceeded,
 )
 
 from . import _cpdispatch as dispatch
@@ -93,7 +95,7 @@ from . import _cpchecker
 
 __all__ = (
     'HTTPError', 'HTTPRedirect', 'InternalRedirect',
-    'NotFound', 'CherryPyException',
+    'NotFound', 'CherryPyException', 'DeadlineExceeded',
     'dispatch', 'tools', 'Tool', 'Application',
     'wsgi', 'process', 'tree', 'engine',
     'quickstart', 'serving', 'request', 'response', 'thread_data',
@@ -118,6 +120,92 @@ engine.listeners['before_request'] = set()
 engine.listeners['after_request'] = set()
 
 
+class _RequestWatchdog(process.plugins.Monitor):
+    """Monitor which reports requests that run past their deadline.
+
+    Every ``frequency`` seconds, each request in progress which has run
+    past its :attr:`deadline<cherrypy._cprequest.Request.deadline>` is
+    logged (once) and counted in the 'CherryPy Watchdog' namespace of
+    ``logging.statistics``. Turn it on with ``engine.watchdog.on``.
+
+    If ``interrupt`` is True, a :class:`DeadlineExceeded` exception is
+    also raised in the request's thread, if it hasn't got as far as
+    finalizing the response (see :attr:`request.interruptible
+    <cherrypy._cprequest.Request.interruptible>`), so that the request
+    ends with a 503. The exception is only raised once the thread runs
+    Python code again, so it doesn't interrupt a blocking call; it may
+    also be caught (and ignored) by the application's code.
+    """
+
+    interrupt = False
+    """Whether to raise DeadlineExceeded in requests which overrun."""
+
+    def __init__(self, bus, frequency=1):
+        self.servings = {}
+        self._reported = set()
+        process.plugins.Monitor.__init__(self, bus, self.run, frequency)
+
+        if not hasattr(_logging, 'statistics'):
+            _logging.statistics = {}
+        self.stats = _logging.statistics.setdefault('CherryPy Watchdog', {})
+        self.stats.update({
+            'Enabled': lambda s: self.subscribed,
+            'Current Requests': lambda s: len(self.servings),
+            'Overruns': 0,
+            'Interrupts': 0,
+        })
+
+    @property
+    def subscribed(self):
+        """Whether the watchdog is subscribed to its bus."""
+        return self.before_request in self.bus.listeners['before_request']
+
+    def before_request(self):
+        request = serving.request
+        if self.interrupt:
+            request.interruptible = True
+        self.servings[_get_ident()] = request
+
+    def after_request(self):
+        request = self.servings.pop(_get_ident(), None)
+        self._reported.discard(id(request))
+
+    def run(self):
+        """Report (and interrupt) the requests past their deadline."""
+        now = _time.time()
+        for ident, request in list(self.servings.items()):
+            deadline = request.deadline
+            if deadline is None or now <= deadline:
+                continue
+            if id(request) in self._reported:
+                continue
+            self._reported.add(id(request))
+            self.stats['Overruns'] += 1
+            self.bus.log('Request %r is %.3f seconds past its deadline, '
+                         'at stage %r.' % (request.request_line,
+                                           now - deadline, request.stage),
+                         level=30)
+            if self.interrupt:
+                self._interrupt(ident, request)
+
+    def _interrupt(self, ident, request):
+        import ctypes
+        # The request clears interruptible under the same lock before it
+        # finalizes its response, so the exception lands within the
+        # request's error handling.
+        with request.interrupt_lock:
+            if not request.interruptible:
+                return
+            request.interruptible = False
+            interrupted = ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(ident), ctypes.py_object(DeadlineExceeded))
+        if interrupted:
+            self.stats['Interrupts'] += 1
+
+
+engine.watchdog = _RequestWatchdog(engine)
+
+
 engine.autoreload = process.plugins.Autoreloader(engine)
 engine.autoreload.subscribe()
 
@@ -126,6 +214,12 @@ engine.thread_manager.subscribe()
 
 engine.signal_handler = process.plugins.SignalHandler(engine)
 
+# Runs ``async def`` page handlers; turn it on with engine.asyncio.on.
+engine.asyncio = process.plugins.EventLoop(engine)
+
+# Runs tools.offload handlers; turn it on with engine.process_pool.on.
+engine.process_pool = process.plugins.ProcessPool(engine)
+
 
 class _HandleSignalsPlugin(object):
     """Handle signals from other processes.
@@ -150,6 +244,9 @@ engine.signals = _HandleSignalsPlugin(engine)
 server = _cpserver.Server()
 server.subscribe()
 
+# Sizes server's thread pool to its load; turn it on with engine.pool_sizer.on.
+engine.pool_sizer = process.plugins.ThreadPoolSizer(engine, server)
+
 
 def quickstart(root=None, script_name='', config=None):
     """Mount the given root, start the builtin server (and engine), then block.
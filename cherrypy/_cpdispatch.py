@@ -12,6 +12,7 @@ to a hierarchical arrangement of objects, starting at request.app.root.
 import string
 import sys
 import types
+from concurrent import futures
 try:
     classtype = (type, types.ClassType)
 except AttributeError:
@@ -51,7 +52,7 @@ class PageHandler(object):
 
     def __call__(self):
         try:
-            return self.callable(*self.args, **self.kwargs)
+            result = self.callable(*self.args, **self.kwargs)
         except TypeError:
             x = sys.exc_info()[1]
             try:
@@ -61,6 +62,71 @@ class PageHandler(object):
             except Exception:
                 raise x
             raise
+        if isinstance(result, types.CoroutineType):
+            result = _run_coroutine(result)
+        return result
+
+
+def _run_coroutine(coro):
+    """Run an async def handler's coroutine on the engine's event loop.
+
+    It is cancelled at the request's deadline, if any, or after the
+    loop's own timeout, whichever comes first.
+    """
+    request = cherrypy.serving.request
+    loop = cherrypy.engine.asyncio
+    timeout = request.time_remaining()
+    at_deadline = timeout is not None
+    if loop.timeout is not None and (
+            timeout is None or loop.timeout < timeout):
+        timeout, at_deadline = loop.timeout, False
+    if timeout is not None:
+        timeout = max(timeout, 0)
+    try:
+        return loop.run(
+            _serve_coroutine(coro, request, cherrypy.serving.response),
+            timeout)
+    except futures.TimeoutError:
+        if at_deadline:
+            raise cherrypy.DeadlineExceeded()
+        raise cherrypy.HTTPError(
+            503, 'The page handler took longer than %s seconds.' % timeout)
+
+
+class _ServingAwaitable(object):
+
+    """Await a coroutine with cherrypy.serving set up for its request.
+
+    The coroutines of all requests share the event loop's thread, so
+    the request and response are loaded into cherrypy.serving each time
+    the coroutine resumes, and cleared each time it suspends.
+    """
+
+    def __init__(self, coro, request, response):
+        self.coro = coro
+        self.request = request
+        self.response = response
+
+    def __await__(self):
+        send, value = self.coro.send, None
+        while True:
+            cherrypy.serving.load(self.request, self.response)
+            try:
+                yielded = send(value)
+            except StopIteration as exc:
+                return exc.value
+            finally:
+                cherrypy.serving.clear()
+            try:
+                value = yield yielded
+            except BaseException as exc:
+                send, value = self.coro.throw, exc
+            else:
+                send = self.coro.send
+
+
+async def _serve_coroutine(coro, request, response):
+    return await _ServingAwaitable(coro, request, response)
 
 
 def test_callable_spec(callable, callable_args, callable_kwargs):
@@ -439,6 +439,18 @@ class NotFound(HTTPError):
         HTTPError.__init__(self, 404, "The path '%s' was not found." % path)
 
 
+class DeadlineExceeded(HTTPError):
+
+    """Exception raised when a request has run past its deadline (503).
+
+    See :attr:`request.deadline<cherrypy._cprequest.Request.deadline>`.
+    """
+
+    def __init__(self, message=None):
+        HTTPError.__init__(
+            self, 503, message or 'The request ran past its deadline.')
+
+
 _HTTPErrorTemplate = '''<!DOCTYPE html PUBLIC
 "-//W3C//DTD XHTML 1.0 Transitional//EN"
 "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
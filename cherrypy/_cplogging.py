@@ -106,21 +106,140 @@ Since "log.*" config entries simply set attributes on the log object, you can
 add custom attributes to your heart's content. Note that these handlers are
 used ''instead'' of the default, simple handlers outlined above (so don't set
 the "log.error_file" config entry, for example).
+
+Asynchronous access logging
+===========================
+
+Writing the access log happens on the request thread by default, so that
+every response waits for the disk. Set ``log.access_async`` to True to have
+request threads only capture the data for each access log entry, and leave
+formatting and writing them to a background thread:
+
+ * ``log.access_queue_size``: The number of entries which may wait to be
+   written (10000 by default).
+ * ``log.access_overflow``: What to do with new entries while the queue is
+   full: ``'drop'`` them (the default), counting them in
+   ``LogManager.access_dropped``, or ``'block'`` the request thread until
+   there is room.
+
+Entries still queued are written out when the engine stops.
+
+Sampling and rate limiting
+==========================
+
+At high request rates, set ``log.access_sample_rates`` to write only a
+fraction of the access log entries of each class of response status; for
+example, ``{2: 0.01}`` keeps 1% of the entries for 2xx responses, and all
+the others. Set ``log.error_rate_limit`` to the number of identical error
+messages (such as the same traceback) to write per second, after a burst
+of ``log.error_burst``. The number of entries left out is counted for each
+log manager in the 'CherryPy Logging' namespace of
+:mod:`cpstats <cherrypy.lib.cpstats>`.
 """
 
 import datetime
 import logging
 import os
+import queue
+import random
+import re
+import string
 import sys
+import threading
+import time
+import weakref
 
 import cherrypy
 from cherrypy import _cperror
+from cherrypy._json import json
+from cherrypy.lib import httputil
 
 
 # Silence the no-handlers "warning" (stderr write!) in stdlib logging
 logging.Logger.manager.emittedNoHandlerWarning = 1
 logfmt = logging.Formatter('%(message)s')
 
+# Initialize the statistics repository (see cherrypy.lib.cpstats)
+if not hasattr(logging, 'statistics'):
+    logging.statistics = {}
+logstats = logging.statistics.setdefault('CherryPy Logging', {})
+logstats.setdefault('Log Managers', {})
+
+
+def _register_stats(manager, name):
+    """Record the counters of the given LogManager in logstats.
+
+    The record refers to the manager weakly, so that it doesn't keep the
+    manager alive, and is removed once the manager is gone.
+    """
+    managers = logstats['Log Managers']
+    record = {}
+
+    def forget(ref):
+        if managers.get(name) is record:
+            del managers[name]
+
+    ref = weakref.ref(manager, forget)
+
+    def counter(attr):
+        return lambda s: getattr(ref(), attr, None)
+
+    record.update({
+        'Access Entries Dropped': counter('access_dropped'),
+        'Access Entries Sampled Out': counter('access_sampled_out'),
+        'Error Messages Suppressed': counter('errors_suppressed'),
+    })
+    managers[name] = record
+
+
+class TimestampCache(object):
+
+    """A callable which formats timestamps, at most once per second.
+
+    The string formatted for the most recent second is shared by all
+    threads, and only recomputed when the second changes.
+    """
+
+    def __init__(self, format):
+        self.format = format
+        self._cache = None, None
+
+    def __call__(self, timestamp=None):
+        """Return the given timestamp (default now), formatted."""
+        if timestamp is None:
+            timestamp = time.time()
+        second = int(timestamp)
+        # Read and replace the pair at once, so threads never mix them up.
+        cached_second, formatted = self._cache
+        if second != cached_second:
+            formatted = self.format(second)
+            self._cache = second, formatted
+        return formatted
+
+
+monthnames = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+              'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def _format_apache_time(timestamp):
+    now = datetime.datetime.fromtimestamp(timestamp)
+    return ('[%02d/%s/%04d:%02d:%02d:%02d]' %
+            (now.day, monthnames[now.month - 1], now.year,
+             now.hour, now.minute, now.second))
+
+
+def _format_iso_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).isoformat('T')
+
+
+apache_time = TimestampCache(_format_apache_time)
+'Return a timestamp in Apache Common Log Format (no timezone).'
+
+http_date = TimestampCache(httputil.HTTPDate)
+'Return a timestamp formatted for HTTP headers, such as Date.'
+
+_iso_time = TimestampCache(_format_iso_time)
+
 
 class NullHandler(logging.Handler):
 
@@ -154,6 +273,56 @@ class LogManager(object):
     """The actual :class:`logging.Logger` instance for access messages."""
 
     access_log_format = '{h} {l} {u} {t} "{r}" {s} {b} "{f}" "{a}"'
+    """A :meth:`str.format` template over the atoms in ``access_atoms``."""
+
+    access_log_json = False
+    """If True, write each access log entry as a JSON object instead, holding
+    the atoms used in access_log_format under their ``access_atom_names``."""
+
+    _access_formatter = None
+
+    access_async = False
+    """If True, access log entries are formatted and written by a background
+    thread instead of the request thread."""
+
+    access_queue_size = 10000
+    """The number of access log entries which may wait for the background
+    thread to write them."""
+
+    access_overflow = 'drop'
+    """What to do with access log entries while the queue is full: 'drop'
+    them, or 'block' until the background thread catches up."""
+
+    access_batch_size = 100
+    """The largest number of access log entries the background thread writes
+    at once; stream and file handlers get each batch in a single write."""
+
+    access_dropped = 0
+    """The number of access log entries dropped because the queue was full."""
+
+    access_sample_rates = None
+    """A map of {status class: rate} pairs, where the status class is the first
+    digit of the response status (such as 2 for '200 OK') and rate is the
+    fraction, between 0 and 1, of such requests to write to the access log.
+    For example, ``{2: 0.01, 3: 0.1}`` logs 1% of successful requests, 10% of
+    redirects, and every error. Statuses not in the map are always logged."""
+
+    access_sampled_out = 0
+    """The number of access log entries skipped by access_sample_rates."""
+
+    error_rate_limit = None
+    """If not None, the number of identical error log messages per second
+    written on average; messages beyond that are suppressed. Messages are
+    identical if they have the same context, text, and exception."""
+
+    error_burst = 10
+    """The number of identical error log messages written in a row before
+    error_rate_limit applies."""
+
+    errors_suppressed = 0
+    """The number of error log messages suppressed by error_rate_limit."""
+
+    _access_writer = None
 
     logger_root = None
     """The "top-level" logger name.
@@ -184,7 +353,18 @@ class LogManager(object):
         self.error_log.addHandler(NullHandler())
         self.access_log.addHandler(NullHandler())
 
+        self._access_writer_lock = threading.Lock()
+        self._error_buckets = {}
+        self._error_buckets_lock = threading.Lock()
+
+        if appid is None:
+            name = logger_root
+        else:
+            name = '%s.%s' % (logger_root, appid)
+        _register_stats(self, name)
+
         cherrypy.engine.subscribe('graceful', self.reopen_files)
+        cherrypy.engine.subscribe('stop', self.stop_access_writer)
 
     def reopen_files(self):
         """Close and reopen all file handlers."""
@@ -205,11 +385,23 @@ class LogManager(object):
 
         If ``traceback`` is True, the traceback of the current exception
         (if any) will be appended to ``msg``.
+
+        If ``error_rate_limit`` is set, messages repeated too often are
+        suppressed; the next message written notes how many were.
         """
         exc_info = None
         if traceback:
             exc_info = _cperror._exc_info()
 
+        if self.error_rate_limit is not None:
+            exc_type, exc = (exc_info or (None, None))[:2]
+            suppressed = self._limit_error_rate(
+                (context, msg, severity, exc_type, str(exc)))
+            if suppressed is None:
+                return
+            if suppressed:
+                msg += ' [%d identical messages suppressed]' % suppressed
+
         self.error_log.log(
             severity,
             ' '.join((self.time(), context, msg)),
@@ -220,6 +412,31 @@ class LogManager(object):
         """An alias for ``error``."""
         return self.error(*args, **kwargs)
 
+    def _limit_error_rate(self, key):
+        """Take a token from the bucket for the given message key.
+
+        Return None if the bucket is empty and the message must be dropped,
+        or else the number of messages dropped since one was last written.
+        """
+        now = time.time()
+        with self._error_buckets_lock:
+            bucket = self._error_buckets.get(key)
+            if bucket is None:
+                if len(self._error_buckets) >= 1000:
+                    # Forget about messages seen long ago.
+                    self._error_buckets.clear()
+                bucket = self._error_buckets[key] = [self.error_burst, now, 0]
+            tokens, last, suppressed = bucket
+            tokens = min(
+                self.error_burst,
+                tokens + (now - last) * self.error_rate_limit)
+            if tokens < 1:
+                bucket[:] = tokens, now, suppressed + 1
+                self.errors_suppressed += 1
+                return None
+            bucket[:] = tokens - 1, now, 0
+            return suppressed
+
     def access(self):
         """Write to the access log (in Apache/NCSA Combined Log format).
 
@@ -238,61 +455,132 @@ class LogManager(object):
         of the raw byte. Exceptions from this rule are " and \\, which are
         escaped by prepending a backslash, and all whitespace characters,
         which are written in their C-style notation (\\n, \\t, etc).
+
+        Besides the atoms of the Combined Log format, ``access_log_format``
+        may use ``{o}`` (Host header), ``{i}`` (request id), ``{z}`` (RFC 3339
+        time), ``{D}`` (time taken to respond, in microseconds), ``{I}``
+        (request body bytes read), ``{H}`` (page handler name), ``{C}``
+        (HIT or MISS for cacheable requests), ``{P}`` (thread id) and ``{T}``
+        (trace id; see ``tools.server_timing``).
+
+        If ``access_async`` is True, the entry is only queued here, to be
+        formatted and written by a background thread.
+
+        If ``access_sample_rates`` is set, only a sample of the entries for
+        each status class may be written.
+        """
+        rates = self.access_sample_rates
+        if rates:
+            status = cherrypy.serving.response.output_status
+            rate = rates.get(status and int(status[:1]), 1)
+            if rate < 1 and random.random() >= rate:
+                with self._access_writer_lock:
+                    self.access_sampled_out += 1
+                return
+
+        atoms = self._access_atoms()
+        if not self.access_async:
+            self._log_access(atoms)
+            return
+
+        writer = self._access_writer
+        if writer is None:
+            writer = self._start_access_writer()
+        if self.access_overflow == 'block':
+            writer.put(atoms)
+        else:
+            try:
+                writer.put_nowait(atoms)
+            except queue.Full:
+                with self._access_writer_lock:
+                    self.access_dropped += 1
+
+    def _get_access_formatter(self):
+        """Return the AccessLogFormatter for the current settings."""
+        formatter = self._access_formatter
+        stale = (
+            formatter is None
+            or formatter.template != self.access_log_format
+            or formatter.json_lines != self.access_log_json
+        )
+        if stale:
+            formatter = AccessLogFormatter(
+                self.access_log_format, self.access_log_json)
+            self._access_formatter = formatter
+        return formatter
+
+    def _access_atoms(self):
+        """Return the raw data for an access log entry, unescaped.
+
+        Only the atoms used by the access log format are collected.
         """
         request = cherrypy.serving.request
-        remote = request.remote
         response = cherrypy.serving.response
-        outheaders = response.headers
-        inheaders = request.headers
-        if response.output_status is None:
-            status = '-'
-        else:
-            status = response.output_status.split(b' ', 1)[0]
-            status = status.decode('ISO-8859-1')
-
-        atoms = {'h': remote.name or remote.ip,
-                 'l': '-',
-                 'u': getattr(request, 'login', None) or '-',
-                 't': self.time(),
-                 'r': request.request_line,
-                 's': status,
-                 'b': dict.get(outheaders, 'Content-Length', '') or '-',
-                 'f': dict.get(inheaders, 'Referer', ''),
-                 'a': dict.get(inheaders, 'User-Agent', ''),
-                 'o': dict.get(inheaders, 'Host', '-'),
-                 'i': request.unique_id,
-                 'z': LazyRfc3339UtcTime(),
-                 }
-        for k, v in atoms.items():
-            if not isinstance(v, str):
-                v = str(v)
-            v = v.replace('"', '\\"').encode('utf8')
-            # Fortunately, repr(str) escapes unprintable chars, \n, \t, etc
-            # and backslash for us. All we have to do is strip the quotes.
-            v = repr(v)[2:-1]
-
-            # in python 3.0 the repr of bytes (as returned by encode)
-            # uses double \'s.  But then the logger escapes them yet, again
-            # resulting in quadruple slashes.  Remove the extra one here.
-            v = v.replace('\\\\', '\\')
-
-            # Escape double-quote.
-            atoms[k] = v
+        return {
+            name: access_atoms[name](self, request, response)
+            for name in self._get_access_formatter().atoms
+        }
 
+    def _log_access(self, atoms):
+        """Format the given atoms, and write the access log."""
         try:
             self.access_log.log(
-                logging.INFO, self.access_log_format.format(**atoms))
+                logging.INFO, self._get_access_formatter()(atoms))
         except Exception:
             self(traceback=True)
 
+    def _log_access_batch(self, batch):
+        """Format the given list of atoms, and write them to the access log.
+
+        Plain stream and file handlers get the whole batch in one write and
+        one flush; other handlers are passed one record at a time.
+        """
+        log = self.access_log
+        if not log.isEnabledFor(logging.INFO):
+            return
+        formatter = self._get_access_formatter()
+        records = []
+        for atoms in batch:
+            try:
+                record = log.makeRecord(
+                    log.name, logging.INFO, '(unknown file)', 0,
+                    formatter(atoms), (), None)
+            except Exception:
+                self(traceback=True)
+                continue
+            if log.filter(record):
+                records.append(record)
+        if not records:
+            return
+
+        # Walk the loggers as Logger.callHandlers does.
+        logger = log
+        while logger:
+            for handler in logger.handlers:
+                if logging.INFO >= handler.level:
+                    _emit_batch(handler, records)
+            if not logger.propagate:
+                break
+            logger = logger.parent
+
+    def _start_access_writer(self):
+        with self._access_writer_lock:
+            if self._access_writer is None:
+                writer = AccessLogWriter(self, self.access_queue_size)
+                writer.start()
+                self._access_writer = writer
+            return self._access_writer
+
+    def stop_access_writer(self):
+        """Write out all queued access log entries and stop the writer."""
+        with self._access_writer_lock:
+            writer, self._access_writer = self._access_writer, None
+        if writer is not None:
+            writer.stop()
+
     def time(self):
         """Return now() in Apache Common Log Format (no timezone)."""
-        now = datetime.datetime.now()
-        monthnames = ['jan', 'feb', 'mar', 'apr', 'may', 'jun',
-                      'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
-        month = monthnames[now.month - 1].capitalize()
-        return ('[%02d/%s/%04d:%02d:%02d:%02d]' %
-                (now.day, month, now.year, now.hour, now.minute, now.second))
+        return apache_time()
 
     def _get_builtin_handler(self, log, key):
         for h in log.handlers:
@@ -413,6 +701,203 @@ class LogManager(object):
         self._set_wsgi_handler(self.error_log, newvalue)
 
 
+def _escape_atom(value):
+    """Return the given value as a string fit for the access log."""
+    if not isinstance(value, str):
+        value = str(value)
+    if not _needs_escape(value):
+        return value
+    value = value.replace('"', '\\"').encode('utf8')
+    # Fortunately, repr(str) escapes unprintable chars, \n, \t, etc
+    # and backslash for us. All we have to do is strip the quotes.
+    value = repr(value)[2:-1]
+
+    # in python 3.0 the repr of bytes (as returned by encode)
+    # uses double \'s.  But then the logger escapes them yet, again
+    # resulting in quadruple slashes.  Remove the extra one here.
+    return value.replace('\\\\', '\\')
+
+
+# Printable ASCII other than quotes and backslashes is written as is.
+_needs_escape = re.compile(r'[^\x20-\x7e]|["\\]').search
+
+
+def _atom_status(log, request, response):
+    if response.output_status is None:
+        return '-'
+    status = response.output_status.split(b' ', 1)[0]
+    return status.decode('ISO-8859-1')
+
+
+def _atom_bytes_in(log, request, response):
+    # The request body is wrapped in a SizedReader once it has been read.
+    return getattr(getattr(request.body, 'fp', None), 'bytes_read', 0)
+
+
+def _atom_handler(log, request, response):
+    handler = request.handler
+    # Unwrap the page handler from the encoding tool's ResponseEncoder.
+    handler = getattr(handler, 'oldhandler', handler)
+    handler = getattr(handler, 'callable', handler)
+    if handler is None:
+        return '-'
+    return getattr(handler, '__qualname__', None) or type(handler).__name__
+
+
+def _atom_cache(log, request, response):
+    if getattr(request, 'cached', False):
+        return 'HIT'
+    if getattr(request, 'cacheable', False):
+        return 'MISS'
+    return '-'
+
+
+access_atoms = {
+    'h': lambda log, request, response: (
+        request.remote.name or request.remote.ip),
+    'l': lambda log, request, response: '-',
+    'u': lambda log, request, response: (
+        getattr(request, 'login', None) or '-'),
+    't': lambda log, request, response: log.time(),
+    'r': lambda log, request, response: request.request_line,
+    's': _atom_status,
+    'b': lambda log, request, response: (
+        dict.get(response.headers, 'Content-Length', '') or '-'),
+    'f': lambda log, request, response: dict.get(
+        request.headers, 'Referer', ''),
+    'a': lambda log, request, response: dict.get(
+        request.headers, 'User-Agent', ''),
+    'o': lambda log, request, response: dict.get(
+        request.headers, 'Host', '-'),
+    'i': lambda log, request, response: request.unique_id,
+    'z': lambda log, request, response: LazyRfc3339UtcTime(),
+    'D': lambda log, request, response: int(
+        (time.time() - response.time) * 1000000),
+    'I': _atom_bytes_in,
+    'H': _atom_handler,
+    'C': _atom_cache,
+    'P': lambda log, request, response: threading.get_ident(),
+    'T': lambda log, request, response: getattr(
+        getattr(request, 'span', None), 'trace_id', '-'),
+}
+"""A map of {atom name: function(log manager, request, response)} pairs,
+each returning the value of an access log atom."""
+
+access_atom_names = {
+    'h': 'remote_host', 'l': 'ident', 'u': 'user', 't': 'time',
+    'r': 'request_line', 's': 'status', 'b': 'bytes_out',
+    'f': 'referer', 'a': 'user_agent', 'o': 'host', 'i': 'request_id',
+    'z': 'timestamp', 'D': 'duration_us', 'I': 'bytes_in',
+    'H': 'handler', 'C': 'cache', 'P': 'thread_id', 'T': 'trace_id',
+}
+'The keys of access log atoms in JSON access log entries.'
+
+
+class AccessLogFormatter(object):
+
+    """An access log format, compiled into a callable.
+
+    Calling it with the atoms the format uses (see ``atoms``) returns the
+    access log entry. Only those atoms are collected and escaped.
+    """
+
+    def __init__(self, template, json_lines=False):
+        self.template = template
+        self.json_lines = json_lines
+
+        atoms = []
+        for literal, field, spec, conversion in string.Formatter().parse(
+                template):
+            if field is not None:
+                name = _field_name(field).group()
+                if name not in atoms:
+                    atoms.append(name)
+        self.atoms = tuple(atoms)
+
+        if json_lines:
+            self._encode = json.JSONEncoder(separators=(',', ':')).encode
+        else:
+            self._format = template.format
+
+    def __call__(self, atoms):
+        """Return the access log entry for the given atoms."""
+        if self.json_lines:
+            return self._encode({
+                access_atom_names.get(name, name): (
+                    value if isinstance(value, int) else str(value))
+                for name, value in atoms.items()
+            })
+        return self._format(**{
+            name: _escape_atom(value) for name, value in atoms.items()
+        })
+
+
+_field_name = re.compile(r'\w*').match
+
+
+def _emit_batch(handler, records):
+    """Pass the given records to the handler, with one write if it can."""
+    if type(handler) not in (logging.StreamHandler, logging.FileHandler):
+        for record in records:
+            handler.handle(record)
+        return
+
+    handler.acquire()
+    try:
+        lines = [
+            handler.format(record) + handler.terminator
+            for record in records if handler.filter(record)
+        ]
+        if lines:
+            if handler.stream is None:
+                # A FileHandler with delay=True.
+                handler.stream = handler._open()
+            handler.stream.write(''.join(lines))
+            handler.flush()
+    except Exception:
+        handler.handleError(records[-1])
+    finally:
+        handler.release()
+
+
+class AccessLogWriter(queue.Queue):
+
+    """A queue of access log entries, written out by a background thread."""
+
+    _stop = object()
+
+    def __init__(self, log_manager, maxsize=0):
+        queue.Queue.__init__(self, maxsize)
+        self.log_manager = log_manager
+        self.thread = threading.Thread(
+            target=self.run, name='CP Access Log Writer')
+        self.thread.daemon = True
+
+    def start(self):
+        """Start writing out queued entries."""
+        self.thread.start()
+
+    def stop(self):
+        """Write out the entries already queued, then stop."""
+        self.put(self._stop)
+        self.thread.join()
+
+    def run(self):
+        """Take batches of entries off the queue, and write them out."""
+        while True:
+            batch = [self.get()]
+            try:
+                while len(batch) < self.log_manager.access_batch_size:
+                    batch.append(self.get_nowait())
+            except queue.Empty:
+                pass
+            entries = [atoms for atoms in batch if atoms is not self._stop]
+            if entries:
+                self.log_manager._log_access_batch(entries)
+            if len(entries) < len(batch):
+                return
+
+
 class WSGIErrorHandler(logging.Handler):
 
     "A handler class which writes logging records to environ['wsgi.errors']."
@@ -451,7 +936,12 @@ class WSGIErrorHandler(logging.Handler):
 
 
 class LazyRfc3339UtcTime(object):
+    def __init__(self):
+        self.timestamp = time.time()
+
     def __str__(self):
-        """Return now() in RFC3339 UTC Format."""
-        now = datetime.datetime.now()
-        return now.isoformat('T') + 'Z'
+        """Return the time of creation in RFC3339 UTC Format."""
+        microsecond = int(self.timestamp * 1000000) % 1000000
+        if microsecond:
+            return '%s.%06dZ' % (_iso_time(self.timestamp), microsecond)
+        return _iso_time(self.timestamp) + 'Z'
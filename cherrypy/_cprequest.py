@@ -1,4 +1,5 @@
 import sys
+import threading
 import time
 from http.cookies import SimpleCookie, CookieError
 
@@ -8,11 +9,19 @@ from more_itertools import consume
 
 import cherrypy
 from cherrypy._cpcompat import ntob
-from cherrypy import _cpreqbody
+from cherrypy import _cplogging, _cpreqbody
 from cherrypy._cperror import format_exc, bare_error
 from cherrypy.lib import httputil, reprconf, encoding
 
 
+try:
+    perf_counter_ns = time.perf_counter_ns
+except AttributeError:
+    # Python < 3.7
+    def perf_counter_ns():
+        return int(time.perf_counter() * 1000000000)
+
+
 class Hook(object):
 
     """A callback and its metadata: failsafe, priority, and kwargs."""
@@ -75,6 +84,22 @@ class HookMap(dict):
 
     """A map of call points to lists of callbacks (Hook objects)."""
 
+    timings = None
+    """
+    A :class:`RequestTimings` object to record the duration of each hook
+    in, or None (the default) to not time hooks."""
+
+    deadline = None
+    """
+    The time (as from time.time()) past which :meth:`run` raises
+    :class:`DeadlineExceeded<cherrypy._cperror.DeadlineExceeded>` at the
+    points in :attr:`deadline_points`, or None (the default)."""
+
+    deadline_points = ('on_start_resource', 'before_request_body',
+                       'before_handler')
+    """The points at which the deadline is checked: those before the page
+    handler runs. Once it has run, the response is sent regardless."""
+
     def __new__(cls, points=None):
         d = dict.__new__(cls)
         for p in points or []:
@@ -90,7 +115,11 @@ class HookMap(dict):
 
     def run(self, point):
         """Execute all registered Hooks (callbacks) for the given point."""
+        if (self.deadline is not None and point in self.deadline_points
+                and time.time() > self.deadline):
+            raise cherrypy._cperror.DeadlineExceeded()
         exc = None
+        timings = self.timings
         hooks = self[point]
         hooks.sort()
         for hook in hooks:
@@ -101,7 +130,10 @@ class HookMap(dict):
             # to raise SystemExit and stop the whole server.
             if exc is None or hook.failsafe:
                 try:
-                    hook()
+                    if timings is None:
+                        hook()
+                    else:
+                        timings.run_hook(point, hook)
                 except (KeyboardInterrupt, SystemExit):
                     raise
                 except (cherrypy.HTTPError, cherrypy.HTTPRedirect,
@@ -131,6 +163,66 @@ class HookMap(dict):
         )
 
 
+class RequestTimings(object):
+
+    """The durations of the stages and hooks of a single request.
+
+    Each entry in ``stages`` is a (stage, nanoseconds) tuple, measured from
+    the moment :attr:`Request.stage` was set to that stage until it was set
+    to the next one. Each entry in ``hooks`` is a (hookpoint, callback name,
+    nanoseconds) tuple. Hooks run within stages, so their time is included
+    in the stage durations as well.
+    """
+
+    clock = staticmethod(perf_counter_ns)
+    """A function returning a monotonic time in integer nanoseconds."""
+
+    def __init__(self):
+        self.stages = []
+        self.hooks = []
+        self.current = None
+        self.started = self.clock()
+
+    def enter(self, stage):
+        """Record the end of the current stage and the start of the next."""
+        now = self.clock()
+        if self.current is not None:
+            self.stages.append((self.current, now - self.started))
+        self.current = stage
+        self.started = now
+
+    def run_hook(self, point, hook):
+        """Call the given Hook, recording its duration."""
+        start = self.clock()
+        try:
+            return hook()
+        finally:
+            self.hooks.append(
+                (point, callback_name(hook.callback), self.clock() - start))
+
+    def totals(self):
+        """Return a dict of total nanoseconds per stage."""
+        totals = {}
+        for stage, duration in self.stages:
+            totals[stage] = totals.get(stage, 0) + duration
+        return totals
+
+    def __repr__(self):
+        cls = self.__class__
+        return '%s.%s(stages=%r, hooks=%r)' % (
+            cls.__module__, cls.__name__, self.stages, self.hooks)
+
+
+def callback_name(callback):
+    """Return a short, readable name for the given hook callback."""
+    callback = getattr(callback, 'func', callback)
+    name = getattr(
+        callback, '__qualname__', getattr(callback, '__name__', None))
+    if name is None:
+        return repr(callback)
+    return name
+
+
 # Config namespace handlers
 
 def hooks_namespace(k, v):
@@ -462,14 +554,70 @@ class Request(object):
     closed = False
     """True once the close method has been called, False otherwise."""
 
-    stage = None
-    """
+    _stage = None
+
+    def _get_stage(self):
+        return self._stage
+
+    def _set_stage(self, stage):
+        self._stage = stage
+        if self.timings is not None:
+            self.timings.enter(stage)
+
+    stage = property(_get_stage, _set_stage, doc="""
     A string containing the stage reached in the request-handling process.
-    This is useful when debugging a live server with hung requests."""
+    This is useful when debugging a live server with hung requests.""")
+
+    trace_timings = False
+    """
+    If True, time each stage and hook of the request into
+    :attr:`timings`. Set this on the Request class (or an app's
+    request_class) to time every stage; as a 'request.trace_timings'
+    config entry it takes effect from the 'on_start_resource' stage on."""
+
+    timings = None
+    """
+    A :class:`RequestTimings` object holding the duration of each stage
+    and hook of this request, or None if :attr:`trace_timings` is off."""
 
     unique_id = None
     """A lazy object generating and memorizing UUID4 on ``str()`` render."""
 
+    timeout = None
+    """
+    The time in seconds which the request is allowed, from when it was
+    received, or None (the default) for no limit. See :attr:`deadline`."""
+
+    deadline_header = None
+    """
+    The name of a request header (such as 'Request-Timeout') in which
+    clients (or proxies) may give the time in seconds which they will wait
+    for the response, or None (the default) to ignore such headers. See
+    :attr:`deadline`."""
+
+    deadline = None
+    """
+    The time (as from time.time()) by which the request should be done,
+    or None for no limit. It is set, once the request's config is known,
+    from :attr:`timeout` and :attr:`deadline_header`, whichever is sooner.
+    Past it, the request gets a 503 at its next hook point before the page
+    handler (see :attr:`HookMap.deadline_points`). Pass
+    :meth:`time_remaining` on to the timeouts of calls to other services,
+    and turn on ``engine.watchdog`` to report requests which run over."""
+
+    interruptible = False
+    """
+    Whether ``engine.watchdog`` may raise DeadlineExceeded in the thread
+    of this request. The watchdog sets this as the request begins, if its
+    ``interrupt`` is on; the request clears it under :attr:`interrupt_lock`
+    before finalizing the response, so that the exception can't be raised
+    outside of the request's error handling."""
+
+    interrupt_lock = threading.Lock()
+    """
+    The lock under which :attr:`interruptible` is cleared, and under which
+    the watchdog interrupts requests."""
+
     namespaces = reprconf.NamespaceSet(
         **{'hooks': hooks_namespace,
            'request': request_namespace,
@@ -499,10 +647,37 @@ class Request(object):
         # Put a *copy* of the class namespaces into self.
         self.namespaces = self.namespaces.copy()
 
+        if self.trace_timings:
+            self.timings = RequestTimings()
         self.stage = None
 
         self.unique_id = LazyUUID4()
 
+    def time_remaining(self):
+        """Return the seconds left until the deadline (0 if past), or None."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.time(), 0)
+
+    def _end_interruptible(self):
+        """Stop the watchdog from interrupting this request."""
+        if self.interruptible:
+            with self.interrupt_lock:
+                self.interruptible = False
+
+    def _get_deadline(self):
+        timeouts = []
+        if self.timeout is not None:
+            timeouts.append(self.timeout)
+        if self.deadline_header:
+            try:
+                timeouts.append(float(self.headers[self.deadline_header]))
+            except (KeyError, ValueError):
+                pass
+        if not timeouts:
+            return None
+        return cherrypy.serving.response.time + min(timeouts)
+
     def close(self):
         """Run cleanup code. (Core)"""
         if not self.closed:
@@ -628,11 +803,13 @@ class Request(object):
                     self._do_respond(path_info)
                 except (cherrypy.HTTPRedirect, cherrypy.HTTPError):
                     inst = sys.exc_info()[1]
+                    self._end_interruptible()
                     inst.set_response()
                     self.stage = 'before_finalize (HTTPError)'
                     self.hooks.run('before_finalize')
                     cherrypy.serving.response.finalize()
             finally:
+                self._end_interruptible()
                 self.stage = 'on_end_resource'
                 self.hooks.run('on_end_resource')
         except self.throws:
@@ -662,6 +839,10 @@ class Request(object):
             self.rfile, self.headers, request_params=self.params)
 
         self.namespaces(self.config)
+        if self.trace_timings and self.timings is None:
+            self.timings = RequestTimings()
+        self.hooks.timings = self.timings
+        self.deadline = self.hooks.deadline = self._get_deadline()
 
         self.stage = 'on_start_resource'
         self.hooks.run('on_start_resource')
@@ -687,6 +868,7 @@ class Request(object):
             response.body = self.handler()
 
         # Finalize
+        self._end_interruptible()
         self.stage = 'before_finalize'
         self.hooks.run('before_finalize')
         response.finalize()
@@ -837,7 +1019,7 @@ class Response(object):
         dict.update(self.headers, {
             'Content-Type': 'text/html',
             'Server': 'CherryPy/' + cherrypy.__version__,
-            'Date': httputil.HTTPDate(self.time),
+            'Date': _cplogging.http_date(self.time),
         })
         self.cookie = SimpleCookie()
 
@@ -76,7 +76,9 @@ class Server(ServerAdapter):
     this should also limit the supported features used in the response."""
 
     thread_pool = 10
-    """The number of worker threads to start up in the pool."""
+    """The number of worker threads to start up in the pool. The
+    :class:`ThreadPoolSizer<cherrypy.process.plugins.ThreadPoolSizer>`
+    (``engine.pool_sizer``) doesn't shrink the pool below this."""
 
     thread_pool_max = -1
     """The maximum size of the worker-thread pool. Use -1 to indicate no limit.
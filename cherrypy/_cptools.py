@@ -27,8 +27,9 @@ from cherrypy._helper import expose
 
 from cherrypy.lib import cptools, encoding, static, jsontools
 from cherrypy.lib import sessions as _sessions, xmlrpcutil as _xmlrpc
-from cherrypy.lib import caching as _caching
-from cherrypy.lib import auth_basic, auth_digest
+from cherrypy.lib import caching as _caching, tracing as _tracing
+from cherrypy.lib import auth_basic, auth_digest, offload as _offload
+from cherrypy.lib import admission as _admission, ratelimit as _ratelimit
 
 
 def _getargs(func):
@@ -498,5 +499,13 @@ _d.json_out = Tool('before_handler', jsontools.json_out, priority=30)
 _d.auth_basic = Tool('before_handler', auth_basic.basic_auth, priority=1)
 _d.auth_digest = Tool('before_handler', auth_digest.digest_auth, priority=1)
 _d.params = Tool('before_handler', cptools.convert_params, priority=15)
+_d.server_timing = Tool(
+    'on_start_resource', _tracing.start_span, priority=10)
+_d.offload = Tool('before_handler', _offload.offload, priority=20)
+_d.admission = Tool(
+    'on_start_resource', _admission.admission, priority=20)
+# Just after tools.proxy, which sets request.remote, and before the body.
+_d.ratelimit = Tool(
+    'before_request_body', _ratelimit.ratelimit, priority=35)
 
 del _d, cptools, encoding, static
@@ -3,6 +3,7 @@ WSGI server interface (see PEP 333).
 
 This adds some CP-specific bits to the framework-agnostic cheroot package.
 """
+import socket
 import sys
 
 import cheroot.wsgi
@@ -108,3 +109,26 @@ class CPWSGIServer(cheroot.wsgi.Server):
     def error_log(self, msg='', level=20, traceback=False):
         """Write given message to the error log."""
         cherrypy.engine.log(msg, level, traceback)
+
+    def bind(self, family, type, proto=0):
+        """Create the socket, unless the server adapter has one bound."""
+        bound_socket = getattr(self.server_adapter, 'bound_socket', None)
+        if bound_socket is None:
+            return super(CPWSGIServer, self).bind(family, type, proto)
+        # Serve on a copy, which stop() may close.
+        sock = bound_socket.dup()
+        if self.nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.ssl_adapter is not None:
+            sock = self.ssl_adapter.bind(sock)
+        self.socket = sock
+        self.bind_addr = self.resolve_real_bind_addr(sock)
+        return sock
+
+    def bind_unix_socket(self, bind_addr):
+        """Create the UNIX socket, unless the server adapter has one bound."""
+        bound_socket = getattr(self.server_adapter, 'bound_socket', None)
+        if bound_socket is None:
+            return super(CPWSGIServer, self).bind_unix_socket(bind_addr)
+        sock = self.socket = bound_socket.dup()
+        return sock
@@ -9,7 +9,7 @@ from cherrypy import Application
 
 def start(configfiles=None, daemonize=False, environment=None,
           fastcgi=False, scgi=False, pidfile=None, imports=None,
-          cgi=False):
+          cgi=False, workers=None):
     """Subscribe all engine plugins and start the engine."""
     sys.path = [''] + sys.path
     for i in imports or []:
@@ -62,6 +62,9 @@ def start(configfiles=None, daemonize=False, environment=None,
         s = servers.ServerAdapter(engine, httpserver=f, bind_addr=addr)
         s.subscribe()
 
+    if workers:
+        plugins.Prefork(engine, workers).subscribe()
+
     # Always start the engine; this will start all other services
     try:
         engine.start()
@@ -96,6 +99,8 @@ def run():
                  help='store the process id in the given file')
     p.add_option('-P', '--Path', action='append', dest='Path',
                  help='add the given paths to sys.path')
+    p.add_option('-w', '--workers', dest='workers', type='int', default=None,
+                 help='serve from the given number of worker processes')
     options, args = p.parse_args()
 
     if options.Path:
@@ -104,4 +109,4 @@ def run():
 
     start(options.config, options.daemonize,
           options.environment, options.fastcgi, options.scgi,
-          options.pidfile, options.imports, options.cgi)
+          options.pidfile, options.imports, options.cgi, options.workers)
@@ -0,0 +1,221 @@
+"""Admission control, to shed load rather than queue it without bound.
+
+When requests arrive faster than they can be handled, they queue up in
+the server and every client waits longer and longer. Turn on
+``tools.admission`` to bound the requests in progress instead: up to
+``limit`` at a time (by default, ``server.thread_pool``) run, up to
+``queue`` more wait at most ``timeout`` seconds for one of them to finish,
+and the rest get a 503 response with a ``Retry-After`` header at once::
+
+    [/]
+    tools.admission.on = True
+    tools.admission.limit = 8
+    tools.admission.queue = 16
+    tools.admission.timeout = 0.5
+
+Requests share a :class:`Gate` by ``name``, which defaults to the
+application's script name; name a gate in the config of a path to give
+it its own limits.
+
+Waiting requests are admitted in order of their ``priority`` (higher
+first), and when the queue is full, a request of a higher priority takes
+the place of the lowest waiting one, which is shed instead. Set the
+priority for a path in its config, or map the values of a request header
+(set by a trusted proxy, say) to priorities::
+
+    [/api/health]
+    tools.admission.priority = 10
+
+    [/]
+    tools.admission.priority_header = 'X-Priority'
+    tools.admission.priorities = {'interactive': 5, 'batch': -5}
+
+Each gate's counts are recorded in the 'CherryPy Admission' namespace of
+:mod:`cpstats <cherrypy.lib.cpstats>`.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+import cherrypy
+
+
+if not hasattr(logging, 'statistics'):
+    logging.statistics = {}
+
+admission_stats = logging.statistics.setdefault('CherryPy Admission', {})
+admission_stats.update({
+    'Enabled': True,
+    'Gates': {},
+})
+
+gates = {}
+"""A map of {name: :class:`Gate`} pairs."""
+
+_gates_lock = threading.Lock()
+
+
+class _Waiter(object):
+
+    __slots__ = ('event', 'admitted')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+
+
+class Gate(object):
+    """Bounds the requests in progress, with a bounded queue of waiters."""
+
+    def __init__(self, name, limit, queue=0):
+        """Initialize the gate, with no requests in progress."""
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.active = 0
+        self.admitted = 0
+        self.shed = 0
+        self.wait_time = 0.0
+        self._waiters = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self):  # noqa: D401; irrelevant for properties
+        """The number of requests waiting to be admitted."""
+        return len(self._waiters)
+
+    def acquire(self, priority=0, timeout=None):
+        """Admit a request, waiting if need be. Return False to shed it."""
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                self.admitted += 1
+                return True
+
+            if len(self._waiters) >= self.queue:
+                # Shed the lowest waiter (the latest, among equals), if
+                # it's of a lower priority than this request; else this.
+                lowest = max(self._waiters) if self._waiters else None
+                if lowest is None or -lowest[0] >= priority:
+                    self.shed += 1
+                    return False
+                self._waiters.remove(lowest)
+                heapq.heapify(self._waiters)
+                self.shed += 1
+                lowest[2].event.set()
+
+            waiter = _Waiter()
+            entry = (-priority, next(self._order), waiter)
+            heapq.heappush(self._waiters, entry)
+
+        start = time.time()
+        waiter.event.wait(timeout)
+        with self._lock:
+            self.wait_time += time.time() - start
+            if waiter.admitted:
+                return True
+            if entry in self._waiters:
+                # Timed out.
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self.shed += 1
+            return False
+
+    def release(self):
+        """Let the next waiting request in, as the current one is done."""
+        with self._lock:
+            if self._waiters and self.active <= self.limit:
+                # Hand the freed place straight over.
+                waiter = heapq.heappop(self._waiters)[2]
+                waiter.admitted = True
+                self.admitted += 1
+                waiter.event.set()
+            else:
+                self.active -= 1
+
+    def stats(self):
+        """Return a cpstats record of the gate."""
+        return {
+            'Limit': self.limit,
+            'Queue Limit': self.queue,
+            'Current Requests': lambda s: self.active,
+            'Waiting Requests': lambda s: self.waiting,
+            'Total Admitted': lambda s: self.admitted,
+            'Total Shed': lambda s: self.shed,
+            'Total Wait Time': lambda s: self.wait_time,
+        }
+
+
+def get_gate(name, limit, queue):
+    """Return the named Gate (created if need be), with the given limits."""
+    gate = gates.get(name)
+    if gate is None:
+        with _gates_lock:
+            gate = gates.get(name)
+            if gate is None:
+                gate = gates[name] = Gate(name, limit, queue)
+                admission_stats['Gates'][name] = gate.stats()
+    gate.limit = limit
+    gate.queue = queue
+    return gate
+
+
+def _retry_after(seconds):
+    # Set after the error response, which removes any Retry-After header.
+    cherrypy.serving.response.headers['Retry-After'] = str(seconds)
+
+
+def admission(limit=None, queue=0, timeout=1, retry_after=1, name=None,
+              priority=0, priority_header=None, priorities=None,
+              debug=False):
+    """Admit the request, or shed it with a 503 if too many are in progress.
+
+    limit
+        The number of requests to run at a time (by default, the number
+        of threads in ``server.thread_pool``).
+
+    queue
+        The number of requests which may wait for one of those to finish.
+
+    timeout
+        The time in seconds which a request may wait.
+
+    retry_after
+        The value of the ``Retry-After`` header sent with the 503.
+
+    name
+        The name of the :class:`Gate` to go through; by default, the
+        application's script name.
+
+    priority, priority_header, priorities
+        The priority of the request is the value which ``priorities``
+        maps the ``priority_header`` of the request to, else ``priority``.
+    """
+    request = cherrypy.serving.request
+    if limit is None:
+        limit = cherrypy.server.thread_pool
+    if name is None:
+        name = request.app.script_name if request.app else ''
+    if priority_header and priorities:
+        priority = priorities.get(
+            request.headers.get(priority_header), priority)
+
+    gate = get_gate(name, limit, queue)
+    if not gate.acquire(priority, timeout):
+        if debug:
+            cherrypy.log('Shedding request (gate %r, priority %s)' %
+                         (name, priority), 'TOOLS.ADMISSION')
+        request.hooks.attach('before_finalize', _retry_after,
+                             seconds=retry_after)
+        raise cherrypy.HTTPError(
+            503, 'The server is too busy; please retry later.')
+
+    if debug:
+        cherrypy.log('Admitted request (gate %r, priority %s)' %
+                     (name, priority), 'TOOLS.ADMISSION')
+    # Failsafe, so that the place is freed even if other hooks fail.
+    request.hooks.attach('on_end_request', gate.release, failsafe=True)
@@ -138,6 +138,14 @@ so you get the "original" data in a consistently-serialized format.
 Note: there's no treatment yet for datetime objects. Try time.time() instead
 for now if you can. Nagios will probably thank you.
 
+For Prometheus and other OpenMetrics scrapers, fetch /cpstats/metrics instead
+(or mount it at the conventional path with ``root.metrics = page.metrics``).
+It reads the counters and histograms directly rather than extrapolating a
+copy of the whole dict, and caches its output for
+``StatsPage.metrics_cache_interval`` seconds. Numeric scalars of other
+namespaces are exported as gauges, except for the well-known counters in
+``metric_types``.
+
 Turning Collection Off
 ----------------------
 
@@ -155,6 +163,17 @@ To collect statistics on CherryPy applications::
     from cherrypy.lib import cpstats
     appconfig['/']['tools.cpstats.on'] = True
 
+Processing times go into a :class:`LatencyHistogram`, which reports the
+'Latency p50', 'p90', 'p99' and 'p999' percentiles without keeping every
+sample. Set ``tools.cpstats.uriset`` to a name to get the same figures for
+a group of URIs under 'URI Set Tracking'. The slowest requests (those over
+``tools.cpstats.slow_queries`` seconds) are kept in a ring buffer of
+``tools.cpstats.slow_queries_count`` 'Slow Queries'.
+
+If ``request.trace_timings`` is on, the time spent in each request stage and
+hook callback (see ``request.timings``) is tracked likewise, under 'Stage
+Timing' and 'Hook Timing'.
+
 To collect statistics on your own code::
 
     import logging
@@ -177,6 +196,21 @@ To collect statistics on your own code::
         if mystats.get('Enabled', False):
             mystats['Important Events'] += 1
 
+If many threads update the same counter, ``+=`` on a shared dict can lose
+increments. Use a :class:`ShardedCounters` instead; each thread adds to its
+own shard, and :meth:`ShardedCounters.publish` writes the merged totals
+back into the namespace, which keeps plain numbers for anyone reading it::
+
+    counters = cpstats.ShardedCounters('Important Events')
+    ...
+    counters.shard()['Important Events'] += 1
+    ...
+    counters.publish(mystats)
+
+The 'CherryPy Applications' counters are published at most once every
+``publish_interval`` seconds as requests end, and whenever a
+:class:`StatsPage` reports them.
+
 To report statistics::
 
     root.cpstats = cpstats.StatsPage()
@@ -188,12 +222,17 @@ To format statistics reports::
 """
 
 import logging
+import math
+import operator
 import os
+import re
 import sys
 import threading
 import time
+from collections import OrderedDict, deque
 
 import cherrypy
+from cherrypy._cpcompat import tonative
 from cherrypy._json import json
 
 # ------------------------------- Statistics -------------------------------- #
@@ -208,7 +247,7 @@ def extrapolate_statistics(scope):
     for k, v in list(scope.items()):
         if isinstance(v, dict):
             v = extrapolate_statistics(v)
-        elif isinstance(v, (list, tuple)):
+        elif isinstance(v, (list, tuple, deque)):
             v = [extrapolate_statistics(record) for record in v]
         elif hasattr(v, '__call__'):
             v = v(scope)
@@ -216,8 +255,212 @@ def extrapolate_statistics(scope):
     return c
 
 
+class ThreadShards(object):
+
+    """Base class for per-thread accumulators which are merged when read.
+
+    Each thread adds to its own shard (see :meth:`shard`), so the hot path
+    never writes to a value shared with other threads and no updates are
+    lost. :meth:`merged` combines all shards, including those of threads
+    which have since exited. Subclasses define :meth:`new_shard` and
+    :meth:`merge`.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = self.new_shard()
+        self._lock = threading.Lock()
+
+    def new_shard(self):
+        """Return a new, empty accumulator."""
+        raise NotImplementedError
+
+    def merge(self, total, shard):
+        """Add the given shard into the given total (in place)."""
+        raise NotImplementedError
+
+    def shard(self):
+        """Return the accumulator for the current thread."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = self.new_shard()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def merged(self):
+        """Return a new accumulator holding the sum of all shards."""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    # The thread can't write to its shard anymore,
+                    # so fold it in once instead of summing it forever.
+                    self.merge(self._retired, shard)
+            self._shards = live
+            total = self.new_shard()
+            self.merge(total, self._retired)
+            for thread, shard in live:
+                self.merge(total, shard)
+        return total
+
+
+class ShardedCounters(ThreadShards):
+
+    """Named numeric counters, sharded per thread.
+
+    Call :meth:`total` (or put :meth:`reader` in a namespace) to obtain
+    the sum over all threads.
+    """
+
+    def __init__(self, *names):
+        self.names = names
+        ThreadShards.__init__(self)
+
+    def new_shard(self):
+        return dict.fromkeys(self.names, 0)
+
+    def merge(self, total, shard):
+        for name in self.names:
+            total[name] += shard[name]
+
+    def totals(self):
+        """Return a dict of the merged value of every counter."""
+        return self.merged()
+
+    def total(self, name):
+        """Return the merged value of the given counter."""
+        return self.merged()[name]
+
+    def reader(self, name):
+        """Return an extrapolation function for the given counter."""
+        return lambda s: self.total(name)
+
+    def publish(self, scope):
+        """Write the merged value of every counter into the given dict."""
+        scope.update(self.merged())
+
+
+class LatencyHistogram(ThreadShards):
+
+    """A fixed-memory, log-linear histogram of durations, sharded per thread.
+
+    Durations are recorded in whole microseconds. Values below
+    ``2 ** (sub_bits + 1)`` get a bucket each; above that, every power of
+    two is split into ``2 ** sub_bits`` equal buckets, which bounds the
+    relative error of a reported percentile by ``2 ** -sub_bits`` (6.25%
+    by default). Values beyond ``2 ** (max_shift + sub_bits + 1)``
+    microseconds (about 38 hours by default) share the last bucket.
+    """
+
+    sub_bits = 4
+    max_shift = 32
+
+    percentiles = (
+        ('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999),
+    )
+
+    def __init__(self):
+        self.size = (self.max_shift + 2) << self.sub_bits
+        ThreadShards.__init__(self)
+
+    def new_shard(self):
+        return {'Counts': [0] * self.size, 'Sum': 0.0,
+                'Min': None, 'Max': None}
+
+    def merge(self, total, shard):
+        total['Counts'] = list(map(operator.add,
+                                   total['Counts'], shard['Counts']))
+        total['Sum'] += shard['Sum']
+        for key, pick in (('Min', min), ('Max', max)):
+            if shard[key] is not None:
+                if total[key] is None:
+                    total[key] = shard[key]
+                else:
+                    total[key] = pick(total[key], shard[key])
+
+    def bucket(self, seconds):
+        """Return the index of the bucket for the given duration."""
+        v = int(seconds * 1000000)
+        shift = v.bit_length() - self.sub_bits - 1
+        if shift <= 0:
+            return max(v, 0)
+        if shift > self.max_shift:
+            return self.size - 1
+        return (shift << self.sub_bits) + (v >> shift)
+
+    def bucket_midpoint(self, index):
+        """Return the middle of the given bucket, in seconds."""
+        if index < 2 << self.sub_bits:
+            return (index + 0.5) / 1000000
+        shift = (index >> self.sub_bits) - 1
+        lower = (index - (shift << self.sub_bits)) << shift
+        return (lower + (1 << shift) / 2.0) / 1000000
+
+    def record(self, seconds):
+        """Add the given duration to the current thread's shard."""
+        shard = self.shard()
+        shard['Sum'] += seconds
+        if shard['Min'] is None or seconds < shard['Min']:
+            shard['Min'] = seconds
+        if shard['Max'] is None or seconds > shard['Max']:
+            shard['Max'] = seconds
+        # Count last, so readers never see a count without Min and Max.
+        shard['Counts'][self.bucket(seconds)] += 1
+
+    def percentile(self, q, merged=None):
+        """Return the given quantile (0 < q <= 1) in seconds, or 0.0."""
+        if merged is None:
+            merged = self.merged()
+        counts = merged['Counts']
+        rank = max(math.ceil(q * sum(counts)), 1)
+        seen = 0
+        for index, n in enumerate(counts):
+            seen += n
+            if seen >= rank:
+                # Exact extremes beat the bucket midpoint.
+                value = self.bucket_midpoint(index)
+                return min(max(value, merged['Min']), merged['Max'])
+        return 0.0
+
+    def summary(self):
+        """Return a record of Count, Sum, Min, Max, Avg and percentiles."""
+        merged = self.merged()
+        count = sum(merged['Counts'])
+        record = {
+            'Count': count,
+            'Sum': merged['Sum'],
+            'Min': merged['Min'] or 0.0,
+            'Max': merged['Max'] or 0.0,
+            'Avg': count and merged['Sum'] / count or 0.0,
+        }
+        for name, q in self.percentiles:
+            record[name] = self.percentile(q, merged)
+        return record
+
+
 # -------------------- CherryPy Applications Statistics --------------------- #
 
+appcounters = ShardedCounters(
+    'Current Requests', 'Total Bytes Read', 'Total Bytes Written',
+    'Total Requests', 'Total Time',
+)
+apphistogram = LatencyHistogram()
+uriset_histograms = {}
+stage_histograms = {}
+hook_histograms = {}
+_record_lock = threading.Lock()
+
+publish_interval = 1.0
+"""The longest time, in seconds, for which the request counters in
+appstats may lag behind while requests are being served."""
+
+_last_publish = [0.0]
+
 appstats = logging.statistics.setdefault('CherryPy Applications', {})
 appstats.update({
     'Enabled': True,
@@ -237,6 +480,10 @@ appstats.update({
     ),
     'Current Time': lambda s: time.time(),
     'Current Requests': 0,
+    'Latency p50': lambda s: apphistogram.percentile(0.5),
+    'Latency p90': lambda s: apphistogram.percentile(0.9),
+    'Latency p99': lambda s: apphistogram.percentile(0.99),
+    'Latency p999': lambda s: apphistogram.percentile(0.999),
     'Requests/Second': lambda s: float(s['Total Requests']) / s['Uptime'](s),
     'Server Version': cherrypy.__version__,
     'Start Time': time.time(),
@@ -296,8 +543,36 @@ class ByteCountWrapper(object):
         return data
 
 
-def average_uriset_time(s):
-    return s['Count'] and (s['Sum'] / s['Count']) or 0
+def uriset_tracking(s):
+    """Return a record (with latency percentiles) for each tracked uriset."""
+    return dict(
+        (uriset, h.summary()) for uriset, h in list(uriset_histograms.items())
+    )
+
+
+def stage_timing(s):
+    """Return a record (with latency percentiles) for each request stage."""
+    return dict(
+        (stage, h.summary()) for stage, h in list(stage_histograms.items())
+    )
+
+
+def hook_timing(s):
+    """Return a record (with latency percentiles) for each hook callback."""
+    return dict(
+        ('%s %s' % key, h.summary())
+        for key, h in list(hook_histograms.items())
+    )
+
+
+def _get_histogram(histograms, key, title, report):
+    """Return the histogram for the given key, creating it if needed."""
+    h = histograms.get(key)
+    if h is None:
+        with _record_lock:
+            h = histograms.setdefault(key, LatencyHistogram())
+        appstats.setdefault(title, report)
+    return h
 
 
 def _get_threading_ident():
@@ -332,8 +607,9 @@ class StatsTool(cherrypy.Tool):
 
         r = request.remote
 
-        appstats['Current Requests'] += 1
-        appstats['Total Requests'] += 1
+        counts = appcounters.shard()
+        counts['Current Requests'] += 1
+        counts['Total Requests'] += 1
         appstats['Requests'][_get_threading_ident()] = {
             'Bytes Read': None,
             'Bytes Written': None,
@@ -352,48 +628,63 @@ class StatsTool(cherrypy.Tool):
         """Record the end of a request."""
         resp = cherrypy.serving.response
         w = appstats['Requests'][_get_threading_ident()]
+        counts = appcounters.shard()
 
         r = cherrypy.request.rfile.bytes_read
         w['Bytes Read'] = r
-        appstats['Total Bytes Read'] += r
+        counts['Total Bytes Read'] += r
 
         if resp.stream:
             w['Bytes Written'] = 'chunked'
         else:
             cl = int(resp.headers.get('Content-Length', 0))
             w['Bytes Written'] = cl
-            appstats['Total Bytes Written'] += cl
+            counts['Total Bytes Written'] += cl
 
-        w['Response Status'] = getattr(
-            resp, 'output_status', None) or resp.status
+        w['Response Status'] = tonative(getattr(
+            resp, 'output_status', None) or resp.status)
 
         w['End Time'] = time.time()
         p = w['End Time'] - w['Start Time']
         w['Processing Time'] = p
-        appstats['Total Time'] += p
+        counts['Total Time'] += p
 
-        appstats['Current Requests'] -= 1
+        counts['Current Requests'] -= 1
+        if w['End Time'] - _last_publish[0] >= publish_interval:
+            _last_publish[0] = w['End Time']
+            appcounters.publish(appstats)
 
         if debug:
             cherrypy.log('Stats recorded: %s' % repr(w), 'TOOLS.CPSTATS')
 
+        apphistogram.record(p)
         if uriset:
-            rs = appstats.setdefault('URI Set Tracking', {})
-            r = rs.setdefault(uriset, {
-                'Min': None, 'Max': None, 'Count': 0, 'Sum': 0,
-                'Avg': average_uriset_time})
-            if r['Min'] is None or p < r['Min']:
-                r['Min'] = p
-            if r['Max'] is None or p > r['Max']:
-                r['Max'] = p
-            r['Count'] += 1
-            r['Sum'] += p
+            _get_histogram(
+                uriset_histograms, uriset, 'URI Set Tracking', uriset_tracking,
+            ).record(p)
+
+        timings = cherrypy.serving.request.timings
+        if timings is not None:
+            # See request.trace_timings. The stages and hooks run so far.
+            for stage, ns in timings.stages:
+                _get_histogram(
+                    stage_histograms, stage, 'Stage Timing', stage_timing,
+                ).record(ns / 1e9)
+            for point, name, ns in timings.hooks:
+                _get_histogram(
+                    hook_histograms, (point, name), 'Hook Timing', hook_timing,
+                ).record(ns / 1e9)
 
         if slow_queries and p > slow_queries:
-            sq = appstats.setdefault('Slow Queries', [])
+            sq = appstats.get('Slow Queries')
+            if sq is None or sq.maxlen != slow_queries_count:
+                with _record_lock:
+                    sq = appstats.get('Slow Queries')
+                    if sq is None or sq.maxlen != slow_queries_count:
+                        # A ring buffer drops the oldest entry in O(1).
+                        sq = appstats['Slow Queries'] = deque(
+                            sq or (), maxlen=slow_queries_count)
             sq.append(w.copy())
-            if len(sq) > slow_queries_count:
-                sq.pop(0)
 
 
 cherrypy.tools.cpstats = StatsTool()
@@ -405,6 +696,56 @@ thisdir = os.path.abspath(os.path.dirname(__file__))
 
 missing = object()
 
+metric_types = {
+    'Accepts': 'counter',
+    'Access Entries Dropped': 'counter',
+    'Access Entries Sampled Out': 'counter',
+    'Bytes Read': 'counter',
+    'Bytes Written': 'counter',
+    'Error Messages Suppressed': 'counter',
+    'Requests': 'counter',
+    'Socket Errors': 'counter',
+    'Work Time': 'counter',
+}
+"""Map of statistic names to OpenMetrics types other than 'gauge'."""
+
+_numbered_namespace = re.compile(r'^(.*?) (\d+)$')
+
+
+def metric_name(*parts):
+    """Return an OpenMetrics metric name for the given statistic names."""
+    name = '_'.join(parts)
+    return re.sub(r'[^a-zA-Z0-9]+', '_', name).strip('_').lower()
+
+
+def metric_labels(labels):
+    """Return the given (name, value) pairs as an OpenMetrics label set."""
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (
+            k,
+            str(v).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'),
+        )
+        for k, v in labels
+    )
+
+
+def metric_value(v):
+    """Return the given number in OpenMetrics syntax, or None."""
+    if isinstance(v, bool):
+        return str(int(v))
+    if isinstance(v, int):
+        return str(v)
+    if isinstance(v, float):
+        if math.isnan(v):
+            return 'NaN'
+        if math.isinf(v):
+            return v > 0 and '+Inf' or '-Inf'
+        return repr(v)
+    return None
+
 
 def locale_date(v):
     return time.strftime('%c', time.gmtime(v))
@@ -445,6 +786,10 @@ class StatsPage(object):
             'Bytes Written/Request': '%.3f',
             'Bytes Written/Second': '%.3f',
             'Current Time': iso_format,
+            'Latency p50': '%.3f',
+            'Latency p90': '%.3f',
+            'Latency p99': '%.3f',
+            'Latency p999': '%.3f',
             'Requests/Second': '%.3f',
             'Start Time': iso_format,
             'Total Time': '%.3f',
@@ -454,11 +799,35 @@ class StatsPage(object):
                 'Processing Time': '%.3f',
                 'Start Time': iso_format,
             },
+            'Stage Timing': {
+                'Avg': '%.6f',
+                'Max': '%.6f',
+                'Min': '%.6f',
+                'Sum': '%.6f',
+                'p50': '%.6f',
+                'p90': '%.6f',
+                'p99': '%.6f',
+                'p999': '%.6f',
+            },
+            'Hook Timing': {
+                'Avg': '%.6f',
+                'Max': '%.6f',
+                'Min': '%.6f',
+                'Sum': '%.6f',
+                'p50': '%.6f',
+                'p90': '%.6f',
+                'p99': '%.6f',
+                'p999': '%.6f',
+            },
             'URI Set Tracking': {
                 'Avg': '%.3f',
                 'Max': '%.3f',
                 'Min': '%.3f',
                 'Sum': '%.3f',
+                'p50': '%.3f',
+                'p90': '%.3f',
+                'p99': '%.3f',
+                'p999': '%.3f',
             },
             'Requests': {
                 'Bytes Read': '%s',
@@ -468,6 +837,16 @@ class StatsPage(object):
                 'Start Time': None,
             },
         },
+        'CherryPy Admission': {
+            'Enabled': pause_resume('CherryPy Admission'),
+            'Gates': {
+                'Total Wait Time': '%.3f',
+            },
+        },
+        'CherryPy Offload': {
+            'Enabled': pause_resume('CherryPy Offload'),
+            'Total Time': '%.3f',
+        },
         'CherryPy WSGIServer': {
             'Enabled': pause_resume('CherryPy WSGIServer'),
             'Connections/second': '%.3f',
@@ -582,6 +961,7 @@ table.stats2 th {
 
     def get_namespaces(self):
         """Yield (title, scalars, collections) for each namespace."""
+        appcounters.publish(appstats)
         s = extrapolate_statistics(logging.statistics)
         for title, ns in sorted(s.items()):
             scalars = []
@@ -672,12 +1052,144 @@ table.stats2 th {
 
         return headers, subrows
 
+    metrics_cache_interval = 1.0
+    """Seconds to reuse the rendered output of :meth:`metrics` for."""
+
+    _metrics_cache = (0, None)
+
+    @cherrypy.expose
+    def metrics(self):
+        """Render statistics in the OpenMetrics text format."""
+        now = time.time()
+        rendered, body = self._metrics_cache
+        if body is None or now - rendered >= self.metrics_cache_interval:
+            body = ''.join(self.render_metrics()).encode('utf-8')
+            self._metrics_cache = (now, body)
+        cherrypy.response.headers['Content-Type'] = (
+            'application/openmetrics-text; version=1.0.0; charset=utf-8')
+        return body
+
+    def render_metrics(self):
+        """Yield the lines of the OpenMetrics exposition."""
+        for name, type, help, samples in self.get_metric_families():
+            if not samples:
+                continue
+            yield '# TYPE %s %s\n' % (name, type)
+            yield '# HELP %s %s\n' % (name, help)
+            for suffix, labels, value in samples:
+                yield '%s%s%s %s\n' % (
+                    name, suffix, metric_labels(labels), value)
+        yield '# EOF\n'
+
+    def get_metric_families(self):
+        """Return a list of (name, type, help, samples) metric families.
+
+        Each sample is a (suffix, labels, value) tuple. The CherryPy
+        application statistics are read from their sharded counters and
+        histograms; for other namespaces, numeric scalars and the numeric
+        fields of dict collections are evaluated in place.
+        """
+        families = OrderedDict()
+        counts = appcounters.totals()
+        for name, type, key in (
+            ('cherrypy_requests', 'counter', 'Total Requests'),
+            ('cherrypy_requests_in_progress', 'gauge', 'Current Requests'),
+            ('cherrypy_request_bytes_read', 'counter', 'Total Bytes Read'),
+            ('cherrypy_response_bytes_written', 'counter',
+             'Total Bytes Written'),
+        ):
+            self._add_metric(families, name, type, key, counts[key], ())
+        self._add_metric(families, 'cherrypy_start_time_seconds', 'gauge',
+                         'Start Time', appstats['Start Time'], ())
+
+        self._add_summary(
+            families, 'cherrypy_request_duration_seconds',
+            'Request processing time', apphistogram.summary(), ())
+        for uriset, h in sorted(uriset_histograms.items()):
+            self._add_summary(
+                families, 'cherrypy_uriset_duration_seconds',
+                'Request processing time per uriset', h.summary(),
+                (('uriset', uriset),))
+        for stage, h in sorted(stage_histograms.items()):
+            self._add_summary(
+                families, 'cherrypy_stage_duration_seconds',
+                'Time spent in each request stage', h.summary(),
+                (('stage', stage),))
+        for (point, name), h in sorted(hook_histograms.items()):
+            self._add_summary(
+                families, 'cherrypy_hook_duration_seconds',
+                'Time spent in each hook callback', h.summary(),
+                (('hookpoint', point), ('callback', name)))
+
+        for title, ns in sorted(logging.statistics.items()):
+            if ns is appstats:
+                continue
+            labels = ()
+            m = _numbered_namespace.match(title)
+            if m:
+                # E.g. 'Cheroot HTTPServer 140227744' (the id of the server)
+                title, labels = m.group(1), (('instance', m.group(2)),)
+            for key, v in sorted(ns.items()):
+                if isinstance(v, dict):
+                    for k2, record in sorted(v.items()):
+                        if isinstance(record, dict):
+                            self._add_record(
+                                families, metric_name(title, key), record,
+                                labels + (('key', k2),))
+                    continue
+                if hasattr(v, '__call__'):
+                    v = v(ns)
+                self._add_metric(
+                    families, metric_name(title, key),
+                    metric_types.get(key, 'gauge'), key, v, labels)
+        return list(families.values())
+
+    def _add_metric(self, families, name, type, help, value, labels):
+        sample = metric_value(value)
+        if sample is None:
+            return
+        suffix = ''
+        if type == 'counter':
+            if value < 0:
+                # E.g. disabled cheroot statistics report -1.
+                return
+            suffix = '_total'
+        self._add_samples(
+            families, name, type, help, [(suffix, labels, sample)])
+
+    def _add_summary(self, families, name, help, summary, labels):
+        samples = []
+        for key, q in LatencyHistogram.percentiles:
+            samples.append(('', labels + (('quantile', repr(q)),),
+                            metric_value(summary[key])))
+        samples.append(('_sum', labels, metric_value(summary['Sum'])))
+        samples.append(('_count', labels, metric_value(summary['Count'])))
+        self._add_samples(families, name, 'summary', help, samples)
+
+    def _add_record(self, families, prefix, record, labels):
+        for key, v in sorted(record.items()):
+            if hasattr(v, '__call__'):
+                v = v(record)
+            self._add_metric(
+                families, metric_name(prefix, key),
+                metric_types.get(key, 'gauge'), key, v, labels)
+
+    def _add_samples(self, families, name, type, help, samples):
+        # Samples of one family must be contiguous, so e.g. the stats
+        # of several servers are collected under a single name.
+        family = families.get(name)
+        if family is None:
+            families[name] = (name, type, help, samples)
+        elif family[1] == type:
+            family[3].extend(samples)
+
     if json is not None:
         @cherrypy.expose
         def data(self):
+            appcounters.publish(appstats)
             s = extrapolate_statistics(logging.statistics)
             cherrypy.response.headers['Content-Type'] = 'application/json'
-            return json.dumps(s, sort_keys=True, indent=4)
+            return json.dumps(s, sort_keys=True, indent=4).encode('utf-8')
 
     @cherrypy.expose
     def pause(self, namespace):
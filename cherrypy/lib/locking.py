@@ -1,4 +1,12 @@
+import contextlib
 import datetime
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 
 class NeverExpires(object):
@@ -35,7 +43,7 @@ class LockChecker(object):
     """
     def __init__(self, session_id, timeout):
         self.session_id = session_id
-        if timeout:
+        if timeout is not None:
             self.timer = Timer.after(timeout)
         else:
             self.timer = NeverExpires()
@@ -45,3 +53,60 @@ class LockChecker(object):
             raise LockTimeout(
                 'Timeout acquiring lock for %(session_id)s' % vars(self))
         return False
+
+
+class FileLock(object):
+    """
+    An exclusive lock, shared between processes, held on the file at `path`.
+
+    The lock is taken with ``fcntl.flock``, so with no `timeout` acquisition
+    blocks in the kernel and wakes as soon as the holder releases it,
+    instead of polling. With a `timeout` (a timedelta), the lock is retried
+    without blocking, backing off exponentially from one millisecond, and
+    LockTimeout is raised once the timeout expires.
+
+    The lock file is removed on release. Waiters holding a descriptor on a
+    removed file notice it once they get the lock, and start over.
+    """
+    def __init__(self, path, timeout=None):
+        self._path = path
+        self.timeout = timeout
+        self.fd = self._acquire()
+
+    def _acquire(self):
+        checker = LockChecker(self._path, self.timeout)
+        delay = 0.001
+        while True:
+            fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if self.timeout is not None:
+                    while True:
+                        try:
+                            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            checker.expired()
+                            time.sleep(delay)
+                            delay = min(delay * 2, 0.1)
+                        else:
+                            break
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                if self._is_current(fd):
+                    return fd
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(fd)
+
+    def _is_current(self, fd):
+        """Return True if `fd` is still the file found at our path."""
+        try:
+            return os.fstat(fd).st_ino == os.stat(self._path).st_ino
+        except FileNotFoundError:
+            return False
+
+    def close(self):
+        """Remove the lock file and release the lock."""
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path)
+        os.close(self.fd)
@@ -0,0 +1,140 @@
+"""Run CPU-heavy page handlers in a pool of worker processes.
+
+CPython runs one thread at a time, so a handler which keeps the CPU busy
+(rendering a report, resizing an image) slows down every other request
+in the process. Turn on ``tools.offload`` for such handlers to run them
+in the engine's :class:`ProcessPool <cherrypy.process.plugins.ProcessPool>`
+instead, while the request thread waits::
+
+    [global]
+    engine.process_pool.on = True
+    engine.process_pool.max_workers = 4
+
+    [/reports]
+    tools.offload.on = True
+    tools.offload.timeout = 30
+
+The handler, or the ``function`` given to the tool in its place, is
+called in a worker process with the request's params, so it, the params
+and its return value must all be picklable. A bound method is pickled
+along with its object, attributes and all; a root mounted at '', for
+one, gets a ``favicon_ico`` handler which isn't picklable, so prefer
+plain functions there. The worker has no ``cherrypy.request`` or
+``cherrypy.response``: set headers and such from the request thread,
+in the handler's caller or in other tools. Call :func:`run` to offload
+a function from within a handler.
+
+A call which takes longer than ``timeout`` seconds, or which is lost to
+a broken pool, gets a 503 response; the worker still finishes the call,
+as a running call can't be cancelled. Calls are counted in the
+'CherryPy Offload' namespace of :mod:`cpstats <cherrypy.lib.cpstats>`.
+"""
+
+import logging
+import threading
+import time
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
+
+import cherrypy
+from cherrypy._cpdispatch import test_callable_spec
+
+
+if not hasattr(logging, 'statistics'):
+    logging.statistics = {}
+
+_stats_lock = threading.Lock()
+
+offload_stats = logging.statistics.setdefault('CherryPy Offload', {})
+offload_stats.update({
+    'Enabled': True,
+    'Running': lambda s: cherrypy.engine.process_pool.executor is not None,
+    'Max Workers': lambda s: cherrypy.engine.process_pool.max_workers,
+    'Current Calls': 0,
+    'Total Calls': 0,
+    'Total Errors': 0,
+    'Total Timeouts': 0,
+    'Total Time': 0.0,
+})
+
+
+def _record(name, value=1):
+    with _stats_lock:
+        offload_stats[name] += value
+
+
+def run(function, *args, timeout=None, **kwargs):
+    """Call function(*args, **kwargs) in the engine's process pool.
+
+    Return its result, or raise its exception. If it takes longer than
+    ``timeout`` seconds, or the pool breaks, raise a 503 HTTPError.
+    """
+    start = time.time()
+    _record('Current Calls')
+    _record('Total Calls')
+    try:
+        future = cherrypy.engine.process_pool.submit(function, *args, **kwargs)
+        try:
+            return future.result(timeout)
+        except futures.TimeoutError:
+            future.cancel()
+            _record('Total Timeouts')
+            raise cherrypy.HTTPError(
+                503, 'The offloaded call took longer than %s seconds.'
+                % timeout)
+        except BrokenProcessPool:
+            _record('Total Errors')
+            cherrypy.log('Offloaded call to %r was lost to a broken '
+                         'process pool.' % function, 'TOOLS.OFFLOAD',
+                         severity=logging.WARNING)
+            raise cherrypy.HTTPError(503)
+        except BaseException:
+            _record('Total Errors')
+            raise
+    finally:
+        _record('Current Calls', -1)
+        _record('Total Time', time.time() - start)
+
+
+class OffloadHandler(object):
+    """Page handler which runs the given function in the process pool.
+
+    The function is called with the params of the page handler it replaces.
+    """
+
+    def __init__(self, handler, function=None, timeout=None):
+        """Wrap the handler; offload it, or the function given instead."""
+        self.handler = handler
+        if function is None:
+            function = getattr(handler, 'callable', handler)
+        self.function = function
+        self.timeout = timeout
+
+    def __call__(self):
+        """Run the function in the process pool, and return its result."""
+        # A LateParamPageHandler collects the body params only now.
+        args = getattr(self.handler, 'args', ())
+        kwargs = getattr(self.handler, 'kwargs', {})
+        if self.function is getattr(self.handler, 'callable', None):
+            # Check the params as PageHandler would; a mismatch found
+            # in the worker would be a 500.
+            test_callable_spec(self.function, args, kwargs)
+        return run(self.function, *args, timeout=self.timeout, **kwargs)
+
+
+def offload(function=None, timeout=None, debug=False):
+    """Replace request.handler with one running it in the process pool.
+
+    If a function is given, it is run (with the request's params) in
+    place of the page handler. Runs before other tools which wrap the
+    handler (like ``tools.json_out``), so that they wrap the offloaded one.
+    """
+    request = cherrypy.serving.request
+    # request.handler may be None if e.g. the caching tool has already
+    # attached a response body.
+    if request.handler is None:
+        return
+    request.handler = OffloadHandler(request.handler, function, timeout)
+    if debug:
+        cherrypy.log('Offloading %r to the process pool' %
+                     request.handler.function, 'TOOLS.OFFLOAD')
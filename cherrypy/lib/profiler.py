@@ -22,6 +22,21 @@ You can profile any of your pages as follows::
 You can also turn on profiling for all requests
 using the ``make_app`` function as WSGI middleware.
 
+That profiles every request with the pure-Python ``profile`` module, which
+slows them down a lot, and writes a file per request. To profile under real
+load, pass ``sample_rate`` instead: then only one request in every
+``sample_rate`` is profiled, using ``cProfile``, and the profiles of the
+last ``window`` of those are kept in memory rather than on disk. Pass
+``stack_interval`` too, to also sample the stacks of all request threads
+every so many seconds, for flame graphs::
+
+    app = profiler.make_app(app, sample_rate=100, stack_interval=0.01)
+    cherrypy.tree.mount(app.profiler, '/profiler')
+
+Browse /profiler for the aggregated statistics, or fetch /profiler/stacks
+for the sampled stacks in the "collapsed" format that ``flamegraph.pl``,
+speedscope and similar tools read.
+
 CherryPy developers
 ===================
 
@@ -33,10 +48,13 @@ module from the command line, it will call ``serve()`` for you.
 
 """
 
+import collections
 import io
+import itertools
 import os
 import os.path
 import sys
+import threading
 import warnings
 
 import cherrypy
@@ -63,6 +81,11 @@ except ImportError:
     profile = None
     pstats = None
 
+try:
+    import cProfile
+except ImportError:
+    cProfile = None
+
 
 _count = 0
 
@@ -159,9 +182,183 @@ class ProfileAggregator(Profiler):
         return result
 
 
+class SamplingProfiler(Profiler):
+
+    """Profile one call in every ``sample_rate`` with cProfile, in memory.
+
+    The profiles of the last ``window`` sampled calls are aggregated into
+    the 'sampled' report. Only one call is profiled at a time; a sample
+    which comes up while another call is being profiled is skipped.
+
+    If ``stack_interval`` is given, a :class:`StackSampler` also records
+    the stacks of request threads every ``stack_interval`` seconds, while
+    the engine is started. Call :meth:`stop` to stop it for good.
+    """
+
+    def __init__(self, sample_rate=100, window=100, stack_interval=None):
+        if cProfile is None:
+            warnings.warn('Your installation of Python does not have the '
+                          'cProfile module; no calls will be profiled.')
+        self.path = None
+        self.sample_rate = sample_rate
+        self.profiles = collections.deque(maxlen=window)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self.sampler = None
+        if stack_interval:
+            self.sampler = StackSampler(stack_interval)
+            cherrypy.engine.subscribe('start', self.sampler.start)
+            cherrypy.engine.subscribe('stop', self.sampler.stop)
+            if cherrypy.engine.state == cherrypy.engine.states.STARTED:
+                self.sampler.start()
+
+    def stop(self):
+        """Stop the stack sampler, and detach it from the engine."""
+        if self.sampler is not None:
+            cherrypy.engine.unsubscribe('start', self.sampler.start)
+            cherrypy.engine.unsubscribe('stop', self.sampler.stop)
+            self.sampler.stop()
+
+    def run(self, func, *args, **params):
+        """Call func, profiling it if this call is sampled."""
+        if cProfile is None or next(self._counter) % self.sample_rate:
+            return func(*args, **params)
+        # Profilers can't overlap (since Python 3.12, even across threads).
+        if not self._lock.acquire(False):
+            return func(*args, **params)
+        try:
+            prof = cProfile.Profile()
+            try:
+                return prof.runcall(func, *args, **params)
+            finally:
+                prof.create_stats()
+                self.profiles.append(prof)
+        finally:
+            self._lock.release()
+
+    def statfiles(self):
+        """:rtype: list of available profiles.
+        """
+        return ['sampled'] if self.profiles else []
+
+    def get_stats(self, stream=None):
+        """Return a pstats.Stats of the profiles in the window, or None."""
+        profiles = list(self.profiles)
+        if not profiles:
+            return None
+        s = pstats.Stats(profiles[0], stream=stream)
+        for prof in profiles[1:]:
+            s.add(prof)
+        return s
+
+    def stats(self, filename, sortby='cumulative'):
+        """:rtype stats(index): output of print_stats() for the given profile.
+        """
+        sio = io.StringIO()
+        s = self.get_stats(sio)
+        if s is None:
+            return 'No requests have been profiled yet.'
+        sio.write('%d sampled calls\n\n' % len(self.profiles))
+        s.strip_dirs()
+        s.sort_stats(sortby)
+        s.print_stats()
+        return sio.getvalue()
+
+    @cherrypy.expose
+    def menu(self):
+        yield '<h2>Profiling runs</h2>'
+        yield "<a href='report?filename=sampled' target='main'>sampled</a>"
+        if self.sampler is not None:
+            yield "<br /><a href='stacks' target='main'>stacks</a>"
+
+    @cherrypy.expose
+    def stacks(self):
+        cherrypy.response.headers['Content-Type'] = 'text/plain'
+        if self.sampler is None:
+            raise cherrypy.NotFound()
+        return self.sampler.collapsed()
+
+
+class StackSampler(object):
+
+    """A thread which samples the stacks of request threads periodically.
+
+    The stacks are counted in ``stacks``, keyed by a tuple of frames
+    (thread name first, innermost frame last); :meth:`collapsed` renders
+    them for flame graph tools. Unless ``request_threads_only`` is False,
+    only threads which are running a CherryPy request are sampled, so that
+    idle worker threads don't drown out the rest.
+    """
+
+    def __init__(self, interval=0.01, request_threads_only=True):
+        self.interval = interval
+        self.request_threads_only = request_threads_only
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start sampling in a daemon thread."""
+        if self.thread is None or not self.thread.is_alive():
+            self._stop.clear()
+            self.thread = threading.Thread(
+                target=self._run, name='CP Stack Sampler')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self):
+        """Stop sampling, and wait for the thread to finish."""
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """Record the current stack of each (request) thread once."""
+        names = dict((t.ident, t.name) for t in threading.enumerate())
+        request_run = cherrypy._cprequest.Request.run.__code__
+        me = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            in_request = False
+            while frame is not None:
+                code = frame.f_code
+                if code is request_run:
+                    in_request = True
+                stack.append('%s:%s' % (
+                    os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            if self.request_threads_only and not in_request:
+                continue
+            stack.append(names.get(ident, str(ident)))
+            stack.reverse()
+            self.stacks[tuple(stack)] += 1
+        self.samples += 1
+
+    def collapsed(self):
+        """Return the stacks as 'frame;frame;frame count' lines."""
+        return ''.join(
+            '%s %d\n' % (';'.join(stack), count)
+            for stack, count in sorted(self.stacks.items())
+        )
+
+    def clear(self):
+        """Forget the stacks sampled so far."""
+        self.stacks.clear()
+        self.samples = 0
+
+
 class make_app:
 
-    def __init__(self, nextapp, path=None, aggregate=False):
+    def __init__(self, nextapp, path=None, aggregate=False,
+                 sample_rate=None, window=100, stack_interval=None):
         """Make a WSGI middleware app which wraps 'nextapp' with profiling.
 
         nextapp
@@ -176,6 +373,16 @@ class make_app:
             a single file. If False (the default), each HTTP request will
             dump its profile data into a separate file.
 
+        sample_rate
+            if given, profile only one in every sample_rate HTTP requests,
+            with cProfile, aggregating the last ``window`` of them in memory
+            (see :class:`SamplingProfiler`). ``path`` and ``aggregate``
+            are then ignored.
+
+        stack_interval
+            with sample_rate, also sample the stacks of request threads
+            every stack_interval seconds.
+
         """
         if profile is None or pstats is None:
             msg = ('Your installation of Python does not have a profile '
@@ -187,7 +394,10 @@ class make_app:
 
         self.nextapp = nextapp
         self.aggregate = aggregate
-        if aggregate:
+        if sample_rate:
+            self.profiler = SamplingProfiler(
+                sample_rate, window, stack_interval)
+        elif aggregate:
             self.profiler = ProfileAggregator(path)
         else:
             self.profiler = Profiler(path)
@@ -0,0 +1,278 @@
+"""Per-client rate limiting, with a 429 for clients over their limit.
+
+Turn on ``tools.ratelimit`` to allow each client ``rate`` requests per
+``period`` seconds, in bursts of up to ``burst`` requests (by default,
+``rate``)::
+
+    [/api]
+    tools.ratelimit.on = True
+    tools.ratelimit.rate = 100
+    tools.ratelimit.period = 60
+    tools.ratelimit.burst = 20
+
+Requests over the limit get a 429 response with a ``Retry-After`` header.
+Every response carries ``RateLimit-Limit``, ``RateLimit-Remaining`` and
+``RateLimit-Reset`` headers, per the IETF draft on rate limit headers.
+
+Clients are told apart by ``key``:
+
+ * ``'ip'`` (the default): ``request.remote.ip``, as rewritten by
+   ``tools.proxy`` if it's on;
+ * ``'session'``: the session id cookie (``session_cookie``), falling
+   back to the IP address for requests without one;
+ * ``'header'``: the value of the request header named by ``header``
+   (an API key, say), falling back to the IP address.
+
+The tool runs just after ``tools.proxy``, before the request body is
+read, so that requests which are turned away don't pay for it. Limits
+are kept in a ``store``, by ``name`` (by default, the application's
+script name) and client key: give a path its own ``name`` to limit it
+separately. The default :class:`MemoryStore` keeps them in this process;
+a :class:`SQLiteStore` shares them among the processes on one host::
+
+    [/]
+    tools.ratelimit.store = cherrypy.lib.ratelimit.SQLiteStore(
+        '/var/run/myapp/ratelimit.db')
+
+Limits follow the generic cell rate algorithm (GCRA), a token bucket
+which keeps a single number per client: the time at which the client's
+bucket will be full again. Requests allowed and limited are counted in
+the 'CherryPy Rate Limit' namespace of :mod:`cpstats <cherrypy.lib.cpstats>`.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import cherrypy
+
+
+if not hasattr(logging, 'statistics'):
+    logging.statistics = {}
+
+_stats_lock = threading.Lock()
+
+ratelimit_stats = logging.statistics.setdefault('CherryPy Rate Limit', {})
+ratelimit_stats.update({
+    'Enabled': True,
+    'Total Allowed': 0,
+    'Total Limited': 0,
+})
+
+
+def _record(name):
+    with _stats_lock:
+        ratelimit_stats[name] += 1
+
+
+class MemoryStore(object):
+    """Keep limits in this process, in dicts sharded by key.
+
+    Each shard has its own lock, so that request threads rarely wait on
+    each other. Entries whose time has passed carry no state, and are
+    dropped from a shard every ``prune_interval`` updates to it.
+    """
+
+    prune_interval = 1000
+
+    def __init__(self, shards=16):
+        """Initialize the store, with the given number of shards."""
+        self.shards = [({}, threading.Lock()) for i in range(shards)]
+        self._updates = [0] * shards
+
+    def update(self, key, func, now):
+        """Replace the key's value with func(value); return func's result.
+
+        func is passed the value (None if there's none) and returns a
+        (new value or None to keep the old one, result) pair.
+        """
+        index = hash(key) % len(self.shards)
+        values, lock = self.shards[index]
+        with lock:
+            value, result = func(values.get(key))
+            if value is not None:
+                values[key] = value
+            self._updates[index] += 1
+            if self._updates[index] >= self.prune_interval:
+                self._updates[index] = 0
+                for k in [k for k, v in values.items() if v <= now]:
+                    del values[k]
+        return result
+
+    def __len__(self):
+        """Return the number of keys kept."""
+        return sum(len(values) for values, lock in self.shards)
+
+
+class SQLiteStore(object):
+    """Keep limits in an SQLite database, which processes may share.
+
+    The database is kept in write-ahead logging mode, and each thread
+    uses its own connection. Entries whose time has passed are deleted
+    every ``prune_interval`` updates (by this process).
+    """
+
+    prune_interval = 1000
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS ratelimit (
+            key TEXT PRIMARY KEY,
+            value REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path, timeout=5):
+        """Initialize the store, creating its database if need be."""
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._updates = 0
+        conn = self.get_connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(self.schema)
+
+    def get_connection(self):
+        """Return the database connection for the current thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def update(self, key, func, now):
+        """Replace the key's value with func(value); return func's result.
+
+        See :meth:`MemoryStore.update`.
+        """
+        conn = self.get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM ratelimit WHERE key = ?', (key,),
+            ).fetchone()
+            value, result = func(row and row[0])
+            if value is not None:
+                conn.execute(
+                    'INSERT OR REPLACE INTO ratelimit (key, value) '
+                    'VALUES (?, ?)', (key, value))
+            self._updates += 1
+            if self._updates >= self.prune_interval:
+                self._updates = 0
+                conn.execute(
+                    'DELETE FROM ratelimit WHERE value <= ?', (now,))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+
+default_store = MemoryStore()
+"""The store of the limits of tools.ratelimit, unless given another."""
+
+
+class Limit(object):
+    """The outcome of a request against a client's limit."""
+
+    def __init__(self, allowed, limit, remaining, reset, retry_after):
+        """Initialize the outcome; reset and retry_after are in seconds."""
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+
+    @property
+    def headers(self):  # noqa: D401; irrelevant for properties
+        """The RateLimit-* (and if refused, Retry-After) response headers."""
+        headers = {
+            'RateLimit-Limit': str(self.limit),
+            'RateLimit-Remaining': str(self.remaining),
+            'RateLimit-Reset': str(int(math.ceil(self.reset))),
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(int(math.ceil(self.retry_after)))
+        return headers
+
+
+def check(key, rate, period=1, burst=None, store=None, now=None):
+    """Count a request against the key's limit; return a :class:`Limit`.
+
+    The limit is ``rate`` requests per ``period`` seconds, in bursts of
+    up to ``burst`` (by default, ``rate``). A request which is refused
+    doesn't count. Raise ValueError if the limit makes no sense.
+    """
+    if store is None:
+        store = default_store
+    if burst is None:
+        burst = rate
+    if not rate > 0:
+        raise ValueError('The rate limit must be positive, not %r.' % (rate,))
+    if not period > 0:
+        raise ValueError(
+            'The rate limit period must be positive, not %r.' % (period,))
+    if not burst >= 1:
+        raise ValueError(
+            'The rate limit burst must be at least 1, not %r.' % (burst,))
+    if now is None:
+        now = time.time()
+    interval = period / rate
+
+    def gcra(tat):
+        # tat, the theoretical arrival time, is when the bucket is full.
+        tat = max(tat or now, now)
+        allow_at = tat + interval - burst * interval
+        if now < allow_at:
+            return None, Limit(False, burst, 0, tat - now, allow_at - now)
+        tat += interval
+        remaining = int((now - (tat - burst * interval)) // interval)
+        return tat, Limit(True, burst, remaining, tat - now, 0)
+
+    return store.update(key, gcra, now)
+
+
+def _set_headers(headers):
+    # Set after the error response, which removes any Retry-After header.
+    cherrypy.serving.response.headers.update(headers)
+
+
+def ratelimit(rate=60, period=60, burst=None, key='ip', header=None,
+              session_cookie='session_id', name=None, store=None,
+              debug=False):
+    """Refuse the request with a 429 if its client is over the limit.
+
+    See :mod:`cherrypy.lib.ratelimit` for the arguments.
+    """
+    request = cherrypy.serving.request
+    client = None
+    if key == 'session':
+        morsel = request.cookie.get(session_cookie)
+        client = morsel and 'session:' + morsel.value
+    elif key == 'header':
+        value = request.headers.get(header)
+        client = value and 'header:' + value
+    elif key != 'ip':
+        raise ValueError('Unknown tools.ratelimit.key %r.' % (key,))
+    if not client:
+        client = 'ip:' + str(request.remote.ip)
+    if name is None:
+        name = request.app.script_name if request.app else ''
+
+    limit = check(name + ' ' + client, rate, period, burst, store)
+    if limit.allowed:
+        _record('Total Allowed')
+        cherrypy.serving.response.headers.update(limit.headers)
+        return
+
+    _record('Total Limited')
+    if debug:
+        cherrypy.log('Limiting %s (retry after %.3f seconds)' %
+                     (client, limit.retry_after), 'TOOLS.RATELIMIT')
+    request.hooks.attach('before_finalize', _set_headers,
+                         headers=limit.headers)
+    raise cherrypy.HTTPError(429, 'Too many requests; please retry later.')
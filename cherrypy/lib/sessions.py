@@ -105,9 +105,16 @@ import datetime
 import os
 import time
 import threading
+import base64
 import binascii
 import pickle
 import contextlib
+import hashlib
+import hmac
+import math
+import queue
+import sqlite3
+import zlib
 
 import zc.lockfile
 
@@ -115,11 +122,107 @@ import cherrypy
 from cherrypy.lib import httputil
 from cherrypy.lib import locking
 from cherrypy.lib import is_iterator
+from cherrypy._json import json
 
 
 missing = object()
 
 
+def _encode_expiration(expiration_time):
+    """Return the given datetime as (POSIX timestamp, UTC offset or None)."""
+    offset = expiration_time.utcoffset()
+    if offset is not None:
+        offset = offset.total_seconds()
+    return expiration_time.timestamp(), offset
+
+
+def _decode_expiration(timestamp, offset):
+    """Return the datetime encoded by _encode_expiration."""
+    if offset is None:
+        return datetime.datetime.fromtimestamp(timestamp)
+    tz = datetime.timezone(datetime.timedelta(seconds=offset))
+    return datetime.datetime.fromtimestamp(timestamp, tz)
+
+
+class PickleSerializer(object):
+
+    """Serialize session data with pickle. Any picklable data is allowed."""
+
+    def __init__(self, protocol=pickle.HIGHEST_PROTOCOL):
+        self.protocol = protocol
+
+    def dumps(self, data, expiration_time):
+        """Return the session data and its expiration time as bytes."""
+        return pickle.dumps((data, expiration_time), self.protocol)
+
+    def loads(self, blob):
+        """Return the (data, expiration_time) pair stored in the blob."""
+        return pickle.loads(blob)
+
+
+class JSONSerializer(object):
+
+    """Serialize session data as compact JSON.
+
+    Session data is limited to what JSON can represent: tuples come back
+    as lists, and dict keys must be strings.
+    """
+
+    def __init__(self):
+        self.encoder = json.JSONEncoder(separators=(',', ':'))
+        self.decoder = json.JSONDecoder()
+
+    def dumps(self, data, expiration_time):
+        """Return the session data and its expiration time as bytes."""
+        stored = [data]
+        stored.extend(_encode_expiration(expiration_time))
+        return self.encoder.encode(stored).encode('utf-8')
+
+    def loads(self, blob):
+        """Return the (data, expiration_time) pair stored in the blob."""
+        data, timestamp, offset = self.decoder.decode(blob.decode('utf-8'))
+        return data, _decode_expiration(timestamp, offset)
+
+
+class MsgpackSerializer(object):
+
+    """Serialize session data with MessagePack.
+
+    This is both smaller and faster than JSON, and allows bytes values as
+    well, but otherwise has the same limits. Requires the Python
+    `msgpack <https://pypi.org/project/msgpack>`_ package.
+    """
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+
+    def dumps(self, data, expiration_time):
+        """Return the session data and its expiration time as bytes."""
+        stored = [data]
+        stored.extend(_encode_expiration(expiration_time))
+        return self.msgpack.packb(stored, use_bin_type=True)
+
+    def loads(self, blob):
+        """Return the (data, expiration_time) pair stored in the blob."""
+        data, timestamp, offset = self.msgpack.unpackb(blob, raw=False)
+        return data, _decode_expiration(timestamp, offset)
+
+
+serializers = {
+    'pickle': PickleSerializer,
+    'json': JSONSerializer,
+    'msgpack': MsgpackSerializer,
+}
+"A map of {name: serializer class} pairs, for the 'serializer' option."
+
+
+COMPRESSED_PREFIX = b'\x00zlib:'
+"""
+The prefix of compressed, serialized session data. None of the serializers
+produce output starting with a null byte."""
+
+
 class Session(object):
 
     """A CherryPy dict-like Session object (one per request)."""
@@ -173,6 +276,29 @@ class Session(object):
     debug = False
     'If True, log debug information.'
 
+    serializer = 'pickle'
+    """
+    The codec used by persistent backends to store session data: one of the
+    names in `serializers`, or an object with the same dumps and loads
+    methods as PickleSerializer. Stored sessions can only be read back with
+    the serializer they were written with."""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    'The pickle protocol used by the pickle serializer.'
+
+    compress_threshold = None
+    """
+    If not None, serialized session data of at least this many bytes is
+    compressed with zlib before being stored."""
+
+    skip_unchanged = False
+    """
+    If True, save() does not write sessions whose data has not changed
+    since they were loaded, unless more than half of their timeout has
+    passed (so that they do not expire while in use)."""
+
+    _loaded_state = None
+
     # --------------------- Session management methods --------------------- #
 
     def __init__(self, id=None, **kwargs):
@@ -182,6 +308,11 @@ class Session(object):
         for k, v in kwargs.items():
             setattr(self, k, v)
 
+        if self.serializer == 'pickle':
+            self.serializer = PickleSerializer(self.pickle_protocol)
+        elif isinstance(self.serializer, str):
+            self.serializer = serializers[self.serializer]()
+
         self.originalid = id
         self.missing = False
         if id is None:
@@ -231,6 +362,7 @@ class Session(object):
             if self.debug:
                 cherrypy.log('Old lock released.', 'TOOLS.SESSIONS')
 
+        self._loaded_state = None
         self.id = None
         while self.id is None:
             self.id = self.generate_id()
@@ -254,6 +386,35 @@ class Session(object):
         """Return a new session id."""
         return binascii.hexlify(os.urandom(20)).decode('ascii')
 
+    def _serialize(self, expiration_time):
+        """Return the session data and expiration time as bytes to store."""
+        blob = self.serializer.dumps(self._data, expiration_time)
+        threshold = self.compress_threshold
+        if threshold is not None and len(blob) >= threshold:
+            blob = COMPRESSED_PREFIX + zlib.compress(blob)
+        return blob
+
+    def _deserialize(self, blob):
+        """Return the (data, expiration_time) pair stored as bytes."""
+        if blob.startswith(COMPRESSED_PREFIX):
+            blob = zlib.decompress(blob[len(COMPRESSED_PREFIX):])
+        return self.serializer.loads(blob)
+
+    def _digest(self, expiration_time):
+        """Return a hash of the session data as serialized."""
+        blob = self.serializer.dumps(self._data, expiration_time)
+        return hashlib.sha1(blob).digest()
+
+    def _is_unchanged(self, expiration_time):
+        """Return True if saving with the given expiry may be skipped."""
+        if self._loaded_state is None:
+            return False
+        digest, loaded_expiration = self._loaded_state
+        half_timeout = datetime.timedelta(seconds=self.timeout * 30)
+        if loaded_expiration < expiration_time - half_timeout:
+            return False
+        return self._digest(loaded_expiration) == digest
+
     def save(self):
         """Save session data."""
         try:
@@ -262,6 +423,11 @@ class Session(object):
             if self.loaded:
                 t = datetime.timedelta(seconds=self.timeout * 60)
                 expiration_time = self.now() + t
+                if self._is_unchanged(expiration_time):
+                    if self.debug:
+                        cherrypy.log('Skipping save of unchanged session %r.'
+                                     % self.id, 'TOOLS.SESSIONS')
+                    return
                 if self.debug:
                     cherrypy.log('Saving session %r with expiry %s' %
                                  (self.id, expiration_time),
@@ -293,6 +459,8 @@ class Session(object):
                 cherrypy.log('Data loaded for session %r.' % self.id,
                              'TOOLS.SESSIONS')
             self._data = data[0]
+            if self.skip_unchanged:
+                self._loaded_state = self._digest(data[1]), data[1]
         self.loaded = True
 
         # Stick the clean_thread in the class, not the instance.
@@ -312,6 +480,7 @@ class Session(object):
 
     def delete(self):
         """Delete stored session data."""
+        self._loaded_state = None
         self._delete()
         if self.debug:
             cherrypy.log('Deleted session %s.' % self.id,
@@ -460,18 +629,32 @@ class FileSession(Session):
 
     storage_path
         The folder where session data will be saved. Each session
-        will be saved as pickle.dump(data, expiration_time) in its own file;
-        the filename will be self.SESSION_PREFIX + self.id.
+        will be saved as serializer.dumps(data, expiration_time) in its own
+        file; the filename will be self.SESSION_PREFIX + self.id.
 
     lock_timeout
         A timedelta or numeric seconds indicating how long
         to block acquiring a lock. If None (default), acquiring a lock
         will block indefinitely.
+
+    hash_depth
+        The number of levels of subdirectories, each named after the next
+        two characters of the session id, in which to spread the session
+        files below storage_path. The default, 0, keeps every file directly
+        in storage_path; use 1 or 2 to keep directories small when there
+        are very many sessions.
+
+    Where ``fcntl`` is available, session locks are held with ``flock``, so
+    a request waiting for a locked session wakes as soon as it is released.
+    The modification time of each session file is set to its expiration
+    time, which lets ``clean_up`` find expired sessions without loading
+    them.
     """
 
     SESSION_PREFIX = 'session-'
     LOCK_SUFFIX = '.lock'
     pickle_protocol = pickle.HIGHEST_PROTOCOL
+    hash_depth = 0
 
     def __init__(self, id=None, **kwargs):
         # The 'storage_path' arg is required for file-based sessions.
@@ -502,7 +685,12 @@ class FileSession(Session):
             setattr(cls, k, v)
 
     def _get_file_path(self):
-        f = os.path.join(self.storage_path, self.SESSION_PREFIX + self.id)
+        subdirs = [
+            self.id[level * 2:level * 2 + 2] or '_'
+            for level in range(self.hash_depth)
+        ]
+        f = os.path.join(
+            self.storage_path, *subdirs, self.SESSION_PREFIX + self.id)
         if not os.path.abspath(f).startswith(self.storage_path):
             raise cherrypy.HTTPError(400, 'Invalid session id in cookie.')
         return f
@@ -519,10 +707,10 @@ class FileSession(Session):
         try:
             f = open(path, 'rb')
             try:
-                return pickle.load(f)
+                return self._deserialize(f.read())
             finally:
                 f.close()
-        except (IOError, EOFError):
+        except (IOError, EOFError, ValueError):
             e = sys.exc_info()[1]
             if self.debug:
                 cherrypy.log('Error loading the session pickle: %s' %
@@ -532,11 +720,14 @@ class FileSession(Session):
     def _save(self, expiration_time):
         assert self.locked, ('The session was saved without being locked.  '
                              "Check your tools' priority levels.")
-        f = open(self._get_file_path(), 'wb')
+        path = self._get_file_path()
+        f = open(path, 'wb')
         try:
-            pickle.dump((self._data, expiration_time), f, self.pickle_protocol)
+            f.write(self._serialize(expiration_time))
         finally:
             f.close()
+        expires = expiration_time.timestamp()
+        os.utime(path, (expires, expires))
 
     def _delete(self):
         assert self.locked, ('The session deletion without being locked.  '
@@ -551,14 +742,19 @@ class FileSession(Session):
         if path is None:
             path = self._get_file_path()
         path += self.LOCK_SUFFIX
-        checker = locking.LockChecker(self.id, self.lock_timeout)
-        while not checker.expired():
-            try:
-                self.lock = zc.lockfile.LockFile(path)
-            except zc.lockfile.LockError:
-                time.sleep(0.1)
-            else:
-                break
+        if self.hash_depth:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if locking.fcntl is not None:
+            self.lock = locking.FileLock(path, self.lock_timeout)
+        else:
+            checker = locking.LockChecker(self.id, self.lock_timeout)
+            while not checker.expired():
+                try:
+                    self.lock = zc.lockfile.LockFile(path)
+                except zc.lockfile.LockError:
+                    time.sleep(0.1)
+                else:
+                    break
         self.locked = True
         if self.debug:
             cherrypy.log('Lock acquired.', 'TOOLS.SESSIONS')
@@ -566,59 +762,385 @@ class FileSession(Session):
     def release_lock(self, path=None):
         """Release the lock on the currently-loaded session data."""
         self.lock.close()
-        with contextlib.suppress(FileNotFoundError):
-            os.remove(self.lock._path)
+        if not isinstance(self.lock, locking.FileLock):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.lock._path)
         self.locked = False
 
+    def _iter_session_files(self):
+        """Yield an os.DirEntry for each session file under storage_path."""
+        dirs = [self.storage_path]
+        for level in range(self.hash_depth):
+            dirs = [
+                entry.path
+                for dir in dirs
+                for entry in os.scandir(dir)
+                if entry.is_dir()
+            ]
+        for dir in dirs:
+            for entry in os.scandir(dir):
+                is_session = (
+                    entry.name.startswith(self.SESSION_PREFIX)
+                    and not entry.name.endswith(self.LOCK_SUFFIX)
+                )
+                if is_session:
+                    yield entry
+
     def clean_up(self):
         """Clean up expired sessions."""
-        now = self.now()
-        # Iterate over all session files in self.storage_path
-        for fname in os.listdir(self.storage_path):
-            have_session = (
-                fname.startswith(self.SESSION_PREFIX)
-                and not fname.endswith(self.LOCK_SUFFIX)
+        now = self.now().timestamp()
+        for entry in self._iter_session_files():
+            # The mtime of a session file is its expiration time (see
+            #   _save), so live sessions are skipped without being locked.
+            try:
+                if entry.stat().st_mtime >= now:
+                    continue
+            except FileNotFoundError:
+                continue
+
+            path = entry.path
+            self.acquire_lock(path)
+            if self.debug:
+                # This is a bit of a hack, since we're calling clean_up
+                # on the first instance rather than the entire class,
+                # so depending on whether you have "debug" set on the
+                # path of the first session called, this may not run.
+                cherrypy.log('Cleanup lock acquired.', 'TOOLS.SESSIONS')
+
+            try:
+                # Check again under the lock, in case the session was
+                #   saved (and so renewed) in the meantime. Files written
+                #   before mtime tracked expiry carry their save time
+                #   instead, so trust only the pickled expiration time.
+                with contextlib.suppress(FileNotFoundError):
+                    if os.stat(path).st_mtime < now:
+                        contents = self._load(path)
+                        if contents is not None:
+                            data, expiration_time = contents
+                            if expiration_time < self.now():
+                                # Session expired: deleting it
+                                os.unlink(path)
+                            else:
+                                expires = expiration_time.timestamp()
+                                os.utime(path, (expires, expires))
+            finally:
+                self.release_lock(path)
+
+    def __len__(self):
+        """Return the number of active sessions."""
+        return sum(1 for entry in self._iter_session_files())
+
+
+def _process_exists(pid):
+    """Return False if no process with the given pid is running."""
+    if os.name != 'posix':
+        # os.kill would terminate the process on Windows.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SqliteSession(Session):
+
+    """Implementation of the SQLite backend for sessions
+
+    All sessions are kept in one SQLite database in write-ahead logging
+    mode, which may be shared by several processes on the same host.
+
+    storage_path
+        The folder where the database, named self.db_name, will be saved.
+
+    lock_timeout
+        A timedelta or numeric seconds indicating how long
+        to block acquiring a lock. If None (default), acquiring a lock
+        will block indefinitely.
+
+    clean_batch_size
+        The largest number of expired sessions removed by any one DELETE
+        statement during cleanup, so that writers in other threads and
+        processes are never held up for long.
+
+    Each request thread uses its own connection, opened on the engine's
+    'start_thread' channel (or on first use) and closed on its
+    'stop_thread' channel.
+
+    Session locks are rows which record the pid of the process holding
+    them. A lock held by a process which no longer exists is taken over
+    by the next request waiting for it.
+    """
+
+    db_name = 'sessions.db'
+    clean_batch_size = 500
+
+    # Class-level objects. Don't rebind these!
+    connections = {}
+    'A map of {thread ident: sqlite3.Connection} pairs.'
+    thread_idents = {}
+    "A map of {thread index: thread ident} pairs, as seen on 'start_thread'."
+    lock_released = threading.Condition()
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS session (
+            id TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            expiration_time REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS session_expiration_time
+            ON session (expiration_time);
+        CREATE TABLE IF NOT EXISTS session_lock (
+            id TEXT PRIMARY KEY,
+            pid INTEGER NOT NULL,
+            acquired REAL NOT NULL
+        );
+    """
+
+    def __init__(self, id=None, **kwargs):
+        kwargs.setdefault('lock_timeout', None)
+
+        Session.__init__(self, id=id, **kwargs)
+
+        # validate self.lock_timeout
+        if isinstance(self.lock_timeout, (int, float)):
+            self.lock_timeout = datetime.timedelta(seconds=self.lock_timeout)
+        if not isinstance(self.lock_timeout, (datetime.timedelta, type(None))):
+            raise ValueError(
+                'Lock timeout must be numeric seconds or a timedelta instance.'
             )
-            if have_session:
-                # We have a session file: lock and load it and check
-                #   if it's expired. If it fails, nevermind.
-                path = os.path.join(self.storage_path, fname)
-                self.acquire_lock(path)
-                if self.debug:
-                    # This is a bit of a hack, since we're calling clean_up
-                    # on the first instance rather than the entire class,
-                    # so depending on whether you have "debug" set on the
-                    # path of the first session called, this may not run.
-                    cherrypy.log('Cleanup lock acquired.', 'TOOLS.SESSIONS')
 
-                try:
-                    contents = self._load(path)
-                    # _load returns None on IOError
-                    if contents is not None:
-                        data, expiration_time = contents
-                        if expiration_time < now:
-                            # Session expired: deleting it
-                            os.unlink(path)
-                finally:
-                    self.release_lock(path)
+    @classmethod
+    def setup(cls, **kwargs):
+        """Set up the storage system for SQLite-based sessions.
+
+        This should only be called once per process; this will be done
+        automatically when using sessions.init (as the built-in Tool does).
+        """
+        # The 'storage_path' arg is required for SQLite-based sessions.
+        kwargs['storage_path'] = os.path.abspath(kwargs['storage_path'])
+
+        for k, v in kwargs.items():
+            setattr(cls, k, v)
+
+        cls.db_path = os.path.join(cls.storage_path, cls.db_name)
+        conn = cls.get_connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(cls.schema)
+
+        cherrypy.engine.subscribe('start_thread', cls.start_thread)
+        cherrypy.engine.subscribe('stop_thread', cls.stop_thread)
+        cherrypy.engine.subscribe('stop', cls.close_connections)
+
+    @classmethod
+    def get_connection(cls):
+        """Return the database connection for the current thread."""
+        ident = threading.get_ident()
+        try:
+            return cls.connections[ident]
+        except KeyError:
+            # Connections may be closed on 'stop_thread' by the main thread.
+            conn = sqlite3.connect(
+                cls.db_path, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            cls.connections[ident] = conn
+            # Threads started before setup ran were never seen on
+            #   'start_thread'; register them so 'stop_thread' finds them.
+            thread_manager = getattr(cherrypy.engine, 'thread_manager', None)
+            if thread_manager is not None:
+                thread_index = thread_manager.threads.get(ident)
+                if thread_index is not None:
+                    cls.thread_idents[thread_index] = ident
+            return conn
+
+    @classmethod
+    def start_thread(cls, thread_index):
+        """Open a database connection for a new request thread."""
+        cls.thread_idents[thread_index] = threading.get_ident()
+        cls.get_connection()
+
+    @classmethod
+    def stop_thread(cls, thread_index):
+        """Close the database connection of a stopped request thread."""
+        ident = cls.thread_idents.pop(thread_index, None)
+        conn = cls.connections.pop(ident, None)
+        if conn is not None:
+            conn.close()
+
+    @classmethod
+    def close_connections(cls):
+        """Close all database connections."""
+        cls.thread_idents.clear()
+        while cls.connections:
+            ident, conn = cls.connections.popitem()
+            conn.close()
+
+    def _exists(self):
+        cur = self.get_connection().execute(
+            'SELECT 1 FROM session WHERE id = ?', (self.id,))
+        return cur.fetchone() is not None
+
+    def _load(self):
+        assert self.locked, ('The session load without being locked.  '
+                             "Check your tools' priority levels.")
+        cur = self.get_connection().execute(
+            'SELECT data FROM session WHERE id = ?', (self.id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        return self._deserialize(row[0])
+
+    def _save(self, expiration_time):
+        assert self.locked, ('The session was saved without being locked.  '
+                             "Check your tools' priority levels.")
+        data = self._serialize(expiration_time)
+        self.get_connection().execute(
+            'INSERT OR REPLACE INTO session (id, data, expiration_time) '
+            'VALUES (?, ?, ?)',
+            (self.id, data, expiration_time.timestamp()))
+
+    def _delete(self):
+        assert self.locked, ('The session deletion without being locked.  '
+                             "Check your tools' priority levels.")
+        self.get_connection().execute(
+            'DELETE FROM session WHERE id = ?', (self.id,))
+
+    def acquire_lock(self):
+        """Acquire an exclusive lock on the currently-loaded session data."""
+        conn = self.get_connection()
+        checker = locking.LockChecker(self.id, self.lock_timeout)
+        delay = 0.001
+        while True:
+            cur = conn.execute(
+                'INSERT OR IGNORE INTO session_lock (id, pid, acquired) '
+                'VALUES (?, ?, ?)', (self.id, os.getpid(), time.time()))
+            if cur.rowcount == 1:
+                break
+            if self._release_stale_lock(conn):
+                continue
+            checker.expired()
+            # Holders in this process wake us on release; holders in other
+            #   processes are only noticed when the wait times out.
+            with self.lock_released:
+                self.lock_released.wait(delay)
+            delay = min(delay * 2, 0.1)
+        self.locked = True
+        if self.debug:
+            cherrypy.log('Lock acquired.', 'TOOLS.SESSIONS')
+
+    def _release_stale_lock(self, conn):
+        """Remove the lock on this session if its holder has died.
+
+        Return True if the lock is gone, so that it may be acquired again.
+        """
+        row = conn.execute(
+            'SELECT pid FROM session_lock WHERE id = ?', (self.id,)
+        ).fetchone()
+        if row is None:
+            return True
+        pid, = row
+        if pid == os.getpid() or _process_exists(pid):
+            return False
+        conn.execute(
+            'DELETE FROM session_lock WHERE id = ? AND pid = ?',
+            (self.id, pid))
+        if self.debug:
+            cherrypy.log('Removed stale lock held by process %s.' % pid,
+                         'TOOLS.SESSIONS')
+        return True
+
+    def release_lock(self):
+        """Release the lock on the currently-loaded session data."""
+        self.get_connection().execute(
+            'DELETE FROM session_lock WHERE id = ?', (self.id,))
+        self.locked = False
+        with self.lock_released:
+            self.lock_released.notify_all()
+
+    def clean_up(self):
+        """Clean up expired sessions."""
+        conn = self.get_connection()
+        now = self.now().timestamp()
+        # Delete in batches, using the expiration_time index, and skip
+        #   sessions which are locked by a request.
+        while True:
+            cur = conn.execute(
+                'DELETE FROM session WHERE id IN ('
+                'SELECT id FROM session WHERE expiration_time < ? '
+                'AND id NOT IN (SELECT id FROM session_lock) LIMIT ?)',
+                (now, self.clean_batch_size))
+            if cur.rowcount < self.clean_batch_size:
+                break
+
+        # Remove locks left behind by processes which died holding them
+        #   and which no request has waited for since.
+        conn.execute(
+            'DELETE FROM session_lock WHERE acquired < ?',
+            (time.time() - self.timeout * 60,))
 
     def __len__(self):
         """Return the number of active sessions."""
-        return len([fname for fname in os.listdir(self.storage_path)
-                    if (fname.startswith(self.SESSION_PREFIX) and
-                        not fname.endswith(self.LOCK_SUFFIX))])
+        cur = self.get_connection().execute('SELECT COUNT(*) FROM session')
+        return cur.fetchone()[0]
 
 
 class MemcachedSession(Session):
 
-    # The most popular memcached client for Python isn't thread-safe.
-    # Wrap all .get and .set operations in a single lock.
-    mc_lock = threading.RLock()
+    """Implementation of the memcached backend for sessions
 
-    # This is a separate set of locks per session id.
-    locks = {}
+    servers
+        A list of 'host:port' strings naming the memcached servers.
+
+    pool_size
+        The number of memcached clients, each with its own connections,
+        shared by the request threads. A thread checks a client out of the
+        pool for each operation, waiting if all of them are in use.
+
+    lock_timeout
+        A timedelta or numeric seconds indicating how long
+        to block acquiring a lock. If None (default), acquiring a lock
+        will block for up to lock_lease seconds, since no lock can be
+        held any longer than that.
+
+    lock_lease
+        The number of seconds after which memcached drops a session lock,
+        in case the process holding it died. Requests should hold session
+        locks for much less than this.
+
+    Session locks are memcached keys taken with ``add``, so they are also
+    respected by other processes sharing the servers. Each lock key names
+    the random token written in front of the serialized session data it
+    guards, which changes on every write. Winning the lock for the token
+    seen when checking that the session exists proves that data is still
+    current, so it is not loaded a second time.
+    """
 
     servers = ['localhost:11211']
+    pool_size = 10
+    lock_lease = 60
+
+    token_length = 16
+    'The length of the write token stored in front of the session data.'
+
+    pool = None
+    'A LIFO queue of memcached clients, filled by setup.'
+
+    _fetched = None
+
+    def __init__(self, id=None, **kwargs):
+        kwargs.setdefault('lock_timeout', None)
+
+        Session.__init__(self, id=id, **kwargs)
+
+        # validate self.lock_timeout
+        if isinstance(self.lock_timeout, (int, float)):
+            self.lock_timeout = datetime.timedelta(seconds=self.lock_timeout)
+        if not isinstance(self.lock_timeout, (datetime.timedelta, type(None))):
+            raise ValueError(
+                'Lock timeout must be numeric seconds or a timedelta instance.'
+            )
 
     @classmethod
     def setup(cls, **kwargs):
@@ -631,46 +1153,241 @@ class MemcachedSession(Session):
             setattr(cls, k, v)
 
         import memcache
-        cls.cache = memcache.Client(cls.servers)
+        cls.pool = queue.LifoQueue()
+        for i in range(cls.pool_size):
+            cls.pool.put(memcache.Client(cls.servers))
 
-    def _exists(self):
-        self.mc_lock.acquire()
+    @classmethod
+    @contextlib.contextmanager
+    def reserve_client(cls):
+        """Check a memcached client out of the pool for one operation."""
+        client = cls.pool.get()
         try:
-            return bool(self.cache.get(self.id))
+            yield client
         finally:
-            self.mc_lock.release()
+            cls.pool.put(client)
+
+    def _fetch(self):
+        """Return the stored session, remembering it and its write token."""
+        with self.reserve_client() as client:
+            stored = client.get(self.id)
+        self._fetched = self.id, time.time()
+        if isinstance(stored, bytes):
+            token = stored[:self.token_length]
+            self._stored = self._deserialize(stored[self.token_length:])
+            self._token = token.decode('ascii')
+        elif stored:
+            # Sessions saved by older versions are pickled tuples, some of
+            #   which have no token.
+            self._stored = stored[:2]
+            self._token = stored[2] if len(stored) > 2 else None
+        else:
+            self._stored = self._token = None
+        return self._stored
+
+    def _is_fetched(self):
+        """Return True if _fetch ran recently enough for the current id."""
+        if self._fetched is None:
+            return False
+        id, fetched_at = self._fetched
+        # Past the lease, the lock left by a writer may have expired.
+        return id == self.id and time.time() - fetched_at < self.lock_lease / 2
+
+    def _exists(self):
+        return bool(self._fetch())
 
     def _load(self):
-        self.mc_lock.acquire()
-        try:
-            return self.cache.get(self.id)
-        finally:
-            self.mc_lock.release()
+        # While locked, the data fetched before winning the lock is current.
+        if not (self.locked and self._is_fetched()):
+            self._fetch()
+        return self._stored
 
     def _save(self, expiration_time):
-        # Send the expiration time as "Unix time" (seconds since 1/1/1970)
-        td = int(time.mktime(expiration_time.timetuple()))
-        self.mc_lock.acquire()
-        try:
-            if not self.cache.set(self.id, (self._data, expiration_time), td):
+        # Send the expiration time as "Unix time" (seconds since 1/1/1970),
+        #   rounded up so that memcached never drops the session early.
+        td = math.ceil(expiration_time.timestamp())
+        token = binascii.hexlify(os.urandom(self.token_length // 2))
+        stored = token + self._serialize(expiration_time)
+        with self.reserve_client() as client:
+            if not client.set(self.id, stored, td):
                 raise AssertionError(
                     'Session data for id %r not set.' % self.id)
-        finally:
-            self.mc_lock.release()
+        self._stored = self._data, expiration_time
+        self._token = token.decode('ascii')
+        self._modified = True
 
     def _delete(self):
-        self.cache.delete(self.id)
+        with self.reserve_client() as client:
+            client.delete(self.id)
+        self._stored = None
+        self._modified = True
 
     def acquire_lock(self):
         """Acquire an exclusive lock on the currently-loaded session data."""
+        timeout = self.lock_timeout
+        if timeout is None:
+            timeout = datetime.timedelta(seconds=self.lock_lease)
+        checker = locking.LockChecker(self.id, timeout)
+        delay = 0.001
+        while True:
+            if not self._is_fetched():
+                self._fetch()
+            key = '%s.lock.%s' % (self.id, self._token or 'new')
+            with self.reserve_client() as client:
+                locked = client.add(key, 1, self.lock_lease)
+                if locked and self._token is None:
+                    # Nothing proves that the data is still missing (or
+                    #   still unversioned), so look again while locked.
+                    if self._fetch() is None or self._token is None:
+                        break
+                    client.delete(key)
+                elif locked:
+                    break
+            checker.expired()
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+            # The lock is held, or the data has been rewritten since we
+            #   fetched it: either way, look again.
+            self._fetched = None
+        self._lock_key = key
+        self._modified = False
         self.locked = True
-        self.locks.setdefault(self.id, threading.RLock()).acquire()
         if self.debug:
             cherrypy.log('Lock acquired.', 'TOOLS.SESSIONS')
 
     def release_lock(self):
         """Release the lock on the currently-loaded session data."""
-        self.locks[self.id].release()
+        # If the data changed, leave the lock on the old write token in
+        #   place (until its lease ends) so that nobody who read the old
+        #   data can still take it. Tokens are never reused, so the lock
+        #   stands in nobody's way.
+        if not self._modified or self._lock_key.endswith('.lock.new'):
+            with self.reserve_client() as client:
+                client.delete(self._lock_key)
+        self.locked = False
+
+    def __len__(self):
+        """Return the number of active sessions."""
+        raise NotImplementedError
+
+
+class CookieSession(Session):
+
+    """Implementation of client-side sessions, kept in the session cookie
+
+    The session id is the session data itself: serialized, signed with
+    HMAC-SHA256 and optionally encrypted. It changes whenever the data is
+    saved. Nothing is stored on the server, so there are no locks and no
+    cleanup thread, and any process which has the secret key can serve
+    any request.
+
+    secret_key
+        The key (str or bytes) with which session cookies are signed, and
+        encrypted. It must be kept secret, and be the same in every process
+        serving the application. Required.
+
+    encrypt
+        If True, session data is encrypted so that clients cannot read it.
+        Requires the Python
+        `cryptography <https://pypi.org/project/cryptography>`_ package.
+
+    max_size
+        The length of the largest cookie value save() will set; browsers
+        ignore cookies of more than about 4KB. Set compress_threshold to
+        fit more data.
+
+    Sessions are serialized with the 'json' serializer by default. Since
+    a client may send back any cookie it was given before it expires, data
+    cannot be revoked, and concurrent requests from one client each see
+    their own copy of it: the last response to set the cookie wins. Data
+    changed while a response body is streamed cannot be saved.
+    """
+
+    serializer = 'json'
+    secret_key = None
+    encrypt = False
+    max_size = 4000
+
+    _fernet = None
+    _stored = None
+
+    def __init__(self, id=None, **kwargs):
+        secret_key = kwargs.get('secret_key', self.secret_key)
+        if not secret_key:
+            raise ValueError('CookieSession requires a secret_key.')
+        if isinstance(secret_key, str):
+            secret_key = secret_key.encode('utf-8')
+        kwargs['secret_key'] = secret_key
+
+        # Nothing is stored on the server, so there is nothing to clean up.
+        kwargs['clean_freq'] = 0
+
+        if kwargs.get('encrypt', self.encrypt):
+            from cryptography.fernet import Fernet
+            key = hashlib.sha256(b'encrypt:' + secret_key).digest()
+            self._fernet = Fernet(base64.urlsafe_b64encode(key))
+
+        Session.__init__(self, id=id, **kwargs)
+
+    def _sign(self, payload):
+        return hmac.new(self.secret_key, payload, hashlib.sha256).digest()
+
+    def _encode(self, expiration_time):
+        """Return a signed cookie value holding the session data."""
+        blob = self._serialize(expiration_time)
+        if self._fernet is not None:
+            payload = self._fernet.encrypt(blob).rstrip(b'=')
+        else:
+            payload = base64.urlsafe_b64encode(blob).rstrip(b'=')
+        signature = base64.urlsafe_b64encode(self._sign(payload)).rstrip(b'=')
+        return (payload + b'.' + signature).decode('ascii')
+
+    def _decode(self, value):
+        """Return the (data, expiration_time) pair in a cookie value.
+
+        Return None if the value was not signed with our secret key.
+        """
+        try:
+            payload, signature = value.encode('ascii').rsplit(b'.', 1)
+            signature = base64.urlsafe_b64decode(
+                signature + b'=' * (-len(signature) % 4))
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+
+        payload += b'=' * (-len(payload) % 4)
+        if self._fernet is not None:
+            blob = self._fernet.decrypt(payload)
+        else:
+            blob = base64.urlsafe_b64decode(payload)
+        return self._deserialize(blob)
+
+    def _exists(self):
+        self._stored = self._decode(self.id)
+        return self._stored is not None
+
+    def _load(self):
+        return self._stored
+
+    def _save(self, expiration_time):
+        value = self._encode(expiration_time)
+        if len(value) > self.max_size:
+            raise ValueError(
+                'Session data too large for a cookie (%d bytes).' % len(value))
+        self._stored = self._data, expiration_time
+        # Setting the id also sets the response cookie.
+        self.id = value
+
+    def _delete(self):
+        self._stored = None
+
+    def acquire_lock(self):
+        """Mark the session as locked; cookie sessions need no locks."""
+        self.locked = True
+
+    def release_lock(self):
+        """Mark the session as unlocked."""
         self.locked = False
 
     def __len__(self):
@@ -694,9 +1411,14 @@ def save():
     request._sessionsaved = True
 
     if response.stream:
-        # If the body is being streamed, we have to save the data
-        #   *after* the response has been written out
-        request.hooks.attach('on_end_request', cherrypy.session.save)
+        if isinstance(cherrypy.serving.session, CookieSession):
+            # The data goes in the response cookie, which must be set
+            #   before the headers are written out.
+            cherrypy.session.save()
+        else:
+            # If the body is being streamed, we have to save the data
+            #   *after* the response has been written out
+            request.hooks.attach('on_end_request', cherrypy.session.save)
     else:
         # If the body is not being streamed, we save the data now
         # (so we can release the lock).
@@ -735,7 +1457,7 @@ def init(storage_type=None, path=None, path_header=None, name='session_id',
 
     storage_type
         (deprecated)
-        One of 'ram', 'file', memcached'. This will be
+        One of 'ram', 'file', 'sqlite', memcached', 'cookie'. This will be
         used to look up the corresponding class in cherrypy.lib.sessions
         globals. For example, 'file' will use the FileSession class.
 
@@ -0,0 +1,209 @@
+"""Server-Timing headers and W3C trace context for CherryPy requests.
+
+Turn on ``tools.server_timing`` to:
+
+ * time each stage of the request (see ``request.timings``) and report
+   the stages up to the handler, plus the total so far, in a
+   ``Server-Timing`` response header, which browser developer tools and
+   many proxies display;
+ * continue the trace of an incoming W3C ``traceparent`` header, or start
+   a new trace, as ``cherrypy.request.span``. Pass
+   ``cherrypy.request.span.traceparent`` (and ``tracestate``) along on
+   outbound requests to propagate the trace. The request's ``unique_id``
+   (the ``{i}`` access log atom) provides the span id, and the ``{T}``
+   access log atom logs the trace id;
+ * hand each finished :class:`Span` to an exporter: any callable taking
+   the span, such as a :class:`FileSpanExporter` or a
+   :class:`QueueSpanExporter`::
+
+    [/]
+    tools.server_timing.on = True
+    tools.server_timing.exporter = cherrypy.lib.tracing.FileSpanExporter(
+        '/var/log/myapp/spans.jsonl')
+"""
+
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import cherrypy
+from cherrypy._json import json
+
+
+_traceparent = re.compile(
+    r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$')
+_token_chars = re.compile(r"[^!#$%&'*+\-.^_`|~0-9A-Za-z]+")
+
+
+def parse_traceparent(value):
+    """Return (trace id, parent id, flags) from a traceparent, or None."""
+    m = _traceparent.match((value or '').strip())
+    if m is None:
+        return None
+    version, trace_id, parent_id, flags, rest = m.groups()
+    if version == 'ff' or (version == '00' and rest):
+        return None
+    if trace_id == '0' * 32 or parent_id == '0' * 16:
+        return None
+    return trace_id, parent_id, flags
+
+
+class Span(object):
+    """A request, as a span of a (possibly distributed) trace."""
+
+    def __init__(self, trace_id, span_id, parent_id=None, flags='01',
+                 tracestate=None, name=None, start=None):
+        """Initialize the span; it starts now unless given a start time."""
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.flags = flags
+        self.tracestate = tracestate
+        self.name = name
+        self.start = start or time.time()
+        self.duration = None
+        self.status = None
+        self.stages = {}
+
+    @property
+    def traceparent(self):  # noqa: D401; irrelevant for properties
+        """The traceparent header value which makes this span the parent."""
+        return '00-%s-%s-%s' % (self.trace_id, self.span_id, self.flags)
+
+    def as_dict(self):
+        """Return the span as a dict of JSON-serializable values."""
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'flags': self.flags,
+            'tracestate': self.tracestate,
+            'name': self.name,
+            'start': self.start,
+            'duration': self.duration,
+            'status': self.status,
+            'stages': self.stages,
+        }
+
+    def __repr__(self):
+        """Render the span's traceparent and name."""
+        cls = self.__class__
+        return '%s.%s(%r, name=%r)' % (
+            cls.__module__, cls.__name__, self.traceparent, self.name)
+
+
+class FileSpanExporter(object):
+    """Append each span to the given file, as a line of JSON."""
+
+    def __init__(self, path):
+        """Initialize the exporter; the file is opened by the first span."""
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __call__(self, span):
+        """Append the given span to the file."""
+        line = json.dumps(span.as_dict(), sort_keys=True) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        """Close the file; it is reopened by the next span."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class QueueSpanExporter(object):
+    """Put each span on a queue, for another thread to ship elsewhere.
+
+    Spans which don't fit are dropped (and counted in ``dropped``) rather
+    than holding up the request thread.
+    """
+
+    def __init__(self, queue_=None, maxsize=10000):
+        """Initialize the exporter, with a new queue unless given one."""
+        if queue_ is None:
+            queue_ = queue.Queue(maxsize)
+        self.queue = queue_
+        self.dropped = 0
+
+    def __call__(self, span):
+        """Put the given span on the queue, or drop it if that's full."""
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+
+def start_span(exporter=None, debug=False):
+    """Start timing the request, and make its span (tools.server_timing)."""
+    request = cherrypy.serving.request
+    response = cherrypy.serving.response
+
+    if request.timings is None:
+        # Time from here on; see request.trace_timings to time it all.
+        timings = cherrypy._cprequest.RequestTimings()
+        request.timings = request.hooks.timings = timings
+        timings.enter(request.stage)
+
+    # The request's unique id doubles as the id of its span and,
+    # if the request doesn't continue a trace, as the new trace id.
+    uid = request.unique_id.uuid4.hex
+    parent = parse_traceparent(request.headers.get('traceparent'))
+    if parent is None:
+        trace_id, parent_id, flags = uid, None, '01'
+    else:
+        trace_id, parent_id, flags = parent
+    request.span = Span(
+        trace_id, uid[16:], parent_id, flags,
+        tracestate=request.headers.get('tracestate') if parent else None,
+        name='%s %s%s' % (request.method, request.script_name,
+                          request.path_info),
+        start=response.time,
+    )
+    if debug:
+        cherrypy.log('Started span %r' % request.span, 'TOOLS.SERVER_TIMING')
+
+    request.hooks.attach('before_finalize', server_timing, priority=90)
+    request.hooks.attach('on_end_request', end_span, exporter=exporter,
+                         debug=debug)
+
+
+def server_timing():
+    """Set the Server-Timing response header from the request timings."""
+    request = cherrypy.serving.request
+    response = cherrypy.serving.response
+    durations = OrderedDict()
+    for stage, ns in request.timings.stages:
+        stage = _token_chars.sub('_', stage)
+        durations[stage] = durations.get(stage, 0) + ns
+    metrics = ['%s;dur=%.3f' % (stage, ns / 1e6)
+               for stage, ns in durations.items()]
+    metrics.append('total;dur=%.3f' % ((time.time() - response.time) * 1000))
+    response.headers['Server-Timing'] = ', '.join(metrics)
+
+
+def end_span(exporter=None, debug=False):
+    """Finish the request's span, and hand it to the exporter (if any)."""
+    request = cherrypy.serving.request
+    response = cherrypy.serving.response
+    span = request.span
+    span.duration = time.time() - response.time
+    try:
+        span.status = int(response.output_status[:3])
+    except (AttributeError, TypeError, ValueError):
+        pass
+    span.stages = dict(
+        (stage, ns / 1e9) for stage, ns in request.timings.totals().items())
+    if debug:
+        cherrypy.log('Finished span %r in %.6f seconds' %
+                     (span, span.duration), 'TOOLS.SERVER_TIMING')
+    if exporter is not None:
+        exporter(span)
@@ -1,15 +1,22 @@
 """Site services for use with a Web Site Process Bus."""
 
+import asyncio
+import json
+import logging
 import os
 import re
 import signal as _signal
+import socket
 import sys
 import time
 import threading
 import _thread
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
 
 from cherrypy._cpcompat import text_or_bytes
 from cherrypy._cpcompat import ntob
+from cherrypy.process import servers
 
 # _module__file__base is used by Autoreload to make
 # absolute any filenames retrieved from sys.modules which are not
@@ -451,6 +458,274 @@ class PIDFile(SimplePlugin):
             pass
 
 
+class Prefork(SimplePlugin):
+
+    """Serve from several forked worker processes. Availability: Unix.
+
+    CPython runs one thread at a time, so a single process serves on
+    about one core. This plugin takes over the bus's servers, binds their
+    sockets once in the master process and forks ``workers`` processes
+    (by default, one per CPU) which share them; the kernel hands each
+    connection to one of the workers. Subscribe it after the servers, and
+    after :class:`Daemonizer` and :class:`PIDFile` if you use them, which
+    then daemonize and record the master::
+
+        Prefork(cherrypy.engine, workers=4).subscribe()
+
+    Each worker runs its own copy of the bus, with the servers started.
+    The master relays to its workers:
+
+     * stop (and exit, SIGTERM, or a restart): each worker is sent SIGTERM
+       and given ``stop_timeout`` seconds to finish its requests and exit
+       before it is killed. Workers rely on the :class:`SignalHandler` to
+       turn SIGTERM into ``bus.exit``;
+     * graceful (SIGUSR1): workers are replaced, one at a time, by newly
+       forked ones, each old worker exiting only after its replacement
+       has started.
+
+    Workers which exit on their own (a crash, say) are replaced from the
+    master's 'main' loop (see :meth:`Bus.block`), and workers whose master
+    has gone away exit.
+
+    When the master restarts (on SIGHUP when daemonized, or when the
+    :class:`Autoreloader` sees a change), it hands its sockets and workers
+    over to the re-executed master, which replaces the old workers one at
+    a time; connections are served by the old workers, or queued, all the
+    while.
+
+    If ``reuse_port`` is True, each worker binds its own sockets with
+    ``SO_REUSEPORT`` instead (on platforms which support it), which
+    spreads connections more evenly over the workers at the cost of
+    losing those queued on a worker when it stops.
+
+    Workers are forked from the master, at priority 75 like the servers,
+    and only its main thread carries on in them: the threads of
+    :class:`Monitor` plugins, for example, keep running in the master.
+    """
+
+    workers = None
+    """The number of worker processes to run."""
+
+    children = None
+    """A map of {PID: worker number} pairs for the workers (in the master)."""
+
+    worker = None
+    """The number of this worker process, or None in the master."""
+
+    workers_env = 'CHERRYPY_PREFORK_WORKERS'
+    """The environment variable which hands the workers over to the
+    master which re-executes this one, as a JSON {PID: number} map."""
+
+    respawn_delay = 1
+    """The minimum time in seconds between starts of a worker, so that
+    a worker which fails on start doesn't keep the master busy."""
+
+    def __init__(self, bus, workers=None, reuse_port=False, stop_timeout=30):
+        SimplePlugin.__init__(self, bus)
+        self.workers = workers or os.cpu_count() or 1
+        if reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+            raise ValueError('SO_REUSEPORT is not available on this platform.')
+        self.reuse_port = reuse_port
+        self.stop_timeout = stop_timeout
+        self.servers = []
+        self.sockets = {}
+        self.children = {}
+        self.worker = None
+        self.master_pid = os.getpid()
+        self._started = {}
+        self._exited = set()
+        self._retiring = []
+
+    def subscribe(self):
+        """Take over the bus's servers, and subscribe to the bus."""
+        for listener in list(self.bus.listeners['start']):
+            server = getattr(listener, '__self__', None)
+            if isinstance(server, servers.ServerAdapter):
+                server.unsubscribe()
+                self.servers.append(server)
+        SimplePlugin.subscribe(self)
+
+    def unsubscribe(self):
+        """Unsubscribe from the bus, and give the servers back to it."""
+        SimplePlugin.unsubscribe(self)
+        for server in self.servers:
+            server.subscribe()
+        self.servers = []
+
+    def start(self):
+        """Bind the servers' sockets and fork the workers."""
+        if self.worker is not None or self.children:
+            return
+        self.master_pid = os.getpid()
+        if not self.reuse_port:
+            for server in self.servers:
+                if server not in self.sockets:
+                    self.sockets[server] = (
+                        servers.inherited_socket(server.bind_addr) or
+                        servers.bind_socket(server.bind_addr)
+                    )
+
+        # The workers of the master this one re-executed serve on until
+        # they are replaced, one at a time, as on graceful.
+        previous = json.loads(os.environ.pop(self.workers_env, '{}'))
+        for pid, number in previous.items():
+            self.children[int(pid)] = number
+        self._retiring = list(self.children)
+        if previous:
+            self.bus.log('Adopted %d worker processes.' % len(previous))
+
+        numbers = [
+            number for number in range(1, self.workers + 1)
+            if number not in previous.values()
+        ]
+        for number in numbers:
+            if self.spawn(number):
+                return
+        self.bus.log('Started %d worker processes.' % len(numbers))
+    start.priority = 75
+
+    def spawn(self, number):
+        """Fork a worker process. Return True in the worker."""
+        self._started[number] = time.time()
+        pid = os.fork()
+        if pid:
+            self.children[pid] = number
+            self.bus.log('Started worker %d (PID %d).' % (number, pid))
+            return False
+
+        self.worker = number
+        self.children = {}
+        self._exited.clear()
+        self._retiring = []
+        self.bus.execv = False
+        # The master restarts or exits on SIGHUP; workers leave that
+        # (and the PID file) to it.
+        _signal.signal(_signal.SIGHUP, _signal.SIG_IGN)
+        for listener in list(self.bus.listeners['exit']):
+            if isinstance(getattr(listener, '__self__', None), PIDFile):
+                self.bus.unsubscribe('exit', listener)
+
+        try:
+            for server in self.servers:
+                if self.reuse_port:
+                    sock = servers.bind_socket(
+                        server.bind_addr, reuse_port=True)
+                    self.sockets[server] = sock
+                server.bound_socket = self.sockets[server]
+                server.start()
+                self.bus.subscribe('stop', server.stop)
+        except Exception:
+            self.bus.log('Error starting worker %d.' % number, level=40,
+                         traceback=True)
+            os._exit(70)
+        return True
+
+    def main(self):
+        """Replace exited workers (in the master), or watch the master."""
+        if self.worker is not None:
+            if os.getppid() != self.master_pid:
+                self.bus.log('Master process exited; exiting worker %d.' %
+                             self.worker, level=30)
+                self.bus.exit()
+            return
+
+        if self.bus.state != self.bus.states.STARTED:
+            return
+        for pid, number in list(self.children.items()):
+            status = self._reap(pid)
+            if status is not None:
+                self.bus.log('Worker %d (PID %d) exited with status %d; '
+                             'restarting it.' % (number, pid, status),
+                             level=30)
+                self._exited.add(number)
+        for number in sorted(self._exited):
+            if time.time() - self._started[number] >= self.respawn_delay:
+                self._exited.discard(number)
+                if self.spawn(number):
+                    return
+
+        if self._retiring:
+            pid = self._retiring.pop(0)
+            if pid in self.children:
+                number = self.children[pid]
+                if number <= self.workers and self.spawn(number):
+                    return
+                self.terminate([pid])
+            if not self._retiring:
+                self.bus.log('Restarted %d worker processes.' %
+                             len(self.children))
+
+    def graceful(self):
+        """Replace the workers, one at a time, from the 'main' loop."""
+        if self.worker is None:
+            self._retiring = list(self.children)
+
+    def stop(self):
+        """Stop the workers, and close the sockets.
+
+        If the bus is restarting the process, the workers serve on, and
+        the sockets stay open, for the new master instead.
+        """
+        if self.worker is not None:
+            return
+        if self.bus.execv:
+            for server, sock in self.sockets.items():
+                servers.hand_off_socket(self.bus, server.bind_addr, sock)
+            os.environ[self.workers_env] = json.dumps(self.children)
+            self.bus.log('Handing over %d worker processes.' %
+                         len(self.children))
+            self.children = {}
+            self._exited.clear()
+            self._retiring = []
+            return
+        self.terminate(list(self.children))
+        self._exited.clear()
+        self._retiring = []
+        for sock in self.sockets.values():
+            sock.close()
+        self.sockets.clear()
+
+    def exit(self):
+        """Keep workers from re-executing themselves on a restart."""
+        if self.worker is not None and self.bus.execv:
+            self.bus.log('Exiting worker %d instead of restarting it; '
+                         'the master replaces it.' % self.worker)
+            self.bus.execv = False
+
+    def terminate(self, pids):
+        """Send SIGTERM to the given workers and wait for them to exit."""
+        for pid in pids:
+            self.bus.log('Stopping worker %d (PID %d).' %
+                         (self.children[pid], pid))
+            os.kill(pid, _signal.SIGTERM)
+
+        deadline = time.time() + self.stop_timeout
+        while True:
+            pids = [pid for pid in pids if self._reap(pid) is None]
+            if not pids:
+                break
+            if time.time() > deadline:
+                for pid in pids:
+                    self.bus.log('Killing worker %d (PID %d).' %
+                                 (self.children[pid], pid), level=30)
+                    os.kill(pid, _signal.SIGKILL)
+                deadline = float('inf')
+            time.sleep(.1)
+
+    def _reap(self, pid):
+        """Return the exit status of an exited worker, else None."""
+        try:
+            reaped, status = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            reaped, status = pid, 0
+        if not reaped:
+            return None
+        del self.children[pid]
+        if os.WIFSIGNALED(status):
+            return -os.WTERMSIG(status)
+        return os.WEXITSTATUS(status)
+
+
 class PerpetualTimer(threading.Timer):
 
     """A responsive subclass of threading.Timer whose run() method repeats.
@@ -697,6 +972,132 @@ class Autoreloader(Monitor):
                         return
 
 
+class ThreadPoolSizer(Monitor):
+
+    """Monitor which grows and shrinks an HTTP server's thread pool.
+
+    Every ``frequency`` seconds, this :ref:`plugin<plugins>` samples the
+    connections queued for a worker thread of the given server (such as
+    ``cherrypy.server``), and the share of its worker threads which are
+    busy. Then it:
+
+     * grows the pool at once, when connections are queued or the busy
+       share reaches ``grow_at``, by the number queued or a quarter of
+       the pool, whichever is more;
+     * shrinks the pool by half its idle threads, once the busy share
+       has stayed below ``shrink_at`` for ``patience`` samples in a row.
+
+    The pool stays within the server's ``thread_pool`` and, if positive,
+    ``thread_pool_max``. Each decision is logged, and the current and
+    target sizes are recorded in ``logging.statistics`` for
+    :mod:`cpstats <cherrypy.lib.cpstats>`. Turn it on for
+    ``cherrypy.server`` with the ``engine.pool_sizer.on`` config entry.
+
+    The server doesn't report how long connections wait in its queue, so
+    the queue's length stands in for that wait.
+    """
+
+    frequency = 1
+    """The interval in seconds at which to sample the pool."""
+
+    grow_at = 0.9
+    """The share of busy worker threads at which to grow the pool."""
+
+    shrink_at = 0.5
+    """The share of busy worker threads below which to shrink the pool."""
+
+    patience = 30
+    """The number of samples in a row below ``shrink_at`` before shrinking."""
+
+    target = None
+    """The number of worker threads the pool was last resized to."""
+
+    def __init__(self, bus, server, frequency=1, name=None):
+        self.server = server
+        self.target = None
+        self._calm = 0
+        Monitor.__init__(self, bus, self.run, frequency, name)
+
+        if not hasattr(logging, 'statistics'):
+            logging.statistics = {}
+        self.stats = logging.statistics.setdefault(
+            'CherryPy Thread Pool %d' % id(self), {})
+        self.stats.update({
+            'Enabled': True,
+            'Current Threads': lambda s: self._sample()[0],
+            'Idle Threads': lambda s: self._sample()[1],
+            'Queue Size': lambda s: self._sample()[2],
+            'Target Threads': lambda s: self.target,
+            'Min Threads': lambda s: getattr(self.pool, 'min', None),
+            'Max Threads': lambda s: getattr(self.pool, 'max', None),
+            'Grows': 0,
+            'Shrinks': 0,
+        })
+
+    @property
+    def pool(self):
+        """The server's thread pool, if it has been created."""
+        return getattr(getattr(self.server, 'httpserver', None),
+                       'requests', None)
+
+    def _sample(self):
+        """Return the (threads, idle threads, queued connections) of the pool.
+
+        Threads which have been asked to exit are not counted.
+        """
+        pool = self.pool
+        if pool is None:
+            return 0, 0, 0
+        # Internals of cheroot's ThreadPool, as of cheroot 6.6.0.
+        threads = len(pool._threads) - len(pool._pending_shutdowns)
+        return max(threads, 0), pool.idle, pool.qsize
+
+    def run(self):
+        """Grow or shrink the pool, according to a sample of its load."""
+        pool = self.pool
+        if pool is None or not pool._threads:
+            # Not started.
+            return
+        # Cull the threads which have exited.
+        pool.shrink(0)
+        size, idle, queued = self._sample()
+        if not size:
+            return
+        busy = (size - idle) / size
+        if self.target is None:
+            self.target = size
+
+        if queued or busy >= self.grow_at:
+            self._calm = 0
+            amount = max(queued, size // 4, 1)
+            if pool.max > 0:
+                amount = min(amount, pool.max - size)
+            if amount > 0:
+                self.target = size + amount
+                self.bus.log(
+                    'Growing the thread pool from %d to %d threads '
+                    '(%d connections queued, %d%% of threads busy).' %
+                    (size, self.target, queued, busy * 100))
+                pool.grow(amount)
+                self.stats['Grows'] += 1
+        elif busy < self.shrink_at:
+            self._calm += 1
+            if self._calm >= self.patience:
+                self._calm = 0
+                amount = min(idle // 2, size - pool.min)
+                if amount > 0:
+                    self.target = size - amount
+                    self.bus.log(
+                        'Shrinking the thread pool from %d to %d threads '
+                        '(%d%% of threads busy).' %
+                        (size, self.target, busy * 100))
+                    # shrink() counts the threads already asked to exit.
+                    pool.shrink(amount + len(pool._pending_shutdowns))
+                    self.stats['Shrinks'] += 1
+        else:
+            self._calm = 0
+
+
 class ThreadManager(SimplePlugin):
 
     """Manager for HTTP request threads.
@@ -752,3 +1153,183 @@ class ThreadManager(SimplePlugin):
             self.bus.publish('stop_thread', i)
         self.threads.clear()
     graceful = stop
+
+
+class EventLoop(SimplePlugin):
+
+    """Run an asyncio event loop in its own thread.
+
+    Other threads hand coroutines to the loop with :meth:`run`, which waits
+    for their results; CherryPy does so for ``async def`` page handlers.
+    The calling thread is blocked meanwhile, so this gives a handler
+    concurrency among the I/O calls it awaits, not a server which needs
+    fewer threads. The loop is started before the servers and stopped
+    after them, so that the requests in progress can finish. Turn it on
+    with the ``engine.asyncio.on`` config entry, or::
+
+        cherrypy.engine.asyncio.subscribe()
+
+    Threads don't survive :func:`os.fork`, so a process forked after
+    start (by :class:`Prefork`, say) starts its own loop on first use.
+    """
+
+    loop = None
+    """The :class:`asyncio.AbstractEventLoop`, while started."""
+
+    thread = None
+    """The thread running the loop, while started."""
+
+    timeout = None
+    """The time in seconds which :meth:`run` waits for a coroutine, unless
+    given another; None to wait for as long as it takes."""
+
+    def __init__(self, bus, name='EventLoop'):
+        SimplePlugin.__init__(self, bus)
+        self.name = name
+        self.loop = None
+        self.thread = None
+        self.pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the event loop in its own thread."""
+        with self._lock:
+            if self.loop is not None and self.pid == os.getpid():
+                self.bus.log('Event loop thread %r already started.' %
+                             self.name)
+                return
+            self.pid = os.getpid()
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self._run, name=self.name)
+            self.thread.daemon = True
+            self.thread.start()
+            self.bus.log('Started event loop thread %r.' % self.name)
+    start.priority = 70
+
+    def _run(self):
+        loop = self.loop
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            all_tasks = (
+                getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks)
+            tasks = all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                loop.run_until_complete(
+                    asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+    def stop(self):
+        """Stop the event loop, cancelling any tasks left, and its thread."""
+        with self._lock:
+            if self.loop is None or self.pid != os.getpid():
+                self.loop = self.thread = None
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            if self.thread is not threading.current_thread():
+                self.thread.join()
+            self.bus.log('Stopped event loop thread %r.' % self.name)
+            self.loop = self.thread = None
+    # Servers stop at the default priority (50); let their requests finish.
+    stop.priority = 60
+
+    def run(self, coro, timeout=None):
+        """Run the coroutine on the loop, and return (or raise) its result.
+
+        If the coroutine takes longer than ``timeout`` seconds (by default,
+        :attr:`timeout`), cancel it and raise
+        :exc:`concurrent.futures.TimeoutError`. Call this from any thread
+        but the loop's own, which it would block.
+        """
+        if self.loop is None:
+            raise RuntimeError(
+                'The %s plugin is not started; turn on engine.asyncio '
+                'to run coroutines.' % self.name)
+        if self.pid != os.getpid():
+            self.start()
+        if timeout is None:
+            timeout = self.timeout
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except futures.TimeoutError:
+            future.cancel()
+            raise
+
+
+class ProcessPool(SimplePlugin):
+
+    """Run a :class:`concurrent.futures.ProcessPoolExecutor`.
+
+    The pool is created on start and shut down, after the servers have
+    stopped, on stop. Submit work to it with :meth:`submit`; CherryPy does
+    so for ``tools.offload``. Turn it on with the ``engine.process_pool.on``
+    config entry, or::
+
+        cherrypy.engine.process_pool.subscribe()
+
+    A pool which breaks (when a worker process is killed, say) is replaced
+    on the next submit. As with :class:`EventLoop`, a process forked after
+    start (by :class:`Prefork`, say) creates its own pool on first use.
+    """
+
+    executor = None
+    """The :class:`concurrent.futures.ProcessPoolExecutor`, while started."""
+
+    max_workers = None
+    """The number of worker processes (by default, one per CPU)."""
+
+    def __init__(self, bus, max_workers=None):
+        SimplePlugin.__init__(self, bus)
+        self.max_workers = max_workers
+        self.executor = None
+        self.pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Create the pool, whose workers start on first use."""
+        with self._lock:
+            if self.executor is not None and self.pid == os.getpid():
+                self.bus.log('Process pool already started.')
+                return
+            self.pid = os.getpid()
+            self.executor = futures.ProcessPoolExecutor(self.max_workers)
+            self.bus.log('Started process pool.')
+    start.priority = 70
+
+    def stop(self):
+        """Shut the pool down, once the work in progress is done."""
+        with self._lock:
+            executor, self.executor = self.executor, None
+            if executor is None or self.pid != os.getpid():
+                return
+            executor.shutdown(wait=True)
+            self.bus.log('Stopped process pool.')
+    # Servers stop at the default priority (50); let their requests finish.
+    stop.priority = 60
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn(*args, **kwargs) in the pool; return its Future."""
+        executor = self.executor
+        if executor is None:
+            raise RuntimeError(
+                'The process pool is not started; turn on '
+                'engine.process_pool to submit work to it.')
+        if self.pid != os.getpid():
+            self.start()
+            executor = self.executor
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            with self._lock:
+                if self.executor is executor:
+                    self.bus.log('Process pool is broken; replacing it.',
+                                 level=30)
+                    executor.shutdown(wait=False)
+                    self.executor = futures.ProcessPoolExecutor(
+                        self.max_workers)
+                executor = self.executor
+            return executor.submit(fn, *args, **kwargs)
@@ -118,10 +118,12 @@ an explanation of the possible configuration options.
 """
 
 import os
+import socket
 import sys
-import time
+import threading
 import warnings
 import contextlib
+import json
 
 import portend
 
@@ -131,6 +133,11 @@ class Timeouts:
     free = 1
 
 
+HANDOFF_ENV = 'CHERRYPY_LISTEN_FDS'
+"""The environment variable which lists the listening sockets handed to
+a re-executed process, as JSON [fd, address family, bind_addr] triples."""
+
+
 class ServerAdapter(object):
 
     """Adapter for an HTTP server.
@@ -146,12 +153,26 @@ class ServerAdapter(object):
         bus.start()
     """
 
+    bound_socket = None
+    """A listening socket, already bound to bind_addr, for the HTTP server
+    to serve on instead of binding its own (see
+    :class:`Prefork<cherrypy.process.plugins.Prefork>`). The HTTP server
+    must support it, as CherryPy's own does."""
+
+    handoff = False
+    """If True, bind the listening socket here (as bound_socket) and, when
+    the bus restarts the process, hand it over to the new process instead
+    of closing it, so that connections wait while the process restarts.
+    The socket stays bound until the process exits.
+    """
+
     def __init__(self, bus, httpserver=None, bind_addr=None):
         self.bus = bus
         self.httpserver = httpserver
         self.bind_addr = bind_addr
         self.interrupt = None
         self.running = False
+        self._prepared = threading.Event()
 
     def subscribe(self):
         self.bus.subscribe('start', self.start)
@@ -171,12 +192,18 @@ class ServerAdapter(object):
         if not self.httpserver:
             raise ValueError('No HTTP server has been created.')
 
-        if not os.environ.get('LISTEN_PID', None):
+        if self.handoff and self.bound_socket is None:
+            self.bound_socket = (
+                inherited_socket(self.bind_addr) or
+                bind_socket(self.bind_addr)
+            )
+
+        if not (os.environ.get('LISTEN_PID', None) or self.bound_socket):
             # Start the httpserver in a new thread.
             if isinstance(self.bind_addr, tuple):
                 portend.free(*self.bind_addr, timeout=Timeouts.free)
 
-        import threading
+        self._prepared = threading.Event()
         t = threading.Thread(target=self._start_http_thread)
         t.setName('HTTPServer ' + t.getName())
         t.start()
@@ -221,8 +248,17 @@ class ServerAdapter(object):
         trapped here, and the bus (and therefore our httpserver)
         are shut down.
         """
+        prepare = getattr(self.httpserver, 'prepare', None)
+        serve = getattr(self.httpserver, 'serve', None)
         try:
-            self.httpserver.start()
+            if prepare is None or serve is None:
+                self.httpserver.start()
+            else:
+                # Run start() in two steps, so that wait() returns
+                # as soon as the server is ready.
+                prepare()
+                self._prepared.set()
+                serve()
         except KeyboardInterrupt:
             self.bus.log('<Ctrl-C> hit: shutting down HTTP server')
             self.interrupt = sys.exc_info()[1]
@@ -238,18 +274,25 @@ class ServerAdapter(object):
                          traceback=True, level=40)
             self.bus.exit()
             raise
+        finally:
+            self._prepared.set()
 
     def wait(self):
         """Wait until the HTTP server is ready to receive requests."""
         while not getattr(self.httpserver, 'ready', False):
             if self.interrupt:
                 raise self.interrupt
-            time.sleep(.1)
+            self._prepared.wait(.1)
 
         # bypass check when LISTEN_PID is set
         if os.environ.get('LISTEN_PID', None):
             return
 
+        # bypass check when serving on a shared socket, which
+        # was occupied all along
+        if self.bound_socket is not None:
+            return
+
         # bypass check when running via socket-activation
         # (for socket-activation the port will be managed by systemd)
         if not isinstance(self.bind_addr, tuple):
@@ -276,11 +319,17 @@ class ServerAdapter(object):
         if self.running:
             # stop() MUST block until the server is *truly* stopped.
             self.httpserver.stop()
-            # Wait for the socket to be truly freed.
-            if isinstance(self.bind_addr, tuple):
+            # Wait for the socket to be truly freed (unless it's shared).
+            if (isinstance(self.bind_addr, tuple) and
+                    self.bound_socket is None):
                 portend.free(*self.bound_addr, timeout=Timeouts.free)
             self.running = False
             self.bus.log('HTTP Server %s shut down' % self.httpserver)
+            if self.handoff and self.bus.execv:
+                # Restarting: keep the socket, and its queue, open.
+                hand_off_socket(self.bus, self.bind_addr, self.bound_socket)
+                self.bus.log('Handing over the socket for %s' %
+                             self.description)
         else:
             self.bus.log('HTTP Server %s already shut down' % self.httpserver)
     stop.priority = 25
@@ -399,6 +448,66 @@ class FlupSCGIServer(object):
         self.scgiserver._threadPool.maxSpare = 0
 
 
+def bind_socket(bind_addr, reuse_port=False):
+    """Return a listening socket bound to the given address."""
+    if isinstance(bind_addr, tuple):
+        host, port = bind_addr
+        family, type_, proto, _, addr = socket.getaddrinfo(
+            host or None, port, socket.AF_UNSPEC, socket.SOCK_STREAM, 0,
+            socket.AI_PASSIVE)[0]
+    else:
+        family, type_, proto, addr = (
+            socket.AF_UNIX, socket.SOCK_STREAM, 0, bind_addr)
+        try:
+            os.unlink(bind_addr)
+        except OSError:
+            pass
+    sock = socket.socket(family, type_, proto)
+    try:
+        if family != socket.AF_UNIX:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(addr)
+        sock.listen(socket.SOMAXCONN)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+def inherited_socket(bind_addr):
+    """Return the listening socket for bind_addr handed over by the process
+    which re-executed this one (see :func:`hand_off_socket`), or None.
+    """
+    handed_off = json.loads(os.environ.get(HANDOFF_ENV, '[]'))
+    addr = list(bind_addr) if isinstance(bind_addr, tuple) else bind_addr
+    for entry in handed_off:
+        fd, family, entry_addr = entry
+        if entry_addr == addr:
+            handed_off.remove(entry)
+            if handed_off:
+                os.environ[HANDOFF_ENV] = json.dumps(handed_off)
+            else:
+                del os.environ[HANDOFF_ENV]
+            return socket.socket(family, socket.SOCK_STREAM, 0, fd)
+    return None
+
+
+def hand_off_socket(bus, bind_addr, sock):
+    """Keep the listening socket open when the bus re-executes the process.
+
+    The new process picks it up with :func:`inherited_socket`, so that
+    connections wait in the socket's queue while the process restarts,
+    instead of being refused.
+    """
+    handed_off = json.loads(os.environ.get(HANDOFF_ENV, '[]'))
+    addr = list(bind_addr) if isinstance(bind_addr, tuple) else bind_addr
+    handed_off.append([sock.fileno(), sock.family, addr])
+    os.environ[HANDOFF_ENV] = json.dumps(handed_off)
+    bus.pass_fds.add(sock.fileno())
+
+
 @contextlib.contextmanager
 def _safe_wait(host, port):
     """
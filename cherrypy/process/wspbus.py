@@ -71,11 +71,9 @@ except ImportError:
     """
     ctypes = None
 
-import operator
 import os
 import sys
 import threading
-import time
 import traceback as _traceback
 import warnings
 import subprocess
@@ -170,13 +168,20 @@ class Bus(object):
     """
 
     states = states
-    state = states.STOPPED
+    _state = states.STOPPED
     execv = False
+    pass_fds = frozenset()
     max_cloexec_files = max_files
+    # How often, in seconds, block() publishes to the 'main' channel.
+    main_interval = 0.1
 
     def __init__(self):
         """Initialize pub/sub bus."""
         self.execv = False
+        self.pass_fds = set()
+        # Reentrant, for signal handlers which change the state
+        # while the main thread waits for it.
+        self._state_changed = threading.Condition(threading.RLock())
         self.state = states.STOPPED
         channels = 'start', 'stop', 'exit', 'graceful', 'log', 'main'
         self.listeners = dict(
@@ -184,6 +189,19 @@ class Bus(object):
             for channel in channels
         )
         self._priorities = {}
+        # {channel: (listeners set, its size, listeners by priority)}
+        self._sorted_listeners = {}
+
+    @property
+    def state(self):  # noqa: D401; irrelevant for properties
+        """The current state of the bus (one of :attr:`states`)."""
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        with self._state_changed:
+            self._state = state
+            self._state_changed.notify_all()
 
     def subscribe(self, channel, callback=None, priority=None):
         """Add the given callback at the given channel (if not present).
@@ -204,6 +222,7 @@ class Bus(object):
         if priority is None:
             priority = getattr(callback, 'priority', 50)
         self._priorities[(channel, callback)] = priority
+        self._sorted_listeners.pop(channel, None)
 
     def unsubscribe(self, channel, callback):
         """Discard the given callback (if present)."""
@@ -211,21 +230,31 @@ class Bus(object):
         if listeners and callback in listeners:
             listeners.discard(callback)
             del self._priorities[(channel, callback)]
+            self._sorted_listeners.pop(channel, None)
+
+    def _get_sorted_listeners(self, channel, listeners):
+        """Return the channel's listeners, in order of priority."""
+        cached = self._sorted_listeners.get(channel)
+        # Also catch listeners added to, or removed from, the set directly.
+        if (cached is None or cached[0] is not listeners or
+                cached[1] != len(listeners)):
+            ordered = tuple(sorted(
+                listeners,
+                key=lambda listener: self._priorities[(channel, listener)],
+            ))
+            cached = self._sorted_listeners[channel] = (
+                listeners, len(listeners), ordered)
+        return cached[2]
 
     def publish(self, channel, *args, **kwargs):
         """Return output of all subscribers for the given channel."""
-        if channel not in self.listeners:
+        listeners = self.listeners.get(channel)
+        if not listeners:
             return []
 
-        exc = ChannelFailures()
+        exc = None
         output = []
-
-        raw_items = (
-            (self._priorities[(channel, listener)], listener)
-            for listener in self.listeners[channel]
-        )
-        items = sorted(raw_items, key=operator.itemgetter(0))
-        for priority, listener in items:
+        for listener in self._get_sorted_listeners(channel, listeners):
             try:
                 output.append(listener(*args, **kwargs))
             except KeyboardInterrupt:
@@ -237,6 +266,8 @@ class Bus(object):
                     e.code = 1
                 raise
             except Exception:
+                if exc is None:
+                    exc = ChannelFailures()
                 exc.handle_exception()
                 if channel == 'log':
                     # Assume any further messages to 'log' will fail.
@@ -314,6 +345,8 @@ class Bus(object):
 
         This method does not restart the process from the calling thread;
         instead, it stops the bus and asks the main thread to call execv.
+        Listeners may add file descriptors to ``pass_fds`` as it stops
+        to keep them open in the new process.
         """
         self.execv = True
         self.exit()
@@ -323,15 +356,19 @@ class Bus(object):
         self.log('Bus graceful')
         self.publish('graceful')
 
-    def block(self, interval=0.1):
+    def block(self, interval=None):
         """Wait for the EXITING state, KeyboardInterrupt or SystemExit.
 
         This function is intended to be called only by the main thread.
+        While waiting, it publishes to the 'main' channel every
+        ``interval`` seconds (by default, ``self.main_interval``).
         After waiting for the EXITING state, it also waits for all threads
         to terminate, and then calls os.execv if self.execv is True. This
         design allows another thread to call bus.restart, yet have the main
         thread perform the actual execv call (required on some platforms).
         """
+        if interval is None:
+            interval = self.main_interval
         try:
             self.wait(states.EXITING, interval=interval, channel='main')
         except (KeyboardInterrupt, IOError):
@@ -369,11 +406,23 @@ class Bus(object):
             self._do_execv()
 
     def wait(self, state, interval=0.1, channel=None):
-        """Poll for the given state(s) at intervals; publish to channel."""
+        """Wait for the given state(s); publish to channel at intervals.
+
+        This returns as soon as the state changes to one of those given.
+        Without a channel, the interval is not used.
+        """
         states = set(always_iterable(state))
 
-        while self.state not in states:
-            time.sleep(interval)
+        def reached():
+            return self._state in states
+
+        while True:
+            with self._state_changed:
+                if channel is None:
+                    self._state_changed.wait_for(reached)
+                    return
+                if self._state_changed.wait_for(reached, interval):
+                    return
             self.publish(channel)
 
     def _do_execv(self):
@@ -402,6 +451,8 @@ class Bus(object):
             os.chdir(_startup_cwd)
             if self.max_cloexec_files:
                 self._set_cloexec()
+            for fd in self.pass_fds:
+                os.set_inheritable(fd, True)
             os.execv(sys.executable, args)
 
     @staticmethod
@@ -542,8 +593,13 @@ class Bus(object):
         from persisting into the new process.
 
         Set self.max_cloexec_files to 0 to disable this behavior.
+
+        Files in self.pass_fds (such as listening sockets handed to the
+        new process) are left open.
         """
         for fd in range(3, self.max_cloexec_files):  # skip stdin/out/err
+            if fd in self.pass_fds:
+                continue
             try:
                 flags = fcntl.fcntl(fd, fcntl.F_GETFD)
             except IOError:
@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+from http.client import HTTPConnection
+
+import cherrypy
+from cherrypy.lib import admission
+from cherrypy.test import helper
+
+
+def test_gate():
+    gate = admission.Gate('test', limit=1, queue=2)
+    assert gate.acquire()
+    # A request which may not wait is shed.
+    assert not gate.acquire(timeout=0)
+    assert gate.shed == 1
+
+    results = []
+
+    def wait(priority):
+        results.append((priority, gate.acquire(priority, timeout=5)))
+
+    low = threading.Thread(target=wait, args=(0,))
+    low.start()
+    while gate.waiting < 1:
+        time.sleep(0.01)
+    high = threading.Thread(target=wait, args=(5,))
+    high.start()
+    while gate.waiting < 2:
+        time.sleep(0.01)
+
+    # The queue is full; a higher priority request displaces the lowest.
+    higher = threading.Thread(target=wait, args=(9,))
+    higher.start()
+    low.join()
+    assert results == [(0, False)]
+    # One of a priority no higher than the lowest waiting is shed.
+    assert not gate.acquire(5, timeout=5)
+
+    # Waiters are let in by priority as places free up.
+    gate.release()
+    higher.join()
+    assert results[-1] == (9, True)
+    gate.release()
+    high.join()
+    assert results[-1] == (5, True)
+    assert gate.active == 1
+    gate.release()
+    assert gate.active == 0
+    assert (gate.admitted, gate.shed) == (3, 3)
+
+
+class AdmissionTest(helper.CPWebCase):
+
+    @staticmethod
+    def setup_server():
+        class Root(object):
+
+            entered = threading.Event()
+            proceed = threading.Event()
+
+            @cherrypy.expose
+            def index(self):
+                return 'ok'
+
+            @cherrypy.expose
+            def block(self):
+                self.entered.set()
+                self.proceed.wait(10)
+                return 'done'
+
+        cherrypy.tree.mount(Root(), '/app', {
+            '/': {
+                'tools.admission.on': True,
+                'tools.admission.limit': 1,
+                'tools.admission.retry_after': 3,
+                'tools.admission.timeout': 0.1,
+            },
+        })
+
+    def test_shedding(self):
+        root = cherrypy.tree.apps['/app'].root
+        root.entered.clear()
+        root.proceed.clear()
+        result = []
+
+        def block():
+            c = HTTPConnection('%s:%s' % (self.interface(), self.PORT))
+            c.request('GET', '/app/block')
+            result.append(c.getresponse().read())
+            c.close()
+
+        t = threading.Thread(target=block)
+        t.start()
+        try:
+            assert root.entered.wait(5)
+            self.getPage('/app/')
+            self.assertStatus(503)
+            self.assertHeader('Retry-After', '3')
+            self.assertInBody('too busy')
+
+            stats = logging.statistics['CherryPy Admission']['Gates']['/app']
+            assert stats['Current Requests'](stats) == 1
+            assert stats['Total Shed'](stats) >= 1
+        finally:
+            root.proceed.set()
+            t.join()
+        assert result == [b'done']
+
+        # The place is freed once the request has ended.
+        for trial in range(50):
+            if admission.gates['/app'].active == 0:
+                break
+            time.sleep(0.1)
+        self.getPage('/app/')
+        self.assertStatus(200)
+        self.assertBody('ok')
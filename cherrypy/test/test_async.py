@@ -0,0 +1,160 @@
+import asyncio
+import threading
+from concurrent import futures
+from http.client import HTTPConnection
+
+import pytest
+
+import cherrypy
+from cherrypy.process import plugins, wspbus
+from cherrypy.test import helper
+
+
+def test_event_loop():
+    bus = wspbus.Bus()
+    loop = plugins.EventLoop(bus)
+
+    async def add(a, b):
+        await asyncio.sleep(0)
+        return a + b
+
+    async def fail():
+        raise ValueError('nope')
+
+    cancelled = threading.Event()
+
+    async def hang():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    coro = add(1, 2)
+    with pytest.raises(RuntimeError):
+        loop.run(coro)
+    coro.close()
+
+    loop.subscribe()
+    bus.start()
+    try:
+        assert loop.thread.is_alive()
+        assert loop.run(add(1, 2)) == 3
+        with pytest.raises(ValueError):
+            loop.run(fail())
+
+        # A coroutine which takes too long is cancelled.
+        with pytest.raises(futures.TimeoutError):
+            loop.run(hang(), timeout=0.05)
+        assert cancelled.wait(1)
+        loop.timeout = 0.05
+        with pytest.raises(futures.TimeoutError):
+            loop.run(asyncio.sleep(10))
+    finally:
+        bus.exit()
+    assert loop.loop is None
+
+
+class AsyncTest(helper.CPWebCase):
+
+    @staticmethod
+    def setup_server():
+        class Root(object):
+
+            @cherrypy.expose
+            async def index(self):
+                await asyncio.sleep(0.01)
+                return 'hello'
+
+            @cherrypy.expose
+            async def echo(self, name, delay='0'):
+                # Other requests run on the loop while this one sleeps.
+                await asyncio.sleep(float(delay))
+                cherrypy.response.headers['X-Thread'] = (
+                    threading.current_thread().name)
+                return '%s %s' % (name, cherrypy.request.params['name'])
+
+            @cherrypy.expose
+            async def fail(self):
+                await asyncio.sleep(0)
+                raise cherrypy.HTTPError(409, 'conflict')
+
+            @cherrypy.expose
+            @cherrypy.config(**{'request.timeout': 0.1})
+            async def slow(self):
+                await asyncio.sleep(10)
+                return 'too late'
+
+            @cherrypy.expose
+            @cherrypy.tools.json_out()
+            async def data(self):
+                results = await asyncio.gather(
+                    asyncio.sleep(0.01, 'a'), asyncio.sleep(0.01, 'b'))
+                return {'results': results}
+
+        cherrypy.tree.mount(Root())
+        cherrypy.config.update({'engine.asyncio.on': True})
+
+    @classmethod
+    def teardown_class(cls):
+        super(cls, cls).teardown_class()
+        cherrypy.engine.asyncio.unsubscribe()
+
+    def test_handler(self):
+        self.getPage('/')
+        self.assertStatus(200)
+        self.assertBody('hello')
+
+        self.getPage('/fail')
+        self.assertStatus(409)
+        self.assertInBody('conflict')
+
+        self.getPage('/echo')
+        self.assertStatus(404)
+
+    def test_timeout(self):
+        # The coroutine is cancelled at the request's deadline.
+        self.getPage('/slow')
+        self.assertStatus(503)
+        self.assertInBody('ran past its deadline')
+
+        cherrypy.engine.asyncio.timeout = 0.05
+        try:
+            self.getPage('/echo?name=x&delay=10')
+            self.assertStatus(503)
+            self.assertInBody('took longer than 0.05 seconds')
+        finally:
+            cherrypy.engine.asyncio.timeout = None
+
+    def test_tools(self):
+        self.getPage('/data')
+        self.assertStatus(200)
+        self.assertHeader('Content-Type', 'application/json')
+        self.assertBody('{"results": ["a", "b"]}')
+
+    def test_concurrent_requests(self):
+        results = {}
+
+        def get(name, delay):
+            c = HTTPConnection('%s:%s' % (self.interface(), self.PORT))
+            c.request('GET', '/echo?name=%s&delay=%s' % (name, delay))
+            response = c.getresponse()
+            results[name] = (response.status, response.read(),
+                             response.getheader('X-Thread'))
+            c.close()
+
+        threads = [
+            threading.Thread(target=get, args=(name, delay))
+            for name, delay in (('one', 0.2), ('two', 0.1), ('three', 0))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(results) == 3
+        for name, (status, body, thread_name) in results.items():
+            assert status == 200
+            # Each coroutine sees its own request.
+            assert body == ('%s %s' % (name, name)).encode()
+            assert thread_name == 'EventLoop'
@@ -1,3 +1,4 @@
+import os
 import threading
 import time
 import unittest.mock
@@ -53,6 +54,31 @@ class PublishSubscribeTests(unittest.TestCase):
 
         self.assertEqual(self.responses, expected)
 
+    def test_listener_order_changes(self):
+        b = wspbus.Bus()
+
+        self.responses = []
+        first = self.get_listener('hugh', 0)
+        second = self.get_listener('hugh', 1)
+        b.subscribe('hugh', first, 10)
+        b.subscribe('hugh', second, 20)
+        b.publish('hugh')
+
+        # Subscribing again with a new priority reorders the listeners.
+        b.subscribe('hugh', first, 30)
+        b.publish('hugh')
+        b.unsubscribe('hugh', second)
+        b.publish('hugh')
+        # So do listeners added to the set directly.
+        third = self.get_listener('hugh', 2)
+        b.listeners['hugh'].add(third)
+        b._priorities[('hugh', third)] = 0
+        b.publish('hugh')
+
+        self.assertEqual(self.responses, [
+            msg % (i, 'hugh', None) for i in (0, 1, 1, 0, 0, 2, 0)])
+        self.assertEqual(b.publish('louis'), [])
+
     def test_listener_errors(self):
         b = wspbus.Bus()
 
@@ -206,6 +232,22 @@ class BusMethodTests(unittest.TestCase):
         bus.wait(bus.states.STARTED, interval=0.01, channel='main')
         assert callback.call_count > 3
 
+    def test_wait_returns_on_state_change(self):
+        bus = wspbus.Bus()
+        callback = unittest.mock.MagicMock()
+        bus.subscribe('main', callback)
+
+        def set_start():
+            time.sleep(0.05)
+            bus.start()
+        threading.Thread(target=set_start).start()
+        started = time.time()
+        bus.wait(bus.states.STARTED, interval=10, channel='main')
+        # The state change ends the wait, without waiting for the interval.
+        assert time.time() - started < 5
+        assert callback.call_count == 0
+        bus.exit()
+
     def test_block(self):
         b = wspbus.Bus()
         self.log(b)
@@ -259,6 +301,22 @@ class BusMethodTests(unittest.TestCase):
         finally:
             b.exit()
 
+    @unittest.skipIf(not wspbus.max_files, 'fcntl is not available')
+    def test_set_cloexec(self):
+        b = wspbus.Bus()
+        kept, closed = os.pipe()
+        try:
+            os.set_inheritable(kept, True)
+            os.set_inheritable(closed, True)
+            b.pass_fds.add(kept)
+            b.max_cloexec_files = max(kept, closed) + 1
+            b._set_cloexec()
+            self.assertTrue(os.get_inheritable(kept))
+            self.assertFalse(os.get_inheritable(closed))
+        finally:
+            os.close(kept)
+            os.close(closed)
+
     def test_log(self):
         b = wspbus.Bus()
         self.log(b)
@@ -0,0 +1,265 @@
+import logging
+import threading
+import time
+
+import cherrypy
+from cherrypy._json import json
+from cherrypy.lib import cpstats
+from cherrypy.test import helper
+
+
+def test_sharded_counters():
+    counters = cpstats.ShardedCounters('Hits', 'Bytes')
+
+    def work():
+        for i in range(1000):
+            shard = counters.shard()
+            shard['Hits'] += 1
+            shard['Bytes'] += 2
+
+    threads = [threading.Thread(target=work) for i in range(8)]
+    for t in threads:
+        t.start()
+    counters.shard()['Hits'] += 1
+    for t in threads:
+        t.join()
+
+    assert counters.totals() == {'Hits': 8001, 'Bytes': 16000}
+    # Shards of exited threads are folded in, not dropped.
+    assert len(counters._shards) == 1
+    assert counters.total('Hits') == 8001
+    assert counters.reader('Bytes')({}) == 16000
+
+    scope = {'Hits': 0, 'Other': 'kept'}
+    counters.publish(scope)
+    assert scope == {'Hits': 8001, 'Bytes': 16000, 'Other': 'kept'}
+
+
+def test_latency_histogram():
+    h = cpstats.LatencyHistogram()
+    assert h.summary()['p99'] == 0.0
+
+    # Bucket indexes grow with the value and stay within the array.
+    previous = 0
+    for us in range(0, 1 << 20, 37):
+        index = h.bucket(us / 1000000)
+        assert previous <= index < h.size
+        previous = index
+    assert h.bucket(10 ** 9) == h.size - 1
+
+    # 1ms .. 1000ms, in 1ms steps.
+    for ms in range(1, 1001):
+        h.record(ms / 1000)
+    summary = h.summary()
+    assert summary['Count'] == 1000
+    assert summary['Min'] == 0.001
+    assert summary['Max'] == 1.0
+    assert abs(summary['Avg'] - 0.5005) < 1e-9
+    for name, expected in (
+            ('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999)):
+        assert abs(summary[name] - expected) <= expected / 16
+
+
+def test_metric_families(monkeypatch):
+    requests = [0]
+    monkeypatch.setitem(logging.statistics, 'My Server 1234', {
+        'Enabled': True,
+        'Name': 'not a number',
+        'Requests': lambda s: requests[0],
+        'Queue Size': 3,
+        'Socket Errors': -1,
+        'Worker Threads': {
+            'worker "1"': {'Requests': 5, 'Work Time': 0.25},
+            'worker\n2': {'Requests': lambda s: 7},
+        },
+    })
+    monkeypatch.setitem(logging.statistics, 'My Server 5678', {
+        'Requests': 2,
+    })
+    requests[0] = 11
+
+    page = cpstats.StatsPage()
+    page.metrics_cache_interval = 0
+    text = ''.join(page.render_metrics())
+    assert text.endswith('\n# EOF\n')
+    lines = text.splitlines()
+    assert '# TYPE my_server_requests counter' in lines
+    assert 'my_server_requests_total{instance="1234"} 11' in lines
+    assert 'my_server_requests_total{instance="5678"} 2' in lines
+    assert 'my_server_queue_size{instance="1234"} 3' in lines
+    assert 'my_server_enabled{instance="1234"} 1' in lines
+    assert not [line for line in lines if 'my_server_socket_errors' in line]
+    assert not [line for line in lines if 'my_server_name' in line]
+    assert (
+        'my_server_worker_threads_requests_total'
+        '{instance="1234",key="worker \\"1\\""} 5' in lines
+    )
+    assert (
+        'my_server_worker_threads_requests_total'
+        '{instance="1234",key="worker\\n2"} 7' in lines
+    )
+    assert (
+        'my_server_worker_threads_work_time_total'
+        '{instance="1234",key="worker \\"1\\""} 0.25' in lines
+    )
+    # Each family is declared once.
+    type_lines = [line for line in lines if line.startswith('# TYPE')]
+    assert len(type_lines) == len(set(type_lines))
+
+
+class StatsTest(helper.CPWebCase):
+
+    @staticmethod
+    def setup_server():
+        class Root(object):
+
+            @cherrypy.expose
+            def index(self):
+                return 'hello'
+
+            @cherrypy.expose
+            def echo(self, body):
+                return body
+
+            @cherrypy.expose
+            @cherrypy.config(**{
+                'tools.cpstats.uriset': 'slow',
+                'tools.cpstats.slow_queries': 0.001,
+                'tools.cpstats.slow_queries_count': 3,
+            })
+            def slow(self, n):
+                time.sleep(0.005)
+                return n
+
+        root = Root()
+        root.cpstats = cpstats.StatsPage()
+        cherrypy.tree.mount(root, config={
+            '/': {'tools.cpstats.on': True, 'request.trace_timings': True},
+            '/cpstats': {'tools.cpstats.on': False},
+        })
+
+    def get_stats(self):
+        # Stats are recorded in on_end_request, after the response
+        # has been sent, so wait for the previous request to finish.
+        for trial in range(20):
+            self.getPage('/cpstats/data')
+            self.assertStatus(200)
+            stats = json.loads(self.body.decode('utf-8'))
+            stats = stats['CherryPy Applications']
+            if stats['Current Requests'] == 0:
+                return stats
+            time.sleep(0.05)
+        self.fail('Requests still in progress: %r' % stats['Requests'])
+
+    def test_totals(self):
+        before = self.get_stats()
+        for i in range(5):
+            self.getPage('/')
+            self.assertBody('hello')
+        self.getPage('/echo', method='POST', body='body=abcdef')
+        self.assertBody('abcdef')
+        after = self.get_stats()
+
+        assert after['Total Requests'] - before['Total Requests'] == 6
+        assert after['Total Bytes Written'] - before['Total Bytes Written'] \
+            == 5 * len('hello') + len('abcdef')
+        assert after['Total Bytes Read'] - before['Total Bytes Read'] \
+            == len('body=abcdef')
+        assert after['Total Time'] >= before['Total Time']
+        assert after['Current Requests'] == 0
+        assert after['Bytes Read/Request'] > 0
+        # The published counters are plain numbers.
+        assert cpstats.appstats['Total Requests'] == after['Total Requests']
+
+        self.getPage('/cpstats/')
+        self.assertStatus(200)
+        self.assertInBody('Total Requests')
+
+    def test_latency(self):
+        before = self.get_stats().get('URI Set Tracking', {})
+        before = before.get('slow', {}).get('Count', 0)
+        for i in range(5):
+            self.getPage('/slow?n=%d' % i)
+            self.assertBody(str(i))
+        stats = self.get_stats()
+
+        assert stats['Latency p50'] > 0
+        assert stats['Latency p99'] >= stats['Latency p50']
+
+        slow = stats['URI Set Tracking']['slow']
+        assert slow['Count'] - before == 5
+        assert 0.005 <= slow['Min'] <= slow['p50'] <= slow['p999']
+        assert slow['p999'] <= slow['Max']
+
+        # Only the last slow_queries_count slow requests are kept.
+        request_lines = [
+            q['Request-Line'] for q in stats['Slow Queries']
+            if 'slow' in q['Request-Line']
+        ]
+        assert request_lines == [
+            'GET /slow?n=%d HTTP/1.1' % i for i in (2, 3, 4)
+        ]
+        assert stats['Slow Queries'][-1]['Response Status'] == '200 OK'
+
+        self.getPage('/cpstats/')
+        self.assertStatus(200)
+        self.assertInBody('URI Set Tracking')
+
+    def test_timings(self):
+        self.getPage('/slow?n=1')
+        stats = self.get_stats()
+
+        handler = stats['Stage Timing']['handler']
+        assert handler['Count'] >= 1
+        assert handler['Max'] >= 0.005
+        assert stats['Stage Timing']['before_handler']['Count'] >= 1
+        assert stats['Hook Timing']['before_handler trailing_slash']['Count']
+
+        self.getPage('/cpstats/metrics')
+        lines = self.body.decode('utf-8').splitlines()
+        assert 'cherrypy_stage_duration_seconds_count{stage="handler"} %d' % (
+            handler['Count']) in lines
+
+    def test_metrics(self):
+        page = cherrypy.tree.apps[''].root.cpstats
+        page.metrics_cache_interval = 0
+        self.get_stats()
+        self.getPage('/slow?n=1')
+        self.get_stats()
+        stats = self.get_stats()
+
+        self.getPage('/cpstats/metrics')
+        self.assertStatus(200)
+        self.assertHeader(
+            'Content-Type',
+            'application/openmetrics-text; version=1.0.0; charset=utf-8')
+        lines = self.body.decode('utf-8').splitlines()
+        assert lines[-1] == '# EOF'
+        assert '# TYPE cherrypy_requests counter' in lines
+        assert 'cherrypy_requests_total %d' % stats['Total Requests'] \
+            in lines
+        assert 'cherrypy_requests_in_progress 0' in lines
+        assert '# TYPE cherrypy_uriset_duration_seconds summary' in lines
+        assert [
+            line for line in lines
+            if line.startswith('cherrypy_uriset_duration_seconds'
+                               '{uriset="slow",quantile="0.99"} ')
+        ]
+        assert [
+            line for line in lines
+            if line.startswith('cherrypy_request_duration_seconds_count ')
+        ]
+
+        # The rendered output is reused for metrics_cache_interval.
+        page.metrics_cache_interval = 60
+        try:
+            self.getPage('/cpstats/metrics')
+            first = self.body
+            self.getPage('/')
+            self.get_stats()
+            self.getPage('/cpstats/metrics')
+            assert self.body == first
+        finally:
+            page.metrics_cache_interval = 0
+        self.getPage('/cpstats/metrics')
+        assert self.body != first
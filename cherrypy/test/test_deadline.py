@@ -0,0 +1,104 @@
+import logging
+import time
+
+import cherrypy
+from cherrypy.test import helper
+
+
+class DeadlineTest(helper.CPWebCase):
+
+    @staticmethod
+    def setup_server():
+        def slow_hook():
+            time.sleep(0.2)
+
+        class Root(object):
+
+            @cherrypy.expose
+            def index(self):
+                return repr(cherrypy.request.time_remaining())
+
+            @cherrypy.expose
+            @cherrypy.config(**{
+                'request.timeout': 0.1,
+                'hooks.on_start_resource': slow_hook,
+            })
+            def slow_start(self):
+                return 'too late'
+
+            @cherrypy.expose
+            @cherrypy.config(**{'request.timeout': 0.1})
+            def spin(self):
+                start = time.time()
+                while time.time() - start < 5:
+                    time.sleep(0.01)
+                return 'not interrupted'
+
+        cherrypy.tree.mount(Root(), config={
+            '/': {'request.deadline_header': 'Request-Timeout'},
+        })
+        cherrypy.config.update({
+            'engine.watchdog.on': True,
+            'engine.watchdog.frequency': 0.05,
+            'engine.watchdog.interrupt': True,
+        })
+
+    @classmethod
+    def teardown_class(cls):
+        super(cls, cls).teardown_class()
+        cherrypy.engine.watchdog.unsubscribe()
+
+    def test_no_deadline(self):
+        self.getPage('/')
+        self.assertStatus(200)
+        self.assertBody('None')
+
+    def test_deadline_header(self):
+        self.getPage('/', headers=[('Request-Timeout', '5')])
+        self.assertStatus(200)
+        assert 4 < float(self.body) <= 5
+
+        self.getPage('/', headers=[('Request-Timeout', '0')])
+        self.assertStatus(503)
+        self.assertInBody('ran past its deadline')
+
+        # Invalid values are ignored.
+        self.getPage('/', headers=[('Request-Timeout', 'soon')])
+        self.assertBody('None')
+
+    def test_hook_points(self):
+        self.getPage('/slow_start')
+        self.assertStatus(503)
+
+    def test_watchdog(self):
+        stats = logging.statistics['CherryPy Watchdog']
+        assert stats['Enabled'](stats)
+        before = dict(stats)
+        self.getPage('/spin')
+        self.assertStatus(503)
+        self.assertInBody('ran past its deadline')
+        assert stats['Overruns'] == before['Overruns'] + 1
+        assert stats['Interrupts'] == before['Interrupts'] + 1
+        # The request is forgotten once the response has been sent.
+        for trial in range(50):
+            if not stats['Current Requests'](stats):
+                break
+            time.sleep(0.01)
+        assert stats['Current Requests'](stats) == 0
+
+        # A request which finished in time isn't interrupted later on.
+        self.getPage('/', headers=[('Request-Timeout', '0.05')])
+        self.assertStatus(200)
+        time.sleep(0.2)
+        self.getPage('/')
+        self.assertStatus(200)
+        assert stats['Interrupts'] == before['Interrupts'] + 1
+
+    def test_watchdog_unsubscribed(self):
+        watchdog = cherrypy.engine.watchdog
+        stats = logging.statistics['CherryPy Watchdog']
+        watchdog.unsubscribe()
+        try:
+            assert not stats['Enabled'](stats)
+        finally:
+            watchdog.subscribe()
@@ -1,5 +1,9 @@
 """Basic tests for the CherryPy core: request handling."""
 
+import datetime
+import gc
+import io
+import json
 import logging
 import os
 from unittest import mock
@@ -9,6 +13,7 @@ import requests  # FIXME: Temporary using it directly, better switch
 
 import cherrypy
 from cherrypy._cpcompat import ntou
+from cherrypy.lib import cpstats
 from cherrypy.test import helper, logtest
 
 localDir = os.path.dirname(__file__)
@@ -175,6 +180,32 @@ class AccessLogTests(helper.CPWebCase, logtest.LogCase):
         self.getPage('/as_string')
         self.assertValidUUIDv4()
 
+    @mock.patch(
+        'cherrypy._cplogging.LogManager.access_log_format',
+        '{s} {D} {I} {H} {C} {P}',
+    )
+    def testExtendedLogFormat(self):
+        self.markLog()
+        self.getPage('/as_string')
+        self.assertLog(-1, '200 ')
+        self.assertLog(-1, ' 0 setup_server.<locals>.Root.as_string - ')
+
+    @mock.patch(
+        'cherrypy._cplogging.LogManager.access_log_format',
+        '{r} {s} {a} {D}',
+    )
+    @mock.patch('cherrypy._cplogging.LogManager.access_log_json', True)
+    def testJSONLogFormat(self):
+        self.getPage('/as_string', headers=[('User-Agent', 'A "quoted" UA')])
+        with open(access_log) as f:
+            entry = json.loads(f.readlines()[-1])
+        assert sorted(entry) == [
+            'duration_us', 'request_line', 'status', 'user_agent']
+        assert entry['request_line'] == 'GET /as_string HTTP/1.1'
+        assert entry['status'] == '200'
+        assert entry['user_agent'] == 'A "quoted" UA'
+        assert isinstance(entry['duration_us'], int)
+
     def testEscapedOutput(self):
         # Test unicode in access log pieces.
         self.markLog()
@@ -211,3 +242,158 @@ def test_tracebacks(server, caplog):
     assert 'raise ValueError()' in resp.text
     assert 'HTTP' in exc_msg
     assert exc_cls is ValueError
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def access_log_manager():
+    log = cherrypy._cplogging.LogManager('test_async')
+    handler = ListHandler()
+    log.access_log.addHandler(handler)
+    log.access_log_format = '{r} {s}'
+    log.access_async = True
+    with mock.patch.object(
+            cherrypy.serving.response, 'output_status', b'200 OK',
+            create=True):
+        yield log, handler
+    log.stop_access_writer()
+    log.access_log.removeHandler(handler)
+    cherrypy.engine.unsubscribe('graceful', log.reopen_files)
+    cherrypy.engine.unsubscribe('stop', log.stop_access_writer)
+
+
+def test_async_access_log(access_log_manager):
+    log, handler = access_log_manager
+    request_line = cherrypy.serving.request.request_line
+    for i in range(250):
+        log.access()
+    assert log._access_writer.thread.is_alive()
+
+    # Stopping the engine writes out every queued entry.
+    log.stop_access_writer()
+    assert log._access_writer is None
+    assert handler.messages == ['%s 200' % request_line] * 250
+    assert log.access_dropped == 0
+
+
+def test_async_access_log_batches(access_log_manager):
+    log, handler = access_log_manager
+    stream = io.StringIO()
+    stream.write = mock.Mock(wraps=stream.write)
+    stream_handler = logging.StreamHandler(stream)
+    log.access_log.addHandler(stream_handler)
+    try:
+        # Queue the entries before the writer starts taking them off.
+        with mock.patch.object(
+                cherrypy._cplogging.AccessLogWriter, 'start'):
+            for i in range(9):
+                log.access()
+            log._access_writer.put(log._access_writer._stop)
+            log.access()
+        log._access_writer.start()
+        log._access_writer.thread.join()
+    finally:
+        log.access_log.removeHandler(stream_handler)
+
+    # The entry queued after the stop marker, in the same batch, is kept.
+    request_line = cherrypy.serving.request.request_line
+    assert handler.messages == ['%s 200' % request_line] * 10
+    assert stream.getvalue() == '%s 200\n' % request_line * 10
+    assert stream.write.call_count == 1
+    log._access_writer = None
+
+
+def test_async_access_log_overflow(access_log_manager):
+    log, handler = access_log_manager
+    log.access_queue_size = 1
+    with mock.patch.object(log, '_log_access_batch'):
+        # Fill the queue before the writer starts taking entries off it.
+        with mock.patch.object(
+                cherrypy._cplogging.AccessLogWriter, 'start'):
+            log.access()
+            log.access()
+            log.access()
+        assert log.access_dropped == 2
+
+        log._access_writer.start()
+    log.stop_access_writer()
+
+
+def test_timestamp_cache():
+    format = mock.Mock(side_effect=str)
+    cache = cherrypy._cplogging.TimestampCache(format)
+    assert cache(1000.25) == '1000'
+    assert cache(1000.75) == '1000'
+    assert format.call_count == 1
+    assert cache(1001.5) == '1001'
+    assert format.call_count == 2
+
+    timestamp = 1234567890.5
+    now = datetime.datetime.fromtimestamp(timestamp)
+    assert cherrypy._cplogging.apache_time(timestamp) == now.strftime(
+        '[%d/%b/%Y:%H:%M:%S]')
+
+
+def test_access_log_sampling(access_log_manager):
+    log, handler = access_log_manager
+    log.access_async = False
+    log.access_sample_rates = {2: 0, 4: 1}
+    log.access()
+    assert handler.messages == []
+    assert log.access_sampled_out == 1
+
+    with mock.patch.object(
+            cherrypy.serving.response, 'output_status', b'404 Not Found'):
+        log.access()
+    assert len(handler.messages) == 1
+
+
+def test_error_rate_limit():
+    log = cherrypy._cplogging.LogManager('test_rate_limit')
+    handler = ListHandler()
+    log.error_log.addHandler(handler)
+    log.error_rate_limit = 1
+    log.error_burst = 2
+    try:
+        with mock.patch('time.time', return_value=1000.0):
+            for i in range(5):
+                log.error('Boom', 'TEST')
+            log.error('Other', 'TEST')
+        assert len(handler.messages) == 3
+        assert log.errors_suppressed == 3
+
+        with mock.patch('time.time', return_value=1001.0):
+            log.error('Boom', 'TEST')
+        assert handler.messages[-1].endswith(
+            'Boom [3 identical messages suppressed]')
+
+        stats = cpstats.extrapolate_statistics(
+            logging.statistics['CherryPy Logging'])
+        record = stats['Log Managers']['cherrypy.test_rate_limit']
+        assert record['Error Messages Suppressed'] == 3
+    finally:
+        log.error_log.removeHandler(handler)
+        cherrypy.engine.unsubscribe('graceful', log.reopen_files)
+        cherrypy.engine.unsubscribe('stop', log.stop_access_writer)
+
+
+def test_log_manager_stats_released():
+    log = cherrypy._cplogging.LogManager('test_released')
+    cherrypy.engine.unsubscribe('graceful', log.reopen_files)
+    cherrypy.engine.unsubscribe('stop', log.stop_access_writer)
+    managers = logging.statistics['CherryPy Logging']['Log Managers']
+    record = managers['cherrypy.test_released']
+    assert record['Error Messages Suppressed'](record) == 0
+
+    del log
+    gc.collect()
+    assert 'cherrypy.test_released' not in managers
@@ -0,0 +1,124 @@
+import logging
+import os
+import time
+
+import pytest
+
+import cherrypy
+from cherrypy.lib import offload
+from cherrypy.process import plugins, wspbus
+from cherrypy.test import helper
+
+
+def square(n):
+    return int(n) ** 2
+
+
+def render(n):
+    return 'square: %d' % square(n)
+
+
+def test_process_pool():
+    bus = wspbus.Bus()
+    pool = plugins.ProcessPool(bus, max_workers=2)
+    with pytest.raises(RuntimeError):
+        pool.submit(square, 3)
+
+    pool.subscribe()
+    bus.start()
+    try:
+        assert pool.submit(square, 3).result() == 9
+        assert pool.submit(os.getpid).result() != os.getpid()
+
+        # A broken pool is replaced.
+        pool.submit(os._exit, 1).exception()
+        assert pool.submit(square, 4).result() == 16
+    finally:
+        bus.exit()
+    assert pool.executor is None
+
+
+class Root(object):
+
+    @cherrypy.expose
+    def index(self):
+        return str(os.getpid())
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    def data(self, n):
+        return {'square': square(n), 'pid': os.getpid()}
+
+    @cherrypy.expose
+    @cherrypy.config(**{'tools.offload.function': render})
+    def named(self, n):
+        raise AssertionError('Offloaded function not called')
+
+    @cherrypy.expose
+    @cherrypy.config(**{'tools.offload.timeout': 0.1})
+    def slow(self):
+        time.sleep(1)
+        return 'too late'
+
+    @cherrypy.expose
+    def fail(self):
+        raise ValueError('nope')
+
+
+class OffloadTest(helper.CPWebCase):
+
+    @staticmethod
+    def setup_server():
+        # Mounted at '', the root would get an unpicklable favicon_ico.
+        cherrypy.tree.mount(Root(), '/app', config={
+            '/': {'tools.offload.on': True},
+        })
+        cherrypy.config.update({
+            'engine.process_pool.on': True,
+            'engine.process_pool.max_workers': 2,
+        })
+
+    @classmethod
+    def teardown_class(cls):
+        super(cls, cls).teardown_class()
+        cherrypy.engine.process_pool.unsubscribe()
+
+    def test_handler(self):
+        self.getPage('/app/')
+        self.assertStatus(200)
+        assert int(self.body) != os.getpid()
+
+        self.getPage('/app/named?n=7')
+        self.assertBody('square: 49')
+
+        # Tools which wrap the handler wrap the offloaded one.
+        self.getPage('/app/data?n=3')
+        self.assertHeader('Content-Type', 'application/json')
+        assert b'"square": 9' in self.body
+
+        # Params are checked before offloading.
+        self.getPage('/app/data')
+        self.assertStatus(404)
+
+        self.getPage('/app/fail')
+        self.assertStatus(500)
+        self.assertInBody('ValueError')
+
+    def test_timeout(self):
+        before = dict(logging.statistics['CherryPy Offload'])
+        self.getPage('/app/slow')
+        self.assertStatus(503)
+        self.assertInBody('took longer than 0.1 seconds')
+
+        stats = logging.statistics['CherryPy Offload']
+        assert stats['Total Timeouts'] == before['Total Timeouts'] + 1
+        assert stats['Total Calls'] == before['Total Calls'] + 1
+        assert stats['Current Calls'] == 0
+        assert stats['Running'](stats)
+        assert stats['Max Workers'](stats) == 2
+
+    def test_run(self):
+        assert offload.run(square, 5) == 25
+        with pytest.raises(cherrypy.HTTPError) as exc:
+            offload.run(time.sleep, 1, timeout=0.1)
+        assert exc.value.status == 503
@@ -1,4 +1,4 @@
-from cherrypy.process import plugins
+from cherrypy.process import plugins, wspbus
 
 
 __metaclass__ = type
@@ -12,3 +12,82 @@ class TestAutoreloader:
             __file__ = None
 
         assert plugins.Autoreloader._file_for_file_module(test_module) is None
+
+
+class FakePool:
+    """The parts of cheroot's ThreadPool which ThreadPoolSizer uses."""
+
+    def __init__(self, size, min=2, max=-1):
+        self._threads = [object()] * size
+        self._pending_shutdowns = []
+        self.min = min
+        self.max = max
+        self.idle = size
+        self.qsize = 0
+
+    def grow(self, amount):
+        self._threads.extend([object()] * amount)
+        self.idle += amount
+
+    def shrink(self, amount):
+        amount -= len(self._pending_shutdowns)
+        if amount > 0:
+            self._pending_shutdowns.extend([None] * amount)
+            self.idle -= amount
+
+
+class FakeServer:
+    def __init__(self, pool):
+        class httpserver:
+            requests = pool
+        self.httpserver = httpserver
+
+
+class TestThreadPoolSizer:
+    def test_resize(self):
+        pool = FakePool(4, min=2, max=10)
+        sizer = plugins.ThreadPoolSizer(
+            wspbus.Bus(), FakeServer(pool), frequency=0)
+        sizer.patience = 3
+
+        # Connections queued: grow by their number.
+        pool.idle, pool.qsize = 0, 3
+        sizer.run()
+        assert len(pool._threads) == 7
+        assert sizer.target == 7
+
+        # All busy: grow by a quarter, within thread_pool_max.
+        pool.idle, pool.qsize = 0, 0
+        sizer.run()
+        assert len(pool._threads) == 8
+        pool.idle = 0
+        sizer.run()
+        sizer.run()
+        assert len(pool._threads) == 10
+        assert sizer.stats['Grows'] == 3
+
+        # Mostly idle: shrink by half the idle threads, after a while.
+        pool.idle = 8
+        sizer.run()
+        sizer.run()
+        assert pool._pending_shutdowns == []
+        sizer.run()
+        assert len(pool._pending_shutdowns) == 4
+        assert sizer.target == 6
+        stats = sizer.stats
+        assert stats['Current Threads'](stats) == 6
+        assert stats['Target Threads'](stats) == 6
+        assert stats['Shrinks'] == 1
+
+        # Not below thread_pool.
+        pool.idle = 6
+        for i in range(9):
+            sizer.run()
+        assert sizer.target == 2
+        assert stats['Current Threads'](stats) == 2
+
+        # Busy enough to keep, not to grow.
+        pool.idle = 1
+        for i in range(5):
+            sizer.run()
+        assert sizer.target == 2
@@ -0,0 +1,116 @@
+import threading
+
+import cherrypy
+from cherrypy.lib import profiler
+from cherrypy.test import helper
+
+
+def busy_function(n):
+    return sum(i * i for i in range(n))
+
+
+def test_sampling_profiler():
+    p = profiler.SamplingProfiler(sample_rate=3, window=2)
+    assert p.statfiles() == []
+    assert 'No requests' in p.stats('sampled')
+
+    results = [p.run(busy_function, 1000) for i in range(7)]
+    assert results == [busy_function(1000)] * 7
+    # Calls 0, 3 and 6 were sampled; the window keeps the last 2.
+    assert len(p.profiles) == 2
+    assert p.statfiles() == ['sampled']
+    report = p.stats('sampled')
+    assert report.startswith('2 sampled calls')
+    assert 'busy_function' in report
+
+
+def test_sampling_profiler_stop():
+    p = profiler.SamplingProfiler(stack_interval=0.01)
+    listeners = cherrypy.engine.listeners
+    try:
+        # The stack sampler runs while the engine does.
+        assert p.sampler.start in listeners['start']
+        assert p.sampler.stop in listeners['stop']
+    finally:
+        p.stop()
+    assert p.sampler.start not in listeners['start']
+    assert p.sampler.stop not in listeners['stop']
+    assert p.sampler.thread is None
+
+
+def test_stack_sampler():
+    started = threading.Event()
+    done = threading.Event()
+
+    def waiting_function():
+        started.set()
+        done.wait()
+
+    t = threading.Thread(target=waiting_function, name='Waiter')
+    t.start()
+    try:
+        started.wait()
+        sampler = profiler.StackSampler(request_threads_only=False)
+        sampler.sample()
+        sampler.sample()
+    finally:
+        done.set()
+        t.join()
+
+    stacks = [
+        line for line in sampler.collapsed().splitlines()
+        if line.startswith('Waiter;')
+    ]
+    assert len(stacks) == 1
+    stack, count = stacks[0].rsplit(' ', 1)
+    assert count == '2'
+    assert 'test_profiler.py:waiting_function' in stack.split(';')
+
+    # Threads outside requests are skipped by default.
+    sampler = profiler.StackSampler()
+    sampler.sample()
+    assert sampler.samples == 1
+    me = threading.current_thread().name
+    assert not [s for s in sampler.stacks if s[0] == me]
+
+
+class SamplingProfilerTest(helper.CPWebCase):
+
+    @staticmethod
+    def setup_server():
+        class Root(object):
+
+            @cherrypy.expose
+            def index(self):
+                return str(busy_function(100))
+
+        app = cherrypy.tree.mount(Root(), '/app')
+        wrapped = profiler.make_app(app, sample_rate=2, stack_interval=0.005)
+        cherrypy.tree.graft(wrapped, '/app')
+        cherrypy.tree.mount(wrapped.profiler, '/profiler')
+
+    @classmethod
+    def teardown_class(cls):
+        cherrypy.tree.apps['/profiler'].root.stop()
+        super(cls, cls).teardown_class()
+
+    def test_web_ui(self):
+        # Started along with the engine.
+        assert cherrypy.tree.apps['/profiler'].root.sampler.thread.is_alive()
+
+        for i in range(4):
+            self.getPage('/app/')
+            self.assertBody(str(busy_function(100)))
+
+        self.getPage('/profiler/menu')
+        self.assertInBody("href='report?filename=sampled'")
+        self.assertInBody("href='stacks'")
+
+        self.getPage('/profiler/report?filename=sampled')
+        self.assertStatus(200)
+        self.assertInBody('2 sampled calls')
+        self.assertInBody('busy_function')
+
+        self.getPage('/profiler/stacks')
+        self.assertStatus(200)
+        self.assertHeader('Content-Type', 'text/plain;charset=utf-8')
@@ -0,0 +1,140 @@
+import logging
+import os
+
+import pytest
+
+import cherrypy
+from cherrypy.lib import ratelimit
+from cherrypy.test import helper
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmpdir):
+    if request.param == 'sqlite':
+        return ratelimit.SQLiteStore(os.path.join(str(tmpdir), 'rl.db'))
+    return ratelimit.MemoryStore(shards=4)
+
+
+def test_check(store):
+    def check(now, key='a'):
+        return ratelimit.check(key, rate=2, period=1, burst=3,
+                               store=store, now=now)
+
+    # A burst of 3, then one every half second.
+    assert [check(100).remaining for i in range(3)] == [2, 1, 0]
+    limit = check(100)
+    assert not limit.allowed
+    assert limit.retry_after == 0.5
+    assert limit.reset == 1.5
+    assert limit.headers == {
+        'RateLimit-Limit': '3',
+        'RateLimit-Remaining': '0',
+        'RateLimit-Reset': '2',
+        'Retry-After': '1',
+    }
+    # Other clients have their own limits.
+    assert check(100, key='b').allowed
+
+    assert not check(100.4).allowed
+    limit = check(100.5)
+    assert limit.allowed
+    assert limit.remaining == 0
+    assert 'Retry-After' not in limit.headers
+    assert not check(100.5).allowed
+
+    # The bucket refills over time.
+    assert check(102).remaining == 2
+
+
+@pytest.mark.parametrize('limit', [
+    {'rate': 0}, {'rate': -1}, {'period': 0}, {'burst': 0}, {'burst': 0.5},
+])
+def test_check_invalid(limit):
+    kwargs = {'rate': 1, 'period': 1}
+    kwargs.update(limit)
+    store = ratelimit.MemoryStore()
+    with pytest.raises(ValueError):
+        ratelimit.check('a', store=store, **kwargs)
+    assert len(store) == 0
+
+
+def test_memory_store_prunes():
+    store = ratelimit.MemoryStore(shards=1)
+    store.prune_interval = 10
+    for i in range(9):
+        ratelimit.check(str(i), rate=1, store=store, now=100)
+    assert len(store) == 9
+    ratelimit.check('late', rate=1, store=store, now=200)
+    assert len(store) == 1
+
+
+class RateLimitTest(helper.CPWebCase):
+
+    @staticmethod
+    def setup_server():
+        class Root(object):
+
+            @cherrypy.expose
+            def index(self):
+                return 'ok'
+
+            @cherrypy.expose
+            def echo(self, body):
+                return body
+
+        cherrypy.tree.mount(Root(), '/app', {
+            '/': {
+                'tools.proxy.on': True,
+                'tools.ratelimit.on': True,
+                'tools.ratelimit.rate': 1,
+                'tools.ratelimit.period': 60,
+                'tools.ratelimit.burst': 2,
+            },
+            '/echo': {
+                'tools.ratelimit.key': 'header',
+                'tools.ratelimit.header': 'X-Api-Key',
+                'tools.ratelimit.name': 'echo',
+            },
+        })
+
+    def test_limit(self):
+        before = dict(logging.statistics['CherryPy Rate Limit'])
+        # tools.proxy sets request.remote from X-Forwarded-For.
+        headers = [('X-Forwarded-For', '192.0.2.1')]
+        self.getPage('/app/', headers=headers)
+        self.assertStatus(200)
+        self.assertHeader('RateLimit-Limit', '2')
+        self.assertHeader('RateLimit-Remaining', '1')
+        self.getPage('/app/', headers=headers)
+        self.assertHeader('RateLimit-Remaining', '0')
+
+        self.getPage('/app/', headers=headers)
+        self.assertStatus(429)
+        self.assertHeader('Retry-After', '60')
+        self.assertHeader('RateLimit-Remaining', '0')
+
+        self.getPage('/app/', headers=[('X-Forwarded-For', '192.0.2.2')])
+        self.assertStatus(200)
+
+        stats = logging.statistics['CherryPy Rate Limit']
+        assert stats['Total Limited'] == before['Total Limited'] + 1
+        assert stats['Total Allowed'] == before['Total Allowed'] + 3
+
+    def test_header_key(self):
+        body = 'body=' + 'x' * 100
+
+        def post(key):
+            self.getPage('/app/echo', method='POST', body=body, headers=[
+                ('X-Api-Key', key),
+                ('Content-Type', 'application/x-www-form-urlencoded'),
+                ('Content-Length', str(len(body))),
+            ])
+
+        for i in range(2):
+            post('secret')
+            self.assertStatus(200)
+        post('secret')
+        self.assertStatus(429)
+        post('other')
+        self.assertStatus(200)
+        self.assertBody('x' * 100)
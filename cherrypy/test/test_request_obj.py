@@ -57,6 +57,24 @@ class RequestObjectTests(helper.CPWebCase):
                     str(cherrypy.request.unique_id),
                 ]
 
+            @cherrypy.expose
+            @cherrypy.config(**{
+                'request.trace_timings': True,
+                'tools.response_headers.on': True,
+                'tools.response_headers.headers': [('X-Traced', 'yes')],
+            })
+            def timings(self):
+                timings = cherrypy.request.timings
+                return '\n'.join(
+                    [stage for stage, ns in timings.stages] +
+                    ['%s %s' % (point, name)
+                     for point, name, ns in timings.hooks]
+                )
+
+            @cherrypy.expose
+            def untimed(self):
+                return repr(cherrypy.request.timings)
+
         root = Root()
 
         class TestType(type):
@@ -337,6 +355,22 @@ class RequestObjectTests(helper.CPWebCase):
             != uuid.UUID(third_uuid4, version=4)
         )
 
+    def test_timings(self):
+        self.getPage('/timings')
+        self.assertHeader('X-Traced', 'yes')
+        self.assertBody(
+            'on_start_resource\n'
+            'process_query_string\n'
+            'before_request_body\n'
+            'before_handler\n'
+            'on_start_resource response_headers\n'
+            'before_handler trailing_slash\n'
+            'before_handler ResponseEncoder'
+        )
+
+        self.getPage('/untimed')
+        self.assertBody('None')
+
     def testRelativeURIPathInfo(self):
         self.getPage('/pathinfo/foo/bar')
         self.assertBody('/pathinfo/foo/bar')
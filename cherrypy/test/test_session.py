@@ -1,5 +1,12 @@
+import base64
+import collections
+import datetime
 import os
+import pickle
 import platform
+import socketserver
+import subprocess
+import sys
 import threading
 import time
 from http.client import HTTPConnection
@@ -12,6 +19,7 @@ import portend
 
 import cherrypy
 from cherrypy._cpcompat import HTTPSConnection
+from cherrypy.lib import locking
 from cherrypy.lib import sessions
 from cherrypy.lib import reprconf
 from cherrypy.lib.httputil import response_codes
@@ -149,9 +157,10 @@ class SessionTest(helper.CPWebCase):
         consume(
             file.remove_p()
             for file in localDir.listdir()
-            if file.basename().startswith(
-                sessions.FileSession.SESSION_PREFIX
-            )
+            if file.basename().startswith((
+                sessions.FileSession.SESSION_PREFIX,
+                sessions.SqliteSession.db_name,
+            ))
         )
 
     def test_0_Session(self):
@@ -236,7 +245,7 @@ class SessionTest(helper.CPWebCase):
         self.getPage('/set_session_cls/cherrypy.lib.sessions.RamSession')
         self._test_Concurrency()
 
-    @pytest.mark.xfail(reason='#1306')
+    @pytest.mark.xfail(locking.fcntl is None, reason='#1306')
     def test_2_File_Concurrency(self):
         self.getPage('/set_session_cls/cherrypy.lib.sessions.FileSession')
         self._test_Concurrency()
@@ -292,6 +301,11 @@ class SessionTest(helper.CPWebCase):
         assert len(errors) == 0
         assert hitcount == expected
 
+    def test_2_Sqlite_Concurrency(self):
+        self.getPage('/set_session_cls/cherrypy.lib.sessions.SqliteSession')
+        self._test_Concurrency()
+        self.getPage('/set_session_cls/cherrypy.lib.sessions.FileSession')
+
     def test_3_Redirect(self):
         # Start a new session
         self.getPage('/testStr')
@@ -454,6 +468,164 @@ def memcached_configured(
     )
 
 
+class MemcachedStandIn(socketserver.ThreadingTCPServer):
+    """A memcached stand-in, speaking enough of the text protocol for tests."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self):
+        socketserver.ThreadingTCPServer.__init__(
+            self, ('127.0.0.1', 0), MemcachedStandInHandler)
+        self.items = {}
+        self.items_lock = threading.Lock()
+        self.commands = collections.Counter()
+
+    @property
+    def address(self):
+        return '%s:%s' % self.server_address
+
+    def get(self, key):
+        flags, value, expires = self.items.get(key, (0, None, 0))
+        # Like memcached, count expiry in whole seconds.
+        if expires and expires <= int(time.time()):
+            self.items.pop(key, None)
+            return None
+        return value and (flags, value)
+
+    def store(self, command, key, flags, exptime, value):
+        with self.items_lock:
+            if command == b'add' and self.get(key) is not None:
+                return False
+            # Like memcached, treat exptime over 30 days as Unix time.
+            if 0 < exptime <= 60 * 60 * 24 * 30:
+                exptime += time.time()
+            self.items[key] = flags, value, exptime
+            return True
+
+    def delete(self, key):
+        with self.items_lock:
+            return self.items.pop(key, None) is not None
+
+
+class MemcachedStandInHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            command, *args = line.split()
+            self.server.commands[command.decode()] += 1
+            noreply = args[-1:] == [b'noreply']
+            if command == b'get':
+                for key in args:
+                    item = self.server.get(key)
+                    if item is not None:
+                        flags, value = item
+                        self.wfile.write(b'VALUE %s %d %d\r\n%s\r\n' % (
+                            key, flags, len(value), value))
+                reply = b'END'
+            elif command in (b'set', b'add'):
+                key, flags, exptime, length = args[:4]
+                value = self.rfile.read(int(length) + 2)[:-2]
+                stored = self.server.store(
+                    command, key, int(flags), int(exptime), value)
+                reply = b'STORED' if stored else b'NOT_STORED'
+            elif command == b'delete':
+                deleted = self.server.delete(args[0])
+                reply = b'DELETED' if deleted else b'NOT_FOUND'
+            else:
+                reply = b'ERROR'
+            if not noreply:
+                self.wfile.write(reply + b'\r\n')
+
+
+@pytest.fixture(scope='session')
+def memcached_standin_instance():
+    server = MemcachedStandIn()
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    t.join()
+
+
+@pytest.fixture
+def memcached_standin(
+    memcached_standin_instance, monkeypatch,
+    memcached_client_present,
+):
+    monkeypatch.setattr(
+        sessions.MemcachedSession,
+        'servers',
+        [memcached_standin_instance.address],
+    )
+    return memcached_standin_instance
+
+
+@pytest.fixture
+def memcached_session_class(memcached_standin):
+    sessions.MemcachedSession.setup()
+    return sessions.MemcachedSession
+
+
+def test_memcached_session(memcached_session_class, memcached_standin):
+    sess = memcached_session_class(clean_freq=0)
+    sess.acquire_lock()
+    sess['counter'] = 1
+    sess.save()
+    assert not sess.locked
+
+    memcached_standin.commands.clear()
+    sess = memcached_session_class(sess.id, clean_freq=0)
+    assert not sess.missing
+    sess.acquire_lock()
+    assert sess['counter'] == 1
+    sess['counter'] = 2
+    sess.save()
+    # Checking the id and loading the data took one round trip.
+    assert memcached_standin.commands == {'get': 1, 'add': 1, 'set': 1}
+
+
+def test_memcached_session_stale_data(memcached_session_class):
+    sess = memcached_session_class(clean_freq=0)
+    sess.acquire_lock()
+    sess['counter'] = 1
+    sess.save()
+
+    # s2 checks the id (reading counter 1) before s1 takes the lock...
+    s1 = memcached_session_class(sess.id, clean_freq=0)
+    s2 = memcached_session_class(sess.id, clean_freq=0)
+    s1.acquire_lock()
+    s1['counter'] += 1
+    s1.save()
+
+    # ...so s2 must not reuse what it read.
+    s2.acquire_lock()
+    assert s2['counter'] == 2
+    s2.release_lock()
+
+
+def test_memcached_session_lock_timeout(memcached_session_class):
+    s1 = memcached_session_class(clean_freq=0)
+    s1.acquire_lock()
+    s1.load()
+    s1.save()
+    s1.acquire_lock()
+
+    s2 = memcached_session_class(s1.id, clean_freq=0, lock_timeout=0.05)
+    with pytest.raises(locking.LockTimeout):
+        s2.acquire_lock()
+    s2.lock_timeout = datetime.timedelta(0)
+    with pytest.raises(locking.LockTimeout):
+        s2.acquire_lock()
+
+    s1.release_lock()
+    s2.acquire_lock()
+    assert s2.locked
+    s2.release_lock()
+
+
 @pytest.mark.skipif(
     platform.system() == 'Windows',
     reason='pytest-services helper does not work under Windows',
@@ -546,3 +718,365 @@ class MemcachedSessionTest(helper.CPWebCase):
         # code has to survive calling save/close without init.
         self.getPage('/restricted', self.cookies, method='POST')
         self.assertErrorPage(405, response_codes[405][1])
+
+
+def test_file_session_hashed_subdirectories(tmpdir):
+    sess = sessions.FileSession(
+        storage_path=str(tmpdir), hash_depth=2, clean_freq=0)
+    sess.acquire_lock()
+    sess['counter'] = 1
+    sess.save()
+
+    path = sess._get_file_path()
+    expected = tmpdir / sess.id[:2] / sess.id[2:4] / ('session-' + sess.id)
+    assert path == str(expected)
+    assert len(sess) == 1
+
+    # The file's mtime carries the expiration time.
+    expires = sess.now().timestamp() + sess.timeout * 60
+    assert abs(os.path.getmtime(path) - expires) < 5
+    sess.clean_up()
+    assert os.path.exists(path)
+
+    sess.acquire_lock()
+    sess._save(sess.now() - datetime.timedelta(minutes=1))
+    sess.release_lock()
+    sess.clean_up()
+    assert not os.path.exists(path)
+    assert len(sess) == 0
+
+
+@pytest.mark.skipif(
+    locking.fcntl is None, reason='fcntl is not available',
+)
+def test_file_session_lock_timeout(tmpdir):
+    s1 = sessions.FileSession(storage_path=str(tmpdir), clean_freq=0)
+    s1.acquire_lock()
+    s1.load()
+    s1.save()
+
+    s1.acquire_lock()
+    s2 = sessions.FileSession(
+        s1.id, storage_path=str(tmpdir), clean_freq=0, lock_timeout=0.05)
+    assert s2.id == s1.id
+    with pytest.raises(locking.LockTimeout):
+        s2.acquire_lock()
+    s2.lock_timeout = datetime.timedelta(0)
+    with pytest.raises(locking.LockTimeout):
+        s2.acquire_lock()
+
+    s1.release_lock()
+    s2.acquire_lock()
+    assert s2.locked
+    s2.release_lock()
+    assert not os.path.exists(s2._get_file_path() + s2.LOCK_SUFFIX)
+
+
+def test_file_session_clean_up_legacy_files(tmpdir):
+    """Files whose mtime is their save time are judged by their contents."""
+    now = datetime.datetime.now()
+    saved = time.time() - 60
+    paths = {}
+    for name, expiration_time in (
+        ('live', now + datetime.timedelta(minutes=5)),
+        ('expired', now - datetime.timedelta(minutes=5)),
+    ):
+        path = tmpdir / (sessions.FileSession.SESSION_PREFIX + name)
+        with path.open('wb') as f:
+            pickle.dump(({}, expiration_time), f)
+        os.utime(str(path), (saved, saved))
+        paths[name] = path
+
+    sess = sessions.FileSession(storage_path=str(tmpdir), clean_freq=0)
+    sess.clean_up()
+    assert not paths['expired'].exists()
+    assert paths['live'].exists()
+    # The live file now carries its expiration time, so later clean-ups
+    #   skip it without unpickling it again.
+    assert paths['live'].stat().mtime > time.time()
+
+
+@pytest.mark.parametrize('serializer', ['pickle', 'json', 'msgpack'])
+def test_file_session_serializer(tmpdir, serializer):
+    if serializer == 'msgpack':
+        pytest.importorskip('msgpack')
+    sess = sessions.FileSession(
+        storage_path=str(tmpdir), clean_freq=0, serializer=serializer,
+        compress_threshold=100)
+    sess.acquire_lock()
+    sess['counter'] = 1
+    sess['text'] = 'x' * 200
+    sess.save()
+
+    with open(sess._get_file_path(), 'rb') as f:
+        assert f.read().startswith(sessions.COMPRESSED_PREFIX)
+
+    sess = sessions.FileSession(
+        sess.id, storage_path=str(tmpdir), clean_freq=0,
+        serializer=serializer, compress_threshold=100)
+    assert not sess.missing
+    sess.acquire_lock()
+    assert sess['counter'] == 1
+    assert sess['text'] == 'x' * 200
+    sess.release_lock()
+
+
+def test_session_serializer_timezone_aware_expiry():
+    expiration_time = datetime.datetime.now(datetime.timezone.utc)
+    serializer = sessions.JSONSerializer()
+    data, loaded = serializer.loads(serializer.dumps({}, expiration_time))
+    assert loaded == expiration_time
+    assert loaded.utcoffset() == datetime.timedelta(0)
+
+
+def test_file_session_skip_unchanged(tmpdir, monkeypatch):
+    def make_session(id=None):
+        sess = sessions.FileSession(
+            id, storage_path=str(tmpdir), clean_freq=0, skip_unchanged=True)
+        sess.acquire_lock()
+        sess.load()
+        return sess
+
+    sess = make_session()
+    sess['counter'] = 1
+    sess.save()
+
+    saves = []
+    monkeypatch.setattr(
+        sessions.FileSession, '_save',
+        lambda self, expiration_time: saves.append(self.id))
+
+    sess = make_session(sess.id)
+    assert sess['counter'] == 1
+    sess.save()
+    assert not saves
+
+    sess = make_session(sess.id)
+    sess['counter'] = 2
+    sess.save()
+    assert saves == [sess.id]
+
+    # Unchanged sessions are still written once half the timeout is gone.
+    sess = make_session(sess.id)
+    sess._loaded_state = (
+        sess._loaded_state[0], sess.now() + datetime.timedelta(minutes=1))
+    sess.save()
+    assert saves == [sess.id] * 2
+
+
+@pytest.fixture
+def sqlite_session_class(tmpdir):
+    sessions.SqliteSession.setup(storage_path=str(tmpdir))
+    yield sessions.SqliteSession
+    sessions.SqliteSession.close_connections()
+
+
+def test_sqlite_session(sqlite_session_class):
+    sess = sqlite_session_class(clean_freq=0)
+    sess.acquire_lock()
+    sess['counter'] = 1
+    sess.save()
+    assert not sess.locked
+    assert len(sess) == 1
+
+    sess = sqlite_session_class(sess.id, clean_freq=0)
+    assert not sess.missing
+    sess.acquire_lock()
+    assert sess['counter'] == 1
+    sess.release_lock()
+
+    # Locked sessions survive clean up, even when expired.
+    sess.acquire_lock()
+    sess.timeout = -1
+    sess.save()
+    sess.acquire_lock()
+    sess.clean_up()
+    assert len(sess) == 1
+    sess.release_lock()
+    sess.clean_up()
+    assert len(sess) == 0
+
+
+def test_sqlite_session_clean_up_batches(sqlite_session_class):
+    sess = sqlite_session_class(clean_freq=0, timeout=-1)
+    for i in range(7):
+        sess.id = sess.generate_id()
+        sess.acquire_lock()
+        sess.load()
+        sess.save()
+    assert len(sess) == 7
+    sess.clean_batch_size = 3
+    sess.clean_up()
+    assert len(sess) == 0
+
+
+def test_sqlite_session_lock_timeout(sqlite_session_class):
+    s1 = sqlite_session_class(clean_freq=0)
+    s1.acquire_lock()
+    s1.load()
+    s1.save()
+    s1.acquire_lock()
+
+    s2 = sqlite_session_class(s1.id, clean_freq=0, lock_timeout=0.05)
+    errors = []
+
+    def acquire():
+        try:
+            s2.acquire_lock()
+        except locking.LockTimeout as exc:
+            errors.append(exc)
+        else:
+            s2.release_lock()
+
+    t = threading.Thread(target=acquire)
+    t.start()
+    t.join()
+    assert len(errors) == 1
+
+    s2.lock_timeout = None
+    t = threading.Thread(target=acquire)
+    t.start()
+    time.sleep(0.1)
+    s1.release_lock()
+    t.join(5)
+    assert not t.is_alive()
+    assert not errors[1:]
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='needs os.kill(pid, 0)')
+def test_sqlite_session_stale_lock(sqlite_session_class):
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+
+    sess = sqlite_session_class(clean_freq=0, lock_timeout=1)
+    sess.get_connection().execute(
+        'INSERT INTO session_lock (id, pid, acquired) VALUES (?, ?, ?)',
+        (sess.id, dead.pid, time.time()))
+    sess.acquire_lock()
+    assert sess.locked
+    sess.release_lock()
+
+
+def test_sqlite_session_thread_started_before_setup(sqlite_session_class):
+    thread_manager = cherrypy.engine.thread_manager
+    conns = []
+
+    def request():
+        thread_manager.acquire_thread()
+        conns.append(sqlite_session_class.get_connection())
+
+    # The thread was seen on 'start_thread' before the session class
+    #   subscribed to it, so its connection is opened on first use.
+    cherrypy.engine.unsubscribe(
+        'start_thread', sqlite_session_class.start_thread)
+    try:
+        t = threading.Thread(target=request)
+        t.start()
+        t.join()
+        thread_index = thread_manager.threads[t.ident]
+        assert sqlite_session_class.thread_idents[thread_index] == t.ident
+        sqlite_session_class.stop_thread(thread_index)
+        assert t.ident not in sqlite_session_class.connections
+    finally:
+        thread_manager.threads.pop(t.ident, None)
+
+
+@pytest.mark.usefixtures('memcached_standin')
+class MemcachedStandInSessionTest(helper.CPWebCase):
+    setup_server = staticmethod(setup_server)
+
+    test_0_Session = MemcachedSessionTest.test_0_Session
+    test_1_Concurrency = MemcachedSessionTest.test_1_Concurrency
+    test_3_Redirect = MemcachedSessionTest.test_3_Redirect
+    test_5_Error_paths = MemcachedSessionTest.test_5_Error_paths
+
+
+def test_cookie_session():
+    sess = sessions.CookieSession(secret_key='secret')
+    sess.acquire_lock()
+    sess['counter'] = 1
+    sess.save()
+    assert not sess.locked
+    value = sess.id
+
+    sess = sessions.CookieSession(value, secret_key='secret')
+    assert not sess.missing
+    assert sess['counter'] == 1
+
+    tampered = value[:2] + ('A' if value[2] != 'A' else 'B') + value[3:]
+    assert sessions.CookieSession(tampered, secret_key='secret').missing
+    assert sessions.CookieSession(value, secret_key='other').missing
+    assert sessions.CookieSession('not-a-cookie', secret_key='secret').missing
+
+    with pytest.raises(ValueError):
+        sessions.CookieSession(value)
+
+
+def test_cookie_session_limits():
+    sess = sessions.CookieSession(secret_key='secret', timeout=-1)
+    sess['counter'] = 1
+    sess.save()
+    sess = sessions.CookieSession(sess.id, secret_key='secret')
+    assert 'counter' not in sess
+
+    sess = sessions.CookieSession(secret_key='secret', max_size=200)
+    sess['text'] = 'x' * 500
+    with pytest.raises(ValueError):
+        sess.save()
+    sess.compress_threshold = 50
+    sess.save()
+
+
+def test_cookie_session_encrypted():
+    pytest.importorskip('cryptography')
+    sess = sessions.CookieSession(secret_key='secret', encrypt=True)
+    sess['text'] = 'plain'
+    sess.save()
+    payload = sess.id.rsplit('.', 1)[0]
+    assert b'plain' not in base64.urlsafe_b64decode(
+        payload + '=' * (-len(payload) % 4))
+
+    sess = sessions.CookieSession(sess.id, secret_key='secret', encrypt=True)
+    assert sess['text'] == 'plain'
+
+
+def setup_cookie_session_server():
+
+    @cherrypy.config(**{
+        'tools.sessions.on': True,
+        'tools.sessions.storage_class': sessions.CookieSession,
+        'tools.sessions.secret_key': 'secret',
+    })
+    class Root:
+
+        @cherrypy.expose
+        def index(self):
+            counter = cherrypy.session.get('counter', 0) + 1
+            cherrypy.session['counter'] = counter
+            return str(counter)
+
+        @cherrypy.expose
+        @cherrypy.config(**{'response.stream': True})
+        def stream(self):
+            counter = cherrypy.session.get('counter', 0) + 1
+            cherrypy.session['counter'] = counter
+
+            def body():
+                yield str(counter)
+            return body()
+
+    cherrypy.tree.mount(Root())
+
+
+class CookieSessionTest(helper.CPWebCase):
+    setup_server = staticmethod(setup_cookie_session_server)
+
+    def test_counter(self):
+        self.getPage('/')
+        self.assertBody('1')
+        self.getPage('/', self.cookies)
+        self.assertBody('2')
+        self.getPage('/stream', self.cookies)
+        self.assertBody('3')
+        self.getPage('/', self.cookies)
+        self.assertBody('4')
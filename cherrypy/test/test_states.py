@@ -1,9 +1,10 @@
 import os
 import signal
+import threading
 import time
 import unittest
 import warnings
-from http.client import BadStatusLine
+from http.client import BadStatusLine, HTTPConnection
 
 import pytest
 import portend
@@ -315,6 +316,159 @@ class PluginTests(helper.CPWebCase):
         if p.exit_code != 0:
             self.fail('Daemonized parent process failed to exit cleanly.')
 
+    def _get_pids(self, count):
+        """Return the PIDs of the processes serving the next requests."""
+        pids = set()
+        for trial in range(200):
+            self.getPage('/pid')
+            self.assertStatus(200)
+            pids.add(int(self.body))
+            if len(pids) == count:
+                return pids
+        self.fail('Only %d processes served requests.' % len(pids))
+
+    def _wait_for_exit(self, pids):
+        for trial in range(100):
+            pids = [pid for pid in pids if _is_running(pid)]
+            if not pids:
+                return
+            time.sleep(0.1)
+        self.fail('Processes %r did not exit.' % pids)
+
+    def test_prefork(self):
+        if not hasattr(os, 'fork'):
+            return self.skip('skipped (no fork) ')
+        p = helper.CPProcess(ssl=(self.scheme.lower() == 'https'),
+                             workers=2)
+        p.write_conf(
+            extra='test_case_name: "test_prefork"')
+        p.start(imports='cherrypy.test._test_states_demo')
+        master = p.get_pid()
+        try:
+            pids = self._get_pids(2)
+            assert master not in pids
+
+            # A worker which dies is replaced.
+            killed = pids.pop()
+            os.kill(killed, signal.SIGKILL)
+            self._wait_for_exit([killed])
+            pids = self._get_pids(2)
+            assert killed not in pids
+
+            # A graceful restart replaces all the workers.
+            os.kill(master, signal.SIGUSR1)
+            self._wait_for_exit(pids)
+            new_pids = self._get_pids(2)
+            assert not new_pids & pids
+        finally:
+            os.kill(master, signal.SIGTERM)
+            p.join()
+        self._wait_for_exit(new_pids)
+
+    def _restart(self):
+        """Touch the demo script, for its autoreloader to restart it."""
+        # Give the autoreloader time to cache the file time.
+        time.sleep(2)
+        os.utime(os.path.join(thisdir, '_test_states_demo.py'), None)
+
+    def test_handoff(self):
+        if self.scheme.lower() == 'https':
+            return self.skip('skipped (https) ')
+        p = helper.CPProcess()
+        p.write_conf(
+            extra='server.handoff: True\n'
+                  'test_case_name: "test_handoff"')
+        p.start(imports='cherrypy.test._test_states_demo')
+        hammer = _Hammer(self.HOST, self.PORT, '/start')
+        try:
+            hammer.start()
+            self._restart()
+            for trial in range(100):
+                if len(set(hammer.bodies)) > 1:
+                    break
+                time.sleep(0.1)
+            else:
+                self.fail('The process did not restart.')
+            hammer.stop()
+            # Connections made while the process restarted waited for it.
+            assert hammer.errors == []
+        finally:
+            hammer.stop()
+            os.kill(p.get_pid(), signal.SIGTERM)
+            p.join()
+
+    def test_prefork_restart(self):
+        if not hasattr(os, 'fork'):
+            return self.skip('skipped (no fork) ')
+        if self.scheme.lower() == 'https':
+            return self.skip('skipped (https) ')
+        p = helper.CPProcess(workers=2)
+        p.write_conf(
+            extra='test_case_name: "test_prefork_restart"')
+        p.start(imports='cherrypy.test._test_states_demo')
+        master = p.get_pid()
+        hammer = _Hammer(self.HOST, self.PORT, '/pid')
+        try:
+            pids = self._get_pids(2)
+            hammer.start()
+            self._restart()
+            # The new master replaces the old workers one at a time.
+            self._wait_for_exit(pids)
+            new_pids = self._get_pids(2)
+            assert not new_pids & pids
+            assert master not in new_pids
+            hammer.stop()
+            assert hammer.errors == []
+        finally:
+            hammer.stop()
+            os.kill(master, signal.SIGTERM)
+            p.join()
+        self._wait_for_exit(new_pids)
+
+
+class _Hammer(threading.Thread):
+    """Request a page over and over, on new connections."""
+
+    def __init__(self, host, port, path):
+        super(_Hammer, self).__init__()
+        self.daemon = True
+        self.host = host
+        self.port = port
+        self.path = path
+        self.bodies = []
+        self.errors = []
+        self.running = True
+
+    def run(self):
+        while self.running:
+            conn = HTTPConnection(self.host, self.port, timeout=10)
+            try:
+                conn.request('GET', self.path)
+                response = conn.getresponse()
+                body = response.read()
+                if response.status == 200:
+                    self.bodies.append(body)
+                else:
+                    self.errors.append(response.status)
+            except Exception as exc:
+                self.errors.append(exc)
+            finally:
+                conn.close()
+            time.sleep(0.02)
+
+    def stop(self):
+        self.running = False
+        if self.is_alive():
+            self.join()
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
 
 class SignalHandlingTests(helper.CPWebCase):
 
@@ -470,3 +624,25 @@ class WaitTests(unittest.TestCase):
         with pytest.raises(IOError):
             with servers._safe_wait('127.0.0.1', free_port):
                 portend.occupied('127.0.0.1', free_port, timeout=1)
+
+
+def test_hand_off_socket(monkeypatch):
+    servers = cherrypy.process.servers
+    monkeypatch.delenv(servers.HANDOFF_ENV, raising=False)
+    bus = cherrypy.process.wspbus.Bus()
+    sock = servers.bind_socket(('127.0.0.1', 0))
+    try:
+        bind_addr = ('127.0.0.1', 0)
+        servers.hand_off_socket(bus, bind_addr, sock)
+        assert bus.pass_fds == {sock.fileno()}
+
+        assert servers.inherited_socket(('127.0.0.1', 8080)) is None
+        inherited = servers.inherited_socket(bind_addr)
+        assert inherited.fileno() == sock.fileno()
+        assert inherited.getsockname() == sock.getsockname()
+        inherited.detach()
+        # Each socket is handed over once.
+        assert servers.HANDOFF_ENV not in os.environ
+        assert servers.inherited_socket(bind_addr) is None
+    finally:
+        sock.close()
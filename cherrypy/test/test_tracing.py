@@ -0,0 +1,151 @@
+import os
+import queue
+import re
+import time
+
+import cherrypy
+from cherrypy._json import json
+from cherrypy.lib import tracing
+from cherrypy.test import helper
+
+
+localDir = os.path.dirname(__file__)
+spans_file = os.path.join(localDir, 'spans.jsonl')
+
+spans = tracing.QueueSpanExporter()
+
+
+def test_parse_traceparent():
+    parse = tracing.parse_traceparent
+    trace_id = '4bf92f3577b34da6a3ce929d0e0e4736'
+    assert parse('00-%s-00f067aa0ba902b7-01' % trace_id) == (
+        trace_id, '00f067aa0ba902b7', '01')
+    # Future versions may append fields.
+    assert parse('cc-%s-00f067aa0ba902b7-00-what-ever' % trace_id) == (
+        trace_id, '00f067aa0ba902b7', '00')
+    for invalid in (
+        None, '', 'garbage',
+        '00-%s-00f067aa0ba902b7-01-extra' % trace_id,
+        'ff-%s-00f067aa0ba902b7-01' % trace_id,
+        '00-%s-00f067aa0ba902b7-01' % ('0' * 32),
+        '00-%s-0000000000000000-01' % trace_id,
+        '00-%s-00F067AA0BA902B7-01' % trace_id,
+    ):
+        assert parse(invalid) is None
+
+
+class TracingTest(helper.CPWebCase):
+
+    @staticmethod
+    def setup_server():
+        class Root(object):
+
+            @cherrypy.expose
+            def index(self):
+                time.sleep(0.01)
+                return cherrypy.request.span.traceparent
+
+            @cherrypy.expose
+            def fail(self):
+                raise cherrypy.HTTPError(404)
+
+            @cherrypy.expose
+            @cherrypy.config(**{
+                'tools.server_timing.exporter':
+                    tracing.FileSpanExporter(spans_file),
+            })
+            def to_file(self):
+                return 'ok'
+
+        cherrypy.tree.mount(Root(), config={
+            '/': {
+                'tools.server_timing.on': True,
+                'tools.server_timing.exporter': spans,
+            },
+        })
+
+    def get_span(self):
+        # The span is exported after the response has been sent.
+        return spans.queue.get(timeout=5)
+
+    def test_server_timing(self):
+        self.getPage('/')
+        self.assertStatus(200)
+        header = self.assertHeader('Server-Timing')
+        metrics = dict(
+            m.split(';dur=') for m in header.split(', '))
+        assert list(metrics)[-1] == 'total'
+        assert 'process_query_string' in metrics
+        assert float(metrics['handler']) >= 10
+        assert float(metrics['total']) >= float(metrics['handler'])
+
+        span = self.get_span()
+        assert span.status == 200
+        assert span.name == 'GET /'
+        assert span.parent_id is None
+        assert span.duration >= span.stages['handler'] >= 0.01
+        # A new trace, and its span, are identified by the request id.
+        assert span.trace_id[16:] == span.span_id
+        assert self.body == span.traceparent.encode()
+        assert re.match('^00-[0-9a-f]{32}-[0-9a-f]{16}-01$', span.traceparent)
+
+    def test_error(self):
+        self.getPage('/fail')
+        self.assertStatus(404)
+        self.assertHeader('Server-Timing')
+        assert self.get_span().status == 404
+
+    def test_traceparent(self):
+        trace_id = '4bf92f3577b34da6a3ce929d0e0e4736'
+        traceparent = '00-%s-00f067aa0ba902b7-00' % trace_id
+        self.getPage('/', headers=[
+            ('traceparent', traceparent),
+            ('tracestate', 'congo=t61rcWkgMzE'),
+        ])
+        self.assertStatus(200)
+        span = self.get_span()
+        assert span.trace_id == trace_id
+        assert span.parent_id == '00f067aa0ba902b7'
+        assert span.flags == '00'
+        assert span.tracestate == 'congo=t61rcWkgMzE'
+        assert span.span_id != span.parent_id
+        self.assertBody('00-%s-%s-00' % (trace_id, span.span_id))
+
+        # An invalid traceparent starts a new trace.
+        self.getPage('/', headers=[('traceparent', 'garbage')])
+        span = self.get_span()
+        assert span.parent_id is None
+        assert span.trace_id != trace_id
+        assert span.tracestate is None
+
+    def test_file_exporter(self):
+        if os.path.exists(spans_file):
+            os.unlink(spans_file)
+        try:
+            self.getPage('/to_file')
+            self.assertBody('ok')
+            for trial in range(50):
+                if os.path.exists(spans_file):
+                    with open(spans_file) as f:
+                        lines = f.readlines()
+                    if lines:
+                        break
+                time.sleep(0.1)
+            assert len(lines) == 1
+            span = json.loads(lines[0])
+            assert span['name'] == 'GET /to_file'
+            assert span['status'] == 200
+            assert 'handler' in span['stages']
+        finally:
+            exporter = cherrypy.tree.apps[''].root.to_file._cp_config[
+                'tools.server_timing.exporter']
+            exporter.close()
+            os.unlink(spans_file)
+
+
+def test_queue_exporter_drops():
+    exporter = tracing.QueueSpanExporter(queue.Queue(1))
+    exporter(tracing.Span('a' * 32, 'b' * 16))
+    exporter(tracing.Span('a' * 32, 'c' * 16))
+    assert exporter.queue.qsize() == 1
+    assert exporter.dropped == 1
@@ -58,7 +58,7 @@ params = dict(
     entry_points={'console_scripts': ['cherryd = cherrypy.__main__:run']},
     include_package_data=True,
     install_requires=[
-        'cheroot>=6.2.4',
+        'cheroot>=6.6.0',
         'portend>=2.1.1',
         'more_itertools',
         'zc.lockfile',
@@ -93,6 +93,10 @@ params = dict(
         ],
         # Enables memcached session support via `cherrypy[memcached_session]`:
         'memcached_session': ['python-memcached>=1.58'],
+        # Enables encrypted cookie sessions via `cherrypy[cookie_session]`:
+        'cookie_session': ['cryptography'],
+        # Enables the 'msgpack' session serializer via `cherrypy[msgpack]`:
+        'msgpack': ['msgpack>=0.5.2'],
         'xcgi': ['flup'],
 
         # https://docs.cherrypy.org/en/latest/advanced.html?highlight=windows#windows-console-events